@@ -0,0 +1,150 @@
+"""
+End-to-end benchmark of the report 1 job on synthetic data in a local (moto) bucket. The extract, transform and load
+steps are timed separately for every execution mode.
+
+Run it from the repository root:
+
+    python -m benchmarks.bench_etl --isins 2000 --days 5 --repeat 3
+    python -m benchmarks.bench_etl --isins 500 --days 20 --modes in_memory pipelined --fetch-workers 8
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Dict, List
+
+import boto3
+from moto import mock_s3
+import yaml
+
+from benchmarks.data_generator import XetraDataGenerator
+from xetra.common.constants import ExecutionModes
+from xetra.common.s3 import S3BucketConnector
+from xetra.transformers.config import XetraSourceConfig, XetraTargetConfig
+from xetra.transformers.xetra_transformer import XetraETL
+
+CONFIG_FILE = 'configs/xetra_report1_config.yml'
+SRC_BUCKET = 'xetra-bench-src'
+TRG_BUCKET = 'xetra-bench-trg'
+ENDPOINT_URL = 'https://s3.eu-central-1.amazonaws.com'
+
+
+def create_buckets() -> Dict[str, S3BucketConnector]:
+    """
+    Create the source and the target bucket in the (mocked) S3 and return their connectors.
+    """
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+    s3 = boto3.resource(service_name='s3', endpoint_url=ENDPOINT_URL)
+    connectors = {}
+    for bucket in (SRC_BUCKET, TRG_BUCKET):
+        s3.create_bucket(Bucket=bucket, CreateBucketConfiguration={'LocationConstraint': 'eu-central-1'})
+        connectors[bucket] = S3BucketConnector('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', ENDPOINT_URL, bucket)
+    return connectors
+
+
+def run_once(etl: XetraETL, mode: str) -> Dict[str, float]:
+    """
+    Run the report 1 job once and return the time of its steps in seconds.
+    """
+    timings = {}
+    started = time.perf_counter()
+    if mode == ExecutionModes.IN_MEMORY.value:
+        df = etl.extract()
+    elif mode == ExecutionModes.PIPELINED.value:
+        df = etl.extract_pipelined()
+    else:
+        df = etl.extract_aggregated(per_object=mode == ExecutionModes.OUT_OF_CORE.value)
+    timings['extract'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    df = etl.transform_report1(df, aggregated=mode != ExecutionModes.IN_MEMORY.value)
+    timings['transform_report1'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    etl.load(df)
+    timings['load'] = time.perf_counter() - started
+    timings['total'] = sum(timings.values())
+    timings['report_rows'] = len(df)
+    return timings
+
+
+def summarize(runs: List[Dict[str, float]]) -> Dict[str, dict]:
+    """
+    Summarize the timings of the repeated runs per step.
+    """
+    return {
+        step: {
+            'median_s': round(statistics.median(run[step] for run in runs), 4),
+            'min_s': round(min(run[step] for run in runs), 4)
+        }
+        for step in ('extract', 'transform_report1', 'load', 'total')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the report 1 job on synthetic data.')
+    parser.add_argument('--isins', type=int, default=1000, help='Number of ISINs.')
+    parser.add_argument('--days', type=int, default=5, help='Number of trading days.')
+    parser.add_argument('--files-per-day', type=int, default=9, help='Number of hourly objects per day.')
+    parser.add_argument('--start-date', default='2022-11-01', help='First date (YYYY-MM-DD).')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the data generator.')
+    parser.add_argument(
+        '--modes', nargs='+', choices=[mode.value for mode in ExecutionModes], default=[ExecutionModes.IN_MEMORY.value],
+        help='Execution modes to be benchmarked.'
+    )
+    parser.add_argument('--fetch-workers', type=int, default=1, help='Number of source objects fetched concurrently.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs per mode.')
+    args = parser.parse_args()
+
+    with open(CONFIG_FILE) as config_file:
+        config = yaml.safe_load(config_file)
+    src_args = XetraSourceConfig(**config['source'])
+    trg_args = XetraTargetConfig(**config['target'])
+
+    with mock_s3():
+        connectors = create_buckets()
+        started = time.perf_counter()
+        generated = XetraDataGenerator(args.isins, args.files_per_day, seed=args.seed).write(
+            connectors[SRC_BUCKET].write_object, args.start_date, args.days
+        )
+        generate_seconds = time.perf_counter() - started
+
+        results = []
+        for mode in args.modes:
+            runs = []
+            for _ in range(args.repeat):
+                # The meta file is not updated, so every run processes the same dates
+                etl = XetraETL(
+                    connectors[SRC_BUCKET], connectors[TRG_BUCKET], config['meta']['meta_key'], src_args, trg_args,
+                    date_range=(generated.dates[0], generated.dates[-1]), update_meta=False,
+                    fetch_workers=args.fetch_workers
+                )
+                runs.append(run_once(etl, mode))
+            results.append({
+                'mode': mode,
+                'fetch_workers': args.fetch_workers,
+                'report_rows': runs[-1]['report_rows'],
+                'steps': summarize(runs),
+                'source_rows_per_s': round(generated.rows / statistics.median(run['total'] for run in runs))
+            })
+
+    print(json.dumps({
+        'data': {
+            'isins': args.isins,
+            'days': len(generated.dates),
+            'objects': generated.objects,
+            'rows': generated.rows,
+            'bytes': generated.bytes,
+            'seed': args.seed,
+            'generate_s': round(generate_seconds, 3)
+        },
+        'repeat': args.repeat,
+        'results': results
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
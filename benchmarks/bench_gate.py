@@ -0,0 +1,346 @@
+"""
+Performance regression gate of the report 1 job (XetraETL) and of the meta file handling (MetaProcess).
+
+The standard synthetic scenarios are run against a local moto server (started in a subprocess, so its memory and CPU
+are not measured; it needs `moto[server]`). For every scenario and component the throughput, the peak of the traced
+memory and the number of S3 requests are measured. The results are stored as a baseline JSON, and later runs are
+compared against it with a tolerance per metric. A regression exits with 1.
+
+Run it from the repository root:
+
+    python -m benchmarks.bench_gate --update-baseline
+    python -m benchmarks.bench_gate --scenarios small daily --tolerance rows_per_second=0.3
+    python -m benchmarks.bench_gate --endpoint-url http://localhost:5000
+"""
+
+import argparse
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+import uuid
+from typing import Dict, Iterator, List, NamedTuple
+
+import boto3
+import numpy as np
+import yaml
+
+from benchmarks.data_generator import XetraDataGenerator
+from xetra.common.meta_process import MetaProcess
+from xetra.common.s3 import S3BucketConnector
+from xetra.transformers.config import XetraSourceConfig, XetraTargetConfig
+from xetra.transformers.xetra_transformer import XetraETL
+
+CONFIG_FILE = 'configs/xetra_report1_config.yml'
+BASELINE_FILE = 'benchmarks/baseline.json'
+REGION = 'eu-central-1'
+
+
+class Scenario(NamedTuple):
+    """
+    Class for a synthetic scenario of the gate.
+
+    isins: number of ISINs of the source data
+    days: number of trading days processed by the job
+    files_per_day: number of hourly source objects per day
+    meta_years: length of the history of processed dates in the meta file
+    start_date: first date of the source data (YYYY-MM-DD)
+    """
+    isins: int
+    days: int
+    files_per_day: int
+    meta_years: int
+    start_date: str = '2022-11-01'
+
+
+SCENARIOS = {
+    'small': Scenario(isins=50, days=2, files_per_day=3, meta_years=1),
+    'daily': Scenario(isins=2000, days=1, files_per_day=9, meta_years=5),
+    'monthly_backfill': Scenario(isins=500, days=21, files_per_day=9, meta_years=5)
+}
+
+# Relative change of a metric tolerated before it counts as a regression
+DEFAULT_TOLERANCES = {'rows_per_second': 0.25, 'peak_memory_bytes': 0.2, 's3_requests': 0.0}
+HIGHER_IS_BETTER = {'rows_per_second'}
+
+
+class Regression(NamedTuple):
+    """
+    Class for a metric which got worse than its tolerance allows.
+
+    scenario: name of the scenario
+    component: name of the measured component, `xetra_etl` or `meta_process`
+    metric: name of the metric
+    baseline: value of the metric in the baseline
+    current: value of the metric in the current run
+    change: relative change of the metric, e.g. -0.3 for 30 % less
+    """
+    scenario: str
+    component: str
+    metric: str
+    baseline: float
+    current: float
+    change: float
+
+
+@contextmanager
+def moto_server(port: int = 0, timeout: float = 30.0) -> Iterator[str]:
+    """
+    Run a moto server in a subprocess and yield its endpoint url.
+
+    :param port: port of the server, by default a free one
+    :param timeout: seconds to wait for the server to start
+    """
+    if not port:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'moto.server', '-H', '127.0.0.1', '-p', str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    endpoint_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError('The moto server exited, is moto[server] installed?')
+            try:
+                urllib.request.urlopen(endpoint_url, timeout=1).close()
+                break
+            except (urllib.error.URLError, ConnectionError):
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f'The moto server did not start within {timeout} s')
+                time.sleep(0.1)
+        yield endpoint_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def create_connector(endpoint_url: str, bucket_name: str) -> S3BucketConnector:
+    """
+    Create a bucket and return a connector to it with its own client and request accounting. The dummy credentials
+    of the local server are given to the session, the environment is left alone.
+    """
+    session = boto3.Session(aws_access_key_id='bench', aws_secret_access_key='bench', region_name=REGION)
+    s3_resource = session.resource(service_name='s3', endpoint_url=endpoint_url)
+    bucket = s3_resource.Bucket(bucket_name)
+    if bucket.creation_date is None:
+        bucket.create(CreateBucketConfiguration={'LocationConstraint': REGION})
+    return S3BucketConnector(
+        'AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', endpoint_url, bucket_name, s3_resource=s3_resource
+    )
+
+
+def measure(setup, run, repeat: int) -> dict:
+    """
+    Run a component `repeat` times and once more with traced memory.
+
+    :param setup: function preparing a run on fresh connectors, it is neither timed nor traced
+    :param run: function running the component with the result of `setup`, it returns the number of the processed rows
+        and the connectors it used
+    :param repeat: number of the timed runs
+    :return: the best throughput of the timed runs, the peak traced memory and the S3 requests of the traced run
+    """
+    rows_per_second = 0.0
+    for _ in range(repeat):
+        state = setup()
+        started = time.perf_counter()
+        rows, _ = run(state)
+        rows_per_second = max(rows_per_second, rows / (time.perf_counter() - started))
+    # Tracing slows the run down, so it is not timed
+    state = setup()
+    tracemalloc.start()
+    try:
+        _, connectors = run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # Connectors sharing a client share its accounting, which must be counted once
+    accountings = {id(connector.accounting): connector.accounting for connector in connectors}
+    requests = sum(usage.requests for accounting in accountings.values() for usage in accounting.usage())
+    return {'rows_per_second': round(rows_per_second, 1), 'peak_memory_bytes': peak, 's3_requests': requests}
+
+
+def run_scenario(name: str, scenario: Scenario, endpoint_url: str, repeat: int = 3) -> Dict[str, dict]:
+    """
+    Run a scenario and return the metrics of its components.
+
+    :param name: name of the scenario, used in the bucket names
+    :param scenario: the scenario
+    :param endpoint_url: endpoint url of the S3 server
+    :param repeat: number of the timed runs
+    """
+    with open(CONFIG_FILE) as config_file:
+        config = yaml.safe_load(config_file)
+    src_args = XetraSourceConfig(**config['source'])
+    trg_args = XetraTargetConfig(**config['target'])
+    src_bucket = f'xetra-gate-{name.replace("_", "-")}-src'
+    trg_bucket = f'xetra-gate-{name.replace("_", "-")}-trg'
+
+    generated = XetraDataGenerator(scenario.isins, scenario.files_per_day).write(
+        create_connector(endpoint_url, src_bucket).write_object, scenario.start_date, scenario.days
+    )
+
+    def setup_etl():
+        return create_connector(endpoint_url, src_bucket), create_connector(endpoint_url, trg_bucket)
+
+    def run_etl(connectors):
+        # The meta file is not updated, so every run processes the same dates
+        XetraETL(
+            *connectors, config['meta']['meta_key'], src_args, trg_args,
+            date_range=(generated.dates[0], generated.dates[-1]), update_meta=False
+        ).etl_report1()
+        return generated.rows, list(connectors)
+
+    first_date = f'{int(scenario.start_date[:4]) - scenario.meta_years}{scenario.start_date[4:]}'
+    history = [
+        str(date) for date in np.arange(
+            np.datetime64(first_date, 'D'), np.datetime64(generated.dates[0], 'D'), dtype='datetime64[D]'
+        )
+    ]
+
+    def setup_meta_process():
+        # Every run starts from the same history in a meta file of its own
+        meta_key = f'meta/{name}/{uuid.uuid4().hex}.csv'
+        MetaProcess.update_meta_file(create_connector(endpoint_url, trg_bucket), meta_key, history)
+        return create_connector(endpoint_url, trg_bucket), meta_key
+
+    def run_meta_process(state):
+        s3_bucket_meta, meta_key = state
+        MetaProcess.return_date_list(s3_bucket_meta, first_date, meta_key)
+        MetaProcess.update_meta_file(s3_bucket_meta, meta_key, generated.dates)
+        return len(history), [s3_bucket_meta]
+
+    return {
+        'xetra_etl': measure(setup_etl, run_etl, repeat),
+        'meta_process': measure(setup_meta_process, run_meta_process, repeat)
+    }
+
+
+def compare(baseline: dict, current: dict, tolerances: Dict[str, float] = None) -> List[Regression]:
+    """
+    Compare the results of a run with the baseline. Only the scenarios, components and metrics present in both are
+    compared.
+
+    :param baseline: results of the baseline run, see `run_gate`
+    :param current: results of the current run
+    :param tolerances: tolerated relative change per metric, by default DEFAULT_TOLERANCES
+    :return: the regressions, empty if there are none
+    """
+    tolerances = {**DEFAULT_TOLERANCES, **(tolerances or {})}
+    regressions = []
+    for scenario, components in current['scenarios'].items():
+        for component, metrics in components.items():
+            baseline_metrics = baseline['scenarios'].get(scenario, {}).get(component, {})
+            for metric, value in metrics.items():
+                if metric not in baseline_metrics or metric not in tolerances:
+                    continue
+                reference = baseline_metrics[metric]
+                if reference:
+                    change = value / reference - 1.0
+                else:
+                    change = 0.0 if not value else float('inf')
+                if metric in HIGHER_IS_BETTER:
+                    regressed = change < -tolerances[metric]
+                else:
+                    regressed = change > tolerances[metric]
+                if regressed:
+                    regressions.append(Regression(scenario, component, metric, reference, value, round(change, 4)))
+    return regressions
+
+
+def run_gate(scenarios: List[str], endpoint_url: str, repeat: int = 3) -> dict:
+    """
+    Run the scenarios and return their results with a description of the environment.
+
+    :param scenarios: names of the scenarios, see SCENARIOS
+    :param endpoint_url: endpoint url of the S3 server
+    :param repeat: number of the timed runs per component
+    """
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'machine': platform.machine(), 'node': platform.node()},
+        'repeat': repeat,
+        'scenarios': {name: run_scenario(name, SCENARIOS[name], endpoint_url, repeat) for name in scenarios}
+    }
+
+
+def parse_tolerance(value: str) -> tuple:
+    """
+    Parse a `metric=tolerance` argument.
+    """
+    metric, _, tolerance = value.partition('=')
+    if metric not in DEFAULT_TOLERANCES:
+        raise argparse.ArgumentTypeError(f'unknown metric {metric}, expected one of {list(DEFAULT_TOLERANCES)}')
+    try:
+        return metric, float(tolerance)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'the tolerance of {metric} is not a number: {tolerance!r}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fail on performance regressions against a stored baseline.')
+    parser.add_argument(
+        '--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS), help='Scenarios to be run.'
+    )
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='Path of the baseline JSON.')
+    parser.add_argument(
+        '--update-baseline', action='store_true', help='Store the results as the baseline instead of comparing.'
+    )
+    parser.add_argument(
+        '--tolerance', type=parse_tolerance, action='append', default=[],
+        help='Tolerated relative change of a metric, e.g. rows_per_second=0.3 (repeatable).'
+    )
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs per component.')
+    parser.add_argument(
+        '--endpoint-url', default=None, help='Endpoint of a running S3 server, by default a moto server is started.'
+    )
+    parser.add_argument('--output', default=None, help='Path the results of the run are written to.')
+    args = parser.parse_args()
+
+    if not args.update_baseline and not os.path.exists(args.baseline):
+        parser.error(f'there is no baseline {args.baseline}, create it with --update-baseline')
+
+    if args.endpoint_url is not None:
+        results = run_gate(args.scenarios, args.endpoint_url, args.repeat)
+    else:
+        with moto_server() as endpoint_url:
+            results = run_gate(args.scenarios, endpoint_url, args.repeat)
+    print(json.dumps(results, indent=2))
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'The baseline {args.baseline} is updated')
+        return
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline.get('environment') != results['environment']:
+        print(f"WARNING: the baseline was measured on {baseline.get('environment')}, the timings may differ")
+    regressions = compare(baseline, results, dict(args.tolerance))
+    for regression in regressions:
+        print(
+            f'REGRESSION {regression.scenario}/{regression.component} {regression.metric}: '
+            f'{regression.baseline} -> {regression.current} ({regression.change:+.1%})'
+        )
+    if regressions:
+        sys.exit(1)
+    print(f'No regressions against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
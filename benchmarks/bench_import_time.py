@@ -0,0 +1,84 @@
+"""
+Benchmark of the start-up time of the CLI measured with `python -X importtime`.
+
+Run it from the repository root:
+
+    python -m benchmarks.bench_import_time --repeat 5
+    python -m benchmarks.bench_import_time --threshold-ms 200 --args configs/xetra_report1_config.yml validate
+
+The benchmark exits with status 1 if the median import time exceeds the threshold (150 ms by default, 0 disables the
+check), so it can be used as a regression gate in CI.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# Dependencies which the fast commands (`--help`, `validate`) must not import
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'boto3', 'botocore']
+# Default limit of the median total import time
+DEFAULT_THRESHOLD_MS = 150.0
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """
+    Parse the output of `python -X importtime` into the cumulative import time in microseconds of every module.
+    """
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, module = line.split('|')
+        # The indentation of the module name is kept, it shows the nesting of the imports
+        cumulative[module[1:]] = int(cumulative_us)
+    return cumulative
+
+
+def measure(cli_args: List[str]) -> Dict[str, int]:
+    """
+    Run run.py with the arguments under `-X importtime` and return the cumulative import times of the modules.
+    """
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', 'run.py', *cli_args], capture_output=True, text=True, check=False
+    )
+    return parse_importtime(completed.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the import time of the CLI.')
+    parser.add_argument(
+        '--args', nargs=argparse.REMAINDER, default=['--help'], help='Arguments of run.py, `--help` by default.'
+    )
+    parser.add_argument('--repeat', type=int, default=5, help='Number of measured runs.')
+    parser.add_argument('--top', type=int, default=10, help='Number of the slowest top-level imports reported.')
+    parser.add_argument(
+        '--threshold-ms', type=float, default=DEFAULT_THRESHOLD_MS,
+        help=f'Fail if the median total import time exceeds it, {DEFAULT_THRESHOLD_MS:g} ms by default, 0 disables it.'
+    )
+    args = parser.parse_args()
+
+    runs = [measure(args.args) for _ in range(args.repeat)]
+    # Top-level imports are not indented, their cumulative times sum up to the total import time
+    totals = [sum(us for module, us in run.items() if not module.startswith(' ')) / 1000 for run in runs]
+    last = runs[-1]
+    top = sorted(((module.strip(), us) for module, us in last.items()), key=lambda item: item[1], reverse=True)
+    result = {
+        'args': args.args,
+        'median_ms': round(statistics.median(totals), 3),
+        'min_ms': round(min(totals), 3),
+        'modules': len(last),
+        'heavy_modules': [name for name in HEAVY_MODULES if name in {module.strip() for module in last}],
+        'top': [{'module': module, 'cumulative_ms': round(us / 1000, 3)} for module, us in top[:args.top]],
+        'threshold_ms': args.threshold_ms
+    }
+    print(json.dumps(result, indent=2))
+    if args.threshold_ms > 0 and result['median_ms'] > args.threshold_ms:
+        print(f"Import time {result['median_ms']} ms exceeds the threshold of {args.threshold_ms} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
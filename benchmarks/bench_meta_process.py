@@ -0,0 +1,59 @@
+"""
+Benchmark of the date planning done by MetaProcess.return_date_list on every start of the ETL job.
+
+Run it from the repository root:
+
+    python -m benchmarks.bench_meta_process --years 2 5 10 20 --repeat 20
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import json
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from xetra.common.constants import MetaProcessFormat
+from xetra.common.meta_process import MetaProcess
+
+
+def make_meta_history(years: int, processed_ratio: float, seed: int = 0) -> pd.DataFrame:
+    """
+    Create a meta file covering `years` years until today, in which `processed_ratio` of the days are processed.
+    """
+    today = np.datetime64(datetime.today().date(), 'D')
+    days = np.arange(today - 365 * years, today + 1, dtype='datetime64[D]')
+    rng = np.random.default_rng(seed)
+    processed = np.sort(rng.choice(days, size=int(len(days) * processed_ratio), replace=False))
+    return pd.DataFrame(data={
+        MetaProcessFormat.META_SOURCE_DATE_COL.value: np.datetime_as_string(processed, unit='D'),
+        MetaProcessFormat.META_PROCESS_COL.value: datetime.today().strftime(MetaProcessFormat.META_DATE_FORMAT.value)
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark MetaProcess date planning.')
+    parser.add_argument('--years', type=int, nargs='+', default=[2, 5, 10, 20], help='Lengths of the meta history.')
+    parser.add_argument('--processed-ratio', type=float, default=0.95, help='Ratio of processed days in the history.')
+    parser.add_argument('--repeat', type=int, default=20, help='Number of timed repetitions.')
+    args = parser.parse_args()
+
+    results = []
+    for years in args.years:
+        df_meta = make_meta_history(years, args.processed_ratio)
+        first_date = (datetime.today() - timedelta(days=365 * years)).strftime(MetaProcessFormat.META_DATE_FORMAT.value)
+        timings = timeit.repeat(
+            lambda: MetaProcess.date_list_from_meta(df_meta, first_date), number=1, repeat=args.repeat
+        )
+        results.append({
+            'years': years,
+            'meta_rows': len(df_meta),
+            'median_ms': round(float(np.median(timings)) * 1000, 3),
+            'min_ms': round(min(timings) * 1000, 3)
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Seeded generator of synthetic Xetra source data at a realistic scale.
+
+The data follows the layout of the Deutsche Börse Public Dataset: one csv object per trading hour under
+`<date>/<date>_BINS_XETR<hh>.csv`, with one minute bar per traded ISIN and minute. Prices are random walks carried over
+from hour to hour and from day to day, and the ISINs differ in their liquidity: a few are traded almost every minute,
+most of them only occasionally.
+
+Write the data into a local directory (e.g. served by a local S3 server):
+
+    python -m benchmarks.data_generator --output-dir /tmp/xetra --isins 3000 --days 20
+
+or into a bucket:
+
+    python -m benchmarks.data_generator --endpoint-url http://localhost:5000 --bucket xetra-bench --isins 3000
+"""
+
+import argparse
+import os
+from typing import Callable, Iterator, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+SOURCE_COLUMNS = [
+    'ISIN', 'Mnemonic', 'SecurityDesc', 'SecurityType', 'Currency', 'SecurityID', 'Date', 'Time', 'StartPrice',
+    'MaxPrice', 'MinPrice', 'EndPrice', 'NumberOfTrades', 'TradedVolume'
+]
+
+
+class GeneratedData(NamedTuple):
+    """
+    Class for the summary of the generated data.
+
+    dates: the generated trading days
+    objects: number of written objects
+    rows: number of written minute bars
+    bytes: size of the written objects
+    """
+    dates: list
+    objects: int
+    rows: int
+    bytes: int
+
+
+class XetraDataGenerator:
+    """
+    Generates minute bars of `isins` ISINs in `files_per_day` hourly objects per trading day (Monday to Friday).
+    The same seed always generates the same data.
+    """
+
+    def __init__(self, isins: int = 100, files_per_day: int = 9, first_hour: int = 7, seed: int = 0):
+        """
+        Constructor for XetraDataGenerator
+
+        :param isins: number of ISINs
+        :param files_per_day: number of hourly objects per trading day
+        :param first_hour: hour (UTC) of the first object of a day, Xetra trading starts at 07:00 UTC
+        :param seed: seed of the random generator
+        """
+        if not 0 < files_per_day <= 24 - first_hour:
+            raise ValueError(f'{files_per_day} hourly files do not fit into a day starting at {first_hour}:00')
+        self.isins = isins
+        self.files_per_day = files_per_day
+        self.first_hour = first_hour
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+        ids = np.arange(isins)
+        self._isin = np.array([f'DE{i:09d}{i % 10}' for i in ids])
+        self._mnemonic = np.array([f'X{i:04X}' for i in ids])
+        self._security_id = 2_500_000 + ids
+        # Liquidity follows a power law: probability that the ISIN is traded in a given minute
+        self._activity = np.clip(0.95 * (ids + 1.0) ** -0.6, 0.01, 0.95)
+        self._price = np.round(self._rng.lognormal(mean=3.0, sigma=1.0, size=isins), 2) + 1.0
+
+    def _hour(self, date: str, hour: int) -> pd.DataFrame:
+        # Random walk of every ISIN over the 60 minutes of the hour, with a volatility of 0.08 % per minute
+        returns = self._rng.normal(0.0, 0.0008, size=(60, self.isins))
+        close = self._price * np.cumprod(1.0 + returns, axis=0)
+        open_ = np.vstack([self._price, close[:-1]])
+        self._price = close[-1]
+
+        traded = self._rng.random((60, self.isins)) < self._activity
+        minute, isin = np.nonzero(traded)
+        open_, close = open_[minute, isin], close[minute, isin]
+        spread = np.abs(self._rng.normal(0.0, 0.0004, size=(2, len(minute))))
+        trades = self._rng.geometric(0.3, size=len(minute))
+        return pd.DataFrame({
+            'ISIN': self._isin[isin],
+            'Mnemonic': self._mnemonic[isin],
+            'SecurityDesc': 'SYNTHETIC SECURITY',
+            'SecurityType': 'Common stock',
+            'Currency': 'EUR',
+            'SecurityID': self._security_id[isin],
+            'Date': date,
+            'Time': np.char.add(f'{hour:02d}:', np.char.zfill(minute.astype(str), 2)),
+            'StartPrice': np.round(open_, 2),
+            'MaxPrice': np.round(np.maximum(open_, close) * (1.0 + spread[0]), 2),
+            'MinPrice': np.round(np.minimum(open_, close) * (1.0 - spread[1]), 2),
+            'EndPrice': np.round(close, 2),
+            'NumberOfTrades': trades,
+            'TradedVolume': trades * self._rng.integers(10, 2000, size=len(minute))
+        }, columns=SOURCE_COLUMNS)
+
+    def objects(self, start_date: str, days: int) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """
+        Generate the source objects of `days` trading days starting with `start_date` (or the next trading day).
+
+        :param start_date: first date (YYYY-MM-DD)
+        :param days: number of trading days
+        :return: iterator of (key, pandas DataFrame) of the objects
+        """
+        first = np.busday_offset(np.datetime64(start_date, 'D'), 0, roll='forward')
+        for date in np.datetime_as_string(np.busday_offset(first, np.arange(days)), unit='D'):
+            for hour in range(self.first_hour, self.first_hour + self.files_per_day):
+                yield f'{date}/{date}_BINS_XETR{hour:02d}.csv', self._hour(str(date), hour)
+
+    def write(self, put: Callable[[str, bytes], object], start_date: str, days: int) -> GeneratedData:
+        """
+        Generate the source objects and write them with `put`.
+
+        :param put: function writing the content of an object under a key, e.g. S3BucketConnector.write_object
+        :param start_date: first date (YYYY-MM-DD)
+        :param days: number of trading days
+        :return: summary of the written data
+        """
+        dates, objects, rows, size = [], 0, 0, 0
+        for key, df in self.objects(start_date, days):
+            body = df.to_csv(index=False).encode('utf-8')
+            put(key, body)
+            date = key.split('/', 1)[0]
+            if not dates or dates[-1] != date:
+                dates.append(date)
+            objects += 1
+            rows += len(df)
+            size += len(body)
+        return GeneratedData(dates=dates, objects=objects, rows=rows, bytes=size)
+
+
+def write_to_directory(directory: str) -> Callable[[str, bytes], None]:
+    """
+    Return a function writing objects as files into a directory, keeping the key layout.
+    """
+    def put(key: str, body: bytes):
+        path = os.path.join(directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(body)
+    return put
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic Xetra source data.')
+    parser.add_argument('--isins', type=int, default=1000, help='Number of ISINs.')
+    parser.add_argument('--days', type=int, default=5, help='Number of trading days.')
+    parser.add_argument('--files-per-day', type=int, default=9, help='Number of hourly objects per day.')
+    parser.add_argument('--start-date', default='2022-11-01', help='First date (YYYY-MM-DD).')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+    parser.add_argument('--output-dir', default=None, help='Directory the objects are written to.')
+    parser.add_argument('--endpoint-url', default=None, help='Endpoint of the S3 bucket the objects are written to.')
+    parser.add_argument('--bucket', default=None, help='S3 bucket the objects are written to.')
+    args = parser.parse_args()
+
+    if args.output_dir is not None:
+        put = write_to_directory(args.output_dir)
+    elif args.bucket is not None:
+        import boto3
+
+        bucket = boto3.resource('s3', endpoint_url=args.endpoint_url).Bucket(args.bucket)
+
+        def put(key: str, body: bytes):
+            bucket.put_object(Key=key, Body=body)
+    else:
+        parser.error('either --output-dir or --bucket is required')
+    generator = XetraDataGenerator(args.isins, args.files_per_day, seed=args.seed)
+    summary = generator.write(put, args.start_date, args.days)
+    print(f'Written {summary.objects} objects, {summary.rows} rows, {summary.bytes} bytes '
+          f'of {len(summary.dates)} days ({summary.dates[0]} .. {summary.dates[-1]})')
+
+
+if __name__ == '__main__':
+    main()
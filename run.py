@@ -3,14 +3,16 @@ Running the Xetra ETL application
 """
 
 import argparse
+from datetime import datetime
 import logging
 import logging.config
-from pathlib import Path
+import os
+import sys
 
-import yaml
+from xetra.common.constants import ExecutionModes
 
-from xetra.common.s3 import S3BucketConnector
-from xetra.transformers.xetra_transformer import XetraETL, XetraSourceConfig, XetraTargetConfig
+# pandas, pyarrow, boto3 and yaml are imported only by the commands which need them, so `--help` and `validate`
+# start fast (benchmarks/bench_import_time.py)
 
 
 def main():
@@ -21,54 +23,201 @@ def main():
 
     parser = argparse.ArgumentParser(description='Run the Xetra ETL job.')
     parser.add_argument('config', help='An YAML configuration file.')
+    parser.add_argument(
+        '--mode', choices=['auto'] + [mode.value for mode in ExecutionModes], default='auto',
+        help='Execution mode of the job, by default it is chosen by the planner from the size of the source data.'
+    )
+    parser.add_argument('--dry-run', action='store_true', help='Print the execution plan without running the job.')
+    parser.add_argument(
+        '--profile-memory', action='store_true',
+        help='Record the RSS, the top allocators and the size of the DataFrames at every stage of the job.'
+    )
+    parser.add_argument(
+        '--profile-cpu', action='store_true',
+        help='Write a cProfile profile and sampled stacks for flame graphs of every stage of the job.'
+    )
+    parser.add_argument('--profile-dir', default='profiles', help='Directory of the profiling reports.')
+    subparsers = parser.add_subparsers(dest='command')
+    backfill_parser = subparsers.add_parser(
+        'backfill', help='Process a date range split into shards by parallel worker processes.'
+    )
+    backfill_parser.add_argument('--start', required=True, help='First date of the backfill (YYYY-MM-DD).')
+    backfill_parser.add_argument(
+        '--end', default=datetime.today().strftime('%Y-%m-%d'), help='Last date of the backfill, today by default.'
+    )
+    backfill_parser.add_argument('--workers', type=int, default=4, help='Number of worker processes.')
+    submit_parser = subparsers.add_parser(
+        'queue-submit', help='Split a date range into shards and add them to the work queue of the config file.'
+    )
+    submit_parser.add_argument('--start', required=True, help='First date of the backfill (YYYY-MM-DD).')
+    submit_parser.add_argument(
+        '--end', default=datetime.today().strftime('%Y-%m-%d'), help='Last date of the backfill, today by default.'
+    )
+    submit_parser.add_argument('--shards', type=int, required=True, help='Number of shards.')
+    work_parser = subparsers.add_parser('queue-work', help='Process shards from the work queue until it is empty.')
+    work_parser.add_argument('--owner', default=None, help='Identifier of the worker, unique by default.')
+    status_parser = subparsers.add_parser('queue-status', help='Show the progress of the work queue.')
+    status_parser.add_argument(
+        '--watch', type=float, default=None, metavar='SECONDS',
+        help='Refresh the progress every SECONDS until all the shards are done or failed.'
+    )
+    subparsers.add_parser('validate', help='Validate the config file without connecting to S3.')
+    trace_parser = subparsers.add_parser(
+        'trace-summary', help='Summarize the latency of the traced S3 requests per operation and key prefix.'
+    )
+    trace_parser.add_argument('--path', default=None, help='Spans file, by default `tracing.jsonl_path` of the config.')
+    trace_parser.add_argument(
+        '--prefix-depth', type=int, default=1, help='Number of the leading key parts grouped together, 0 for none.'
+    )
+    trace_parser.add_argument('--top', type=int, default=20, help='Number of the printed groups, slowest first.')
+    stream_parser = subparsers.add_parser(
+        'stream', help='Process the source files continuously as they land, with intraday reports.'
+    )
+    stream_parser.add_argument(
+        '--iterations', type=int, default=None, help='Number of polls, by default it runs until it is stopped.'
+    )
     args = parser.parse_args()
+
+    import yaml
+
     config = yaml.safe_load(open(args.config))
 
+    if args.command == 'validate':
+        from xetra.transformers.config import validate_config
+
+        errors = validate_config(config)
+        for error in errors:
+            print(error)
+        if errors:
+            sys.exit(1)
+        print('OK')
+        return
+
+    if args.command == 'trace-summary':
+        from xetra.common.tracing import read_spans, summarize_s3_latency
+
+        path = args.path or (config.get('tracing') or {}).get('jsonl_path')
+        if not path:
+            parser.error('no spans file, pass --path or configure tracing.jsonl_path')
+        print(f"{'group':<40} {'count':>8} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'max ms':>10}  slowest")
+        for summary in summarize_s3_latency(read_spans(path), args.prefix_depth)[:args.top]:
+            print(
+                f'{summary.group:<40} {summary.count:>8} {summary.p50_ms:>10.1f} {summary.p90_ms:>10.1f} '
+                f'{summary.p99_ms:>10.1f} {summary.max_ms:>10.1f}  {summary.slowest}'
+            )
+        return
+
     # Configure logging
 
     log_config = config['logging']
     logging.config.dictConfig(log_config)
     logger = logging.getLogger(__name__)
 
-    # Read S3 configuration and create connectors
-
-    s3_config = config['s3']
-
-    s3_bucket_src = S3BucketConnector(
-        access_key=s3_config['access_key'],
-        secret_key=s3_config['secret_key'],
-        endpoint_url=s3_config['src_endpoint_url'],
-        bucket_name=s3_config['src_bucket'],
-    )
-
-    s3_bucket_trg = S3BucketConnector(
-        access_key=s3_config['access_key'],
-        secret_key=s3_config['secret_key'],
-        endpoint_url=s3_config['trg_endpoint_url'],
-        bucket_name=s3_config['trg_bucket'],
-    )
-
-    # Read source configuration
-    source_config = XetraSourceConfig(**config['source'])
-
-    # Read target configuration
-    target_config = XetraTargetConfig(**config['target'])
+    if args.command == 'backfill':
+        from xetra.transformers.backfill import XetraBackfill
+        from xetra.transformers.job import traced_run, write_metrics
+
+        logger.info(f'Xetra ETL backfill from {args.start} to {args.end} has started')
+        backfill = XetraBackfill(config, args.start, args.end, args.workers)
+        with traced_run(backfill.s3_bucket_src, command='backfill'):
+            backfill.run()
+        # The metrics and the S3 usage of the shards are merged into the connectors of the coordinator
+        write_metrics(config, backfill.s3_bucket_src)
+        logger.info('Xetra ETL backfill has finished. ')
+        return
+
+    if args.command in ('queue-submit', 'queue-work', 'queue-status'):
+        from xetra.transformers.backfill import log_progress, run_queue_worker, submit_backfill, watch_backfill
+        from xetra.transformers.job import (
+            create_calendar, create_s3_connectors, create_work_queue, traced_run, write_metrics
+        )
+
+        _, s3_bucket_trg = create_s3_connectors(config)
+        queue = create_work_queue(config, s3_bucket_trg)
+        if args.command in ('queue-submit', 'queue-work'):
+            with traced_run(s3_bucket_trg, command=args.command):
+                if args.command == 'queue-submit':
+                    item_ids = submit_backfill(queue, args.start, args.end, args.shards, create_calendar(config))
+                    logger.info(f'Added {len(item_ids)} shards to the work queue')
+                else:
+                    run_queue_worker(config, queue, owner=args.owner, s3_bucket=s3_bucket_trg)
+            write_metrics(config, s3_bucket_trg)
+        elif args.watch is None:
+            log_progress(queue)
+        else:
+            watch_backfill(queue, interval_seconds=args.watch)
+        return
+
+    if args.command == 'stream':
+        from xetra.transformers.job import create_streaming_etl, traced_run, write_metrics
+
+        logger.info('Xetra streaming job has started')
+        streaming_etl = create_streaming_etl(config)
+        with traced_run(streaming_etl.s3_bucket_src, command='stream'):
+            streaming_etl.run(iterations=args.iterations)
+        write_metrics(config, streaming_etl.s3_bucket_src)
+        logger.info('Xetra streaming job has finished. ')
+        return
+
+    from xetra.transformers.job import create_planner, create_s3_connectors, create_xetra_etl, traced_run, write_metrics
+
+    run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+    memory_profiler = None
+    if args.profile_memory:
+        from xetra.common.profiling import MemoryProfiler
+
+        memory_profiler = MemoryProfiler(path=os.path.join(args.profile_dir, f'memory_{run_id}.json'))
 
-    # Read meta file configuration
-    meta_config = config['meta']
-
-    # Create ETL class instance
     logger.info('Xetra ETL job has started')
-    xetra_etl = XetraETL(
-        s3_bucket_src=s3_bucket_src,
-        s3_bucket_trg=s3_bucket_trg,
-        meta_key=meta_config['meta_key'],
-        src_args=source_config,
-        trg_args=target_config
-    )
-
-    # Run etl report1
-    xetra_etl.etl_report1()
+    s3_bucket_src, s3_bucket_trg = create_s3_connectors(config)
+
+    # The whole job is the root span of the trace, if tracing is configured
+    with traced_run(s3_bucket_src, run_id=run_id):
+        # Create ETL class instance
+        xetra_etl = create_xetra_etl(config, s3_bucket_src, s3_bucket_trg, memory_profiler=memory_profiler)
+
+        # Plan the execution
+        mode = args.mode
+        if mode == 'auto' or args.dry_run:
+            plan = create_planner(config, xetra_etl.s3_bucket_src).plan(xetra_etl.extract_date_list)
+            if args.dry_run:
+                print(plan.format())
+                return
+            mode = plan.mode
+            # The extraction reuses the listing of the planner instead of listing every date again
+            xetra_etl.use_listing(plan.listing)
+
+        cpu_profiler = None
+        if args.profile_cpu:
+            from xetra.common.profiling import CpuProfiler
+
+            # The stages observed by the metrics registry, shared by the job and the connectors, are profiled
+            cpu_profiler = CpuProfiler(args.profile_dir, prefix=f'cpu_{run_id}')
+            xetra_etl.metrics.profiler = cpu_profiler
+
+        # Run etl report1
+        try:
+            # The profilers are started only now, so a dry run does not leave them running
+            if memory_profiler is not None:
+                memory_profiler.start()
+                logger.info(f'Memory profile is written to {memory_profiler.path}')
+            if cpu_profiler is not None:
+                cpu_profiler.start()
+            xetra_etl.etl_report1(mode=mode)
+        finally:
+            if memory_profiler is not None:
+                memory_profiler.stop()
+            if cpu_profiler is not None:
+                for path in cpu_profiler.stop():
+                    logger.info(f'CPU profile is written to {path}')
+    if xetra_etl.s3_bucket_src.limiter is not None:
+        logger.info(f'S3 concurrency: {xetra_etl.s3_bucket_src.limiter.stats()}')
+    for stage in xetra_etl.metrics.stages():
+        logger.info(
+            f'Stage {stage.stage}: {stage.seconds:.3f} s, {stage.objects} objects, {stage.bytes} bytes, '
+            f'{stage.rows_in} rows in, {stage.rows_out} rows out'
+        )
+    write_metrics(config, xetra_etl.s3_bucket_src)
     logger.info('Xetra ETL job has finished. ')
 
 
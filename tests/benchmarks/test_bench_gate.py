@@ -0,0 +1,104 @@
+""" Test the performance regression gate benchmarks.bench_gate. """
+
+import argparse
+import os
+
+from moto import mock_s3
+import pytest
+
+from benchmarks.bench_gate import Regression, Scenario, compare, create_connector, parse_tolerance, run_scenario
+
+
+def _results(rows_per_second, peak_memory_bytes, s3_requests):
+    return {'scenarios': {'daily': {'xetra_etl': {
+        'rows_per_second': rows_per_second, 'peak_memory_bytes': peak_memory_bytes, 's3_requests': s3_requests
+    }}}}
+
+
+def test_compare_detects_regressions():
+    """ Test if a slower run, a higher peak memory and more S3 requests beyond their tolerances are regressions. """
+
+    baseline = _results(1000.0, 100_000, 20)
+
+    # Method execution
+
+    within_tolerance = compare(baseline, _results(800.0, 110_000, 20))
+    faster = compare(baseline, _results(5000.0, 50_000, 10))
+    regressions = compare(baseline, _results(700.0, 130_000, 21))
+    tolerated = compare(baseline, _results(700.0, 130_000, 21), {'rows_per_second': 0.5, 'peak_memory_bytes': 0.5})
+
+    # Test after method execution
+
+    assert within_tolerance == [] and faster == []
+    assert regressions == [
+        Regression('daily', 'xetra_etl', 'rows_per_second', 1000.0, 700.0, -0.3),
+        Regression('daily', 'xetra_etl', 'peak_memory_bytes', 100_000, 130_000, 0.3),
+        Regression('daily', 'xetra_etl', 's3_requests', 20, 21, 0.05)
+    ]
+    assert [regression.metric for regression in tolerated] == ['s3_requests']
+
+
+def test_compare_skips_missing_scenarios():
+    """ Test if scenarios and components missing in the baseline are not compared. """
+
+    current = _results(1.0, 10 ** 9, 10 ** 6)
+    current['scenarios']['small'] = current['scenarios']['daily']
+
+    # Method execution and test after method execution
+
+    assert compare({'scenarios': {}}, current) == []
+    assert [regression.scenario for regression in compare(_results(1.0, 10 ** 9, 1), current)] == ['daily']
+
+
+def test_parse_tolerance():
+    """ Test if the tolerances are parsed from metric=value arguments. """
+
+    assert parse_tolerance('rows_per_second=0.3') == ('rows_per_second', 0.3)
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_tolerance('latency=0.3')
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_tolerance('s3_requests=many')
+
+
+def test_run_scenario():
+    """ Test if a scenario measures the throughput, the peak memory and the S3 requests of both components. """
+
+    scenario = Scenario(isins=20, days=2, files_per_day=2, meta_years=1)
+
+    # Method execution
+
+    with mock_s3():
+        results = run_scenario('test', scenario, 'https://s3.eu-central-1.amazonaws.com', repeat=1)
+        results_again = run_scenario('test', scenario, 'https://s3.eu-central-1.amazonaws.com', repeat=1)
+
+    # Test after method execution
+
+    assert set(results) == {'xetra_etl', 'meta_process'}
+    for metrics in results.values():
+        assert metrics['rows_per_second'] > 0
+        assert metrics['peak_memory_bytes'] > 0
+        assert metrics['s3_requests'] > 0
+    # The request counts are deterministic, so the gate tolerates no change by default
+    for component in results:
+        assert results_again[component]['s3_requests'] == results[component]['s3_requests']
+
+
+def test_create_connector_leaves_environment(monkeypatch):
+    """ Test if a connector to the benchmark bucket is created without setting credentials in the environment. """
+
+    with mock_s3():
+        # The context is undone before moto restores its own environment
+        with monkeypatch.context() as patch:
+            patch.delenv('AWS_ACCESS_KEY_ID')
+            patch.delenv('AWS_SECRET_ACCESS_KEY')
+
+            # Method execution
+
+            connector = create_connector('https://s3.eu-central-1.amazonaws.com', 'bench-bucket')
+            connector.write_object('test.txt', b'content')
+
+            # Test after method execution
+
+            assert connector.read_object('test.txt') == b'content'
+            assert 'AWS_ACCESS_KEY_ID' not in os.environ
+            assert 'AWS_SECRET_ACCESS_KEY' not in os.environ
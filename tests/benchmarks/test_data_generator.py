@@ -0,0 +1,56 @@
+""" Test the synthetic Xetra data generator benchmarks.data_generator. """
+
+import pandas as pd
+import pytest
+
+from benchmarks.data_generator import SOURCE_COLUMNS, XetraDataGenerator
+
+
+def test_objects_layout_and_seed():
+    """ Test if the objects follow the Xetra key layout and the same seed generates the same data. """
+
+    generator = XetraDataGenerator(isins=50, files_per_day=3, seed=7)
+
+    # Method execution
+
+    objects = list(generator.objects('2022-11-18', 2))
+    objects_again = list(XetraDataGenerator(isins=50, files_per_day=3, seed=7).objects('2022-11-18', 2))
+
+    # Test after method execution
+
+    # 2022-11-18 is a Friday, the weekend is skipped
+    assert [key for key, _ in objects] == [
+        '2022-11-18/2022-11-18_BINS_XETR07.csv', '2022-11-18/2022-11-18_BINS_XETR08.csv',
+        '2022-11-18/2022-11-18_BINS_XETR09.csv', '2022-11-21/2022-11-21_BINS_XETR07.csv',
+        '2022-11-21/2022-11-21_BINS_XETR08.csv', '2022-11-21/2022-11-21_BINS_XETR09.csv'
+    ]
+    for (_, df), (_, df_again) in zip(objects, objects_again):
+        pd.testing.assert_frame_equal(df, df_again)
+    df = pd.concat([df for _, df in objects])
+    assert list(df.columns) == SOURCE_COLUMNS
+    assert (df['MinPrice'] <= df[['StartPrice', 'EndPrice']].min(axis=1)).all()
+    assert (df['MaxPrice'] >= df[['StartPrice', 'EndPrice']].max(axis=1)).all()
+    assert df['Time'].str.match(r'^(07|08|09):[0-5]\d$').all()
+    # The most liquid ISIN is traded in most of the minutes, the least liquid ones only occasionally
+    counts = df['ISIN'].value_counts()
+    assert counts.iloc[0] > 200 > counts.iloc[-1]
+    with pytest.raises(ValueError):
+        XetraDataGenerator(files_per_day=20)
+
+
+def test_write_summary():
+    """ Test if write puts every object and sums the rows and bytes. """
+
+    written = {}
+    generator = XetraDataGenerator(isins=20, files_per_day=2, seed=1)
+
+    # Method execution
+
+    summary = generator.write(written.__setitem__, '2022-11-14', 3)
+
+    # Test after method execution
+
+    assert summary.dates == ['2022-11-14', '2022-11-15', '2022-11-16']
+    assert summary.objects == len(written) == 6
+    assert summary.bytes == sum(len(body) for body in written.values())
+    assert summary.rows == sum(body.count(b'\n') - 1 for body in written.values())
@@ -0,0 +1,64 @@
+"""
+Test methods of CheckpointStore class.
+"""
+
+import pandas as pd
+import pytest
+
+from xetra.common.checkpoint import CheckpointStore
+from xetra.common.s3 import S3ObjectInfo
+from tests.common.s3_bucket_fixture import s3_bucket, my_s3_conn
+
+
+df_shard = pd.DataFrame(data={
+    'ISIN': ['AT0000A0E9W5', 'AT0000A0E9W5'],
+    'Date': ['2022-11-17', '2022-11-17'],
+    'EndPrice': [18.27, 21.19]
+})
+
+
+def test_fingerprint_changes_with_etag():
+    """
+    Tests if the fingerprint depends on the ETags but not on the order of the objects.
+    """
+    obj1 = S3ObjectInfo(key='2022-11-17/a.csv', etag='1', last_modified=None, size=1)
+    obj2 = S3ObjectInfo(key='2022-11-17/b.csv', etag='2', last_modified=None, size=1)
+    obj2_changed = obj2._replace(etag='3')
+
+    assert CheckpointStore.fingerprint([obj1, obj2]) == CheckpointStore.fingerprint([obj2, obj1])
+    assert CheckpointStore.fingerprint([obj1, obj2]) != CheckpointStore.fingerprint([obj1, obj2_changed])
+
+
+def test_load_save_local(tmp_path):
+    """
+    Tests saving and loading shards in a local directory.
+    """
+    store = CheckpointStore(prefix=f'{tmp_path}/')
+
+    assert store.load('parsed', '2022-11-17', 'abc') is None
+
+    store.save('parsed', '2022-11-17', 'abc', df_shard)
+    pd.testing.assert_frame_equal(store.load('parsed', '2022-11-17', 'abc'), df_shard)
+
+    # A shard with a new fingerprint replaces the old one
+    store.save('parsed', '2022-11-17', 'def', df_shard)
+    assert store.load('parsed', '2022-11-17', 'abc') is None
+
+    store.clear(['2022-11-17'])
+    assert store.load('parsed', '2022-11-17', 'def') is None
+
+
+@pytest.mark.parametrize('kind', ['parsed', 'aggregated'])
+def test_load_save_s3(my_s3_conn, kind):
+    """
+    Tests saving and loading shards in the S3 bucket.
+    """
+    store = CheckpointStore(prefix='checkpoints/', s3_bucket=my_s3_conn)
+
+    assert store.load(kind, '2022-11-17', 'abc') is None
+
+    store.save(kind, '2022-11-17', 'abc', df_shard)
+    pd.testing.assert_frame_equal(store.load(kind, '2022-11-17', 'abc'), df_shard)
+
+    store.clear(['2022-11-17'])
+    assert not my_s3_conn.list_files_in_prefix('checkpoints/')
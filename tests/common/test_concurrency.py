@@ -0,0 +1,125 @@
+""" Test methods of xetra.common.concurrency.AdaptiveConcurrencyLimiter. """
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from botocore.exceptions import ClientError
+import pytest
+
+from xetra.common.concurrency import AdaptiveConcurrencyLimiter
+from xetra.common.s3_config import S3ConcurrencyConfig
+
+
+class ThrottlingStore:
+    """
+    Local fake of a S3 prefix which answers with 503 SlowDown when more than `capacity` requests are in flight.
+    """
+
+    def __init__(self, capacity: int, latency: float = 0.002):
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def get_object(self, key: str) -> dict:
+        with self._lock:
+            self.in_flight += 1
+            overloaded = self.in_flight > self.capacity
+            self.throttled += int(overloaded)
+        try:
+            if overloaded:
+                raise ClientError(
+                    {'Error': {'Code': 'SlowDown', 'Message': 'Please reduce your request rate.'},
+                     'ResponseMetadata': {'HTTPStatusCode': 503}},
+                    'GetObject'
+                )
+            time.sleep(self.latency)
+            return {'Body': key.encode('utf-8'), 'ResponseMetadata': {'HTTPStatusCode': 200, 'RetryAttempts': 0}}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_call_backs_off_on_slow_down():
+    """ Test if the limit converges below the capacity of the store and all the requests succeed. """
+
+    store = ThrottlingStore(capacity=4)
+    limiter = AdaptiveConcurrencyLimiter(
+        S3ConcurrencyConfig(initial_limit=16, max_limit=32, max_attempts=20, backoff_base_seconds=0.001)
+    )
+
+    # Method execution
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        bodies = list(executor.map(lambda i: limiter.call(store.get_object, f'key{i}')['Body'], range(400)))
+
+    # Test after method execution
+
+    stats = limiter.stats()
+    assert bodies == [f'key{i}'.encode('utf-8') for i in range(400)]
+    assert stats.throttled == store.throttled > 0
+    assert stats.decreases >= 1
+    assert stats.requests == 400 + stats.throttled
+    assert stats.in_flight == 0
+    # AIMD oscillates around the capacity: the additive increase probes above it, the decrease halves the limit
+    assert stats.limit <= 2 * store.capacity
+    assert stats.backoff_seconds > 0
+
+
+def test_release_decreases_once_per_window():
+    """ Test if a burst of throttled attempts started before a decrease halves the limit only once. """
+
+    limiter = AdaptiveConcurrencyLimiter(S3ConcurrencyConfig(initial_limit=8))
+    epochs = [limiter.acquire() for _ in range(8)]
+
+    # Method execution
+
+    for epoch in epochs:
+        limiter.release(epoch, throttled=True)
+
+    # Test after method execution
+
+    assert limiter.stats()[:7] == (4, 0, 8, 8, 8, 1, 0)
+
+
+def test_release_increases_additively():
+    """ Test if the limit grows by one step after a window of successful attempts and the latency is a signal. """
+
+    limiter = AdaptiveConcurrencyLimiter(S3ConcurrencyConfig(initial_limit=2, latency_target_seconds=1.0))
+
+    # Method execution
+
+    for _ in range(2):
+        limiter.release(limiter.acquire(), latency=0.1)
+    limit_after_window = limiter.limit
+    # The moving average of the latency exceeds the target
+    limiter.release(limiter.acquire(), latency=10.0)
+
+    # Test after method execution
+
+    assert limit_after_window == 3
+    assert limiter.limit == 1
+    assert limiter.stats().throttled == 0
+
+
+def test_call_raises_other_errors_and_exhausted_attempts():
+    """ Test if not throttled errors are raised at once and throttled ones after the last attempt. """
+
+    sleeps = []
+    limiter = AdaptiveConcurrencyLimiter(S3ConcurrencyConfig(max_attempts=3), sleep=sleeps.append)
+    store = ThrottlingStore(capacity=0)
+
+    def not_found():
+        raise ClientError({'Error': {'Code': 'NoSuchKey'}, 'ResponseMetadata': {'HTTPStatusCode': 404}}, 'GetObject')
+
+    # Method execution and tests
+
+    with pytest.raises(ClientError, match='NoSuchKey'):
+        limiter.call(not_found)
+    assert not sleeps
+    with pytest.raises(ClientError, match='SlowDown'):
+        limiter.call(store.get_object, 'key')
+    assert len(sleeps) == 2
+    assert limiter.stats().throttled == 3
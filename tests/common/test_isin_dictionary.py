@@ -0,0 +1,87 @@
+"""
+Test methods of IsinDictionary class.
+"""
+
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from xetra.common.custom_exceptions import LeaseNotAcquiredException
+from xetra.common.isin_dictionary import IsinDictionary
+from tests.common.s3_bucket_fixture import s3_bucket, my_s3_conn
+
+
+def test_encode_decode(my_s3_conn):
+    """
+    Tests if the ISINs are encoded as int32 codes, persisted and decoded back, and known ISINs keep their codes.
+    """
+    dictionary = IsinDictionary(my_s3_conn, 'dictionary/isin_codes.csv')
+
+    # Method execution
+    codes = dictionary.encode(['DE000A0D6554', 'AT0000A0E9W5', 'DE000A0D6554'])
+    codes_again = IsinDictionary(my_s3_conn, 'dictionary/isin_codes.csv').encode(['AT0000A0E9W5', 'DE0005772206'])
+
+    # Tests after method execution
+    assert codes.dtype == np.int32
+    assert codes.tolist() == [0, 1, 0]
+    assert codes_again.tolist() == [1, 2]
+    assert dictionary.decode(codes_again).tolist() == ['AT0000A0E9W5', 'DE0005772206']
+    df_stored = my_s3_conn.read_csv_to_df('dictionary/isin_codes.csv')
+    assert df_stored.values.tolist() == [[0, 'DE000A0D6554'], [1, 'AT0000A0E9W5'], [2, 'DE0005772206']]
+
+
+def test_encode_decode_column(my_s3_conn):
+    """
+    Tests if rows without an ISIN are dropped and already encoded or decoded columns are kept.
+    """
+    dictionary = IsinDictionary(my_s3_conn, 'dictionary/isin_codes.parquet')
+    df = pd.DataFrame({'ISIN': ['DE000A0D6554', None, 'AT0000A0E9W5'], 'Volume': [1, 2, 3]})
+
+    # Method execution
+    df_encoded = dictionary.encode_column(df, 'ISIN')
+    df_decoded = dictionary.decode_column(df_encoded, 'ISIN')
+
+    # Tests after method execution
+    assert df_encoded['ISIN'].tolist() == [0, 1] and df_encoded['Volume'].tolist() == [1, 3]
+    assert dictionary.encode_column(df_encoded, 'ISIN') is df_encoded
+    assert df_decoded['ISIN'].tolist() == ['DE000A0D6554', 'AT0000A0E9W5']
+    assert dictionary.decode_column(df_decoded, 'ISIN') is df_decoded
+    assert len(my_s3_conn.read_parquet_to_df('dictionary/isin_codes.parquet')) == 2
+
+
+def test_concurrent_append(my_s3_conn):
+    """
+    Tests if ISINs appended by another process keep their codes and are decoded by a dictionary read earlier.
+    """
+    dictionary1 = IsinDictionary(my_s3_conn, 'dictionary/isin_codes.csv')
+    dictionary2 = IsinDictionary(my_s3_conn, 'dictionary/isin_codes.csv')
+    dictionary1.encode(['DE000A0D6554'])
+    dictionary2.encode(['DE000A0D6554'])
+
+    # Method execution
+    codes2 = dictionary2.encode(['AT0000A0E9W5'])
+    codes1 = dictionary1.encode(['DE0005772206'])
+
+    # Tests after method execution
+    assert (codes2.tolist(), codes1.tolist()) == ([1], [2])
+    assert dictionary1.decode([1]).tolist() == ['AT0000A0E9W5']
+    assert dictionary2.decode([2]).tolist() == ['DE0005772206']
+
+
+def test_append_lease_held(s3_bucket, my_s3_conn):
+    """
+    Tests if new ISINs are not appended while another process holds the lease of the dictionary.
+    """
+    # Test init
+    s3_bucket.put_object(
+        Body=json.dumps({'owner': 'other', 'expires_at': time.time() + 60}), Key='dictionary/isin_codes.lock'
+    )
+    dictionary = IsinDictionary(my_s3_conn, 'dictionary/isin_codes.csv', max_retries=2, retry_seconds=0)
+
+    # Method execution and tests after method execution
+    with pytest.raises(LeaseNotAcquiredException):
+        dictionary.encode(['DE000A0D6554'])
+    assert len(dictionary) == 0
@@ -0,0 +1,56 @@
+"""
+Test methods of S3Lease class.
+"""
+
+import json
+import time
+
+import pytest
+
+from xetra.common.custom_exceptions import LeaseNotAcquiredException
+from xetra.common.lease import S3Lease
+from tests.common.s3_bucket_fixture import s3_bucket, my_s3_conn
+
+
+def test_acquire_release(my_s3_conn):
+    """
+    Tests if only one owner holds the lease at a time and it can be acquired again after release.
+    """
+    lease1 = S3Lease(my_s3_conn, 'locks/test.lock', owner='worker1', settle_seconds=0)
+    lease2 = S3Lease(my_s3_conn, 'locks/test.lock', owner='worker2', settle_seconds=0)
+
+    assert lease1.acquire()
+    assert not lease2.acquire()
+    assert lease1.renew()
+
+    lease1.release()
+    assert lease2.acquire()
+    assert not lease1.renew()
+
+
+def test_acquire_expired(s3_bucket, my_s3_conn):
+    """
+    Tests if an expired lease of a crashed owner is taken over.
+    """
+    # Test init
+    s3_bucket.put_object(
+        Body=json.dumps({'owner': 'crashed', 'expires_at': time.time() - 1}), Key='locks/test.lock'
+    )
+
+    # Method execution
+    lease = S3Lease(my_s3_conn, 'locks/test.lock', owner='worker1', settle_seconds=0)
+
+    # Tests after method execution
+    assert lease.acquire()
+
+
+def test_context_manager(my_s3_conn):
+    """
+    Tests if the context manager releases the lease and raises when the lease is held by someone else.
+    """
+    with S3Lease(my_s3_conn, 'locks/test.lock', owner='worker1', settle_seconds=0):
+        with pytest.raises(LeaseNotAcquiredException):
+            with S3Lease(my_s3_conn, 'locks/test.lock', owner='worker2', settle_seconds=0):
+                pass
+
+    assert my_s3_conn.list_files_in_prefix('locks/') == []
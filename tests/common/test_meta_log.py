@@ -0,0 +1,215 @@
+"""
+Test methods of MetaLog class.
+"""
+
+import pandas as pd
+import pytest
+
+from xetra.common.custom_exceptions import WrongMetaFileException
+from xetra.common.lease import S3Lease
+from xetra.common.meta_log import MetaLog
+from tests.common.s3_bucket_fixture import s3_bucket, my_s3_conn
+
+
+columns = ['source_date', 'datetime_of_processing']
+
+
+def meta_rows(dates):
+    return pd.DataFrame(data={'source_date': dates, 'datetime_of_processing': ['2022-11-27'] * len(dates)})
+
+
+def test_read_no_log(my_s3_conn):
+    """
+    Tests if read returns None when there is no log in the bucket.
+    """
+    meta_log = MetaLog(my_s3_conn, 'meta/meta_file.csv', columns)
+
+    assert meta_log.read() is None
+
+
+def test_append_writes_segments(my_s3_conn):
+    """
+    Tests if every append writes one new segment and nothing else.
+    """
+    # Test init
+    meta_log = MetaLog(my_s3_conn, 'meta/meta_file.csv', columns, compact_every=10)
+
+    # Method execution
+    meta_log.append(meta_rows(['2022-11-24']))
+    meta_log.append(meta_rows(['2022-11-25', '2022-11-26']))
+
+    # Tests after method execution
+    parts = meta_log.parts()
+    assert parts.legacy_key is None
+    assert parts.snapshot_key is None
+    assert len(parts.segment_keys) == 2
+    assert all(key.startswith('meta/meta_file/segments/') for key in parts.segment_keys)
+    assert meta_log.read()['source_date'].tolist() == ['2022-11-24', '2022-11-25', '2022-11-26']
+
+
+def test_append_compacts(my_s3_conn):
+    """
+    Tests if the segments are compacted into the snapshot after `compact_every` appends.
+    """
+    # Test init
+    meta_log = MetaLog(my_s3_conn, 'meta/meta_file.csv', columns, compact_every=3)
+    dates = ['2022-11-22', '2022-11-23', '2022-11-24', '2022-11-25']
+
+    # Method execution
+    for date in dates:
+        meta_log.append(meta_rows([date]))
+
+    # Tests after method execution
+    parts = meta_log.parts()
+    assert parts.snapshot_key == 'meta/meta_file/snapshot.parquet'
+    assert len(parts.segment_keys) == 1
+    assert meta_log.read()['source_date'].tolist() == dates
+
+
+def test_append_migrates_legacy_meta_file(s3_bucket, my_s3_conn):
+    """
+    Tests if a meta file stored as a single csv is folded into the snapshot.
+    """
+    # Test init
+    s3_bucket.put_object(Body='source_date,datetime_of_processing\n2022-11-22,2022-11-23', Key='meta/meta_file.csv')
+    meta_log = MetaLog(my_s3_conn, 'meta/meta_file.csv', columns)
+
+    # Method execution
+    meta_log.append(meta_rows(['2022-11-24']))
+
+    # Tests after method execution
+    parts = meta_log.parts()
+    assert parts.legacy_key is None
+    assert parts.segment_keys == []
+    assert meta_log.read()['source_date'].tolist() == ['2022-11-22', '2022-11-24']
+
+
+def test_compact_wrong_columns(my_s3_conn):
+    """
+    Tests if compact raises an exception when a segment has different columns.
+    """
+    # Test init
+    meta_log = MetaLog(my_s3_conn, 'meta/meta_file.csv', columns)
+    my_s3_conn.write_df_to_s3(
+        pd.DataFrame(data={'wrong_col': ['2022-11-24']}), f'{meta_log.segments_prefix}20221124000000_wrong.csv', 'csv'
+    )
+
+    # Method execution
+    with pytest.raises(WrongMetaFileException):
+        meta_log.compact()
+
+
+def test_append_wrong_columns(my_s3_conn):
+    """
+    Tests if append raises an exception for rows with different columns and writes nothing.
+    """
+    # Test init
+    meta_log = MetaLog(my_s3_conn, 'meta/meta_file.csv', columns)
+
+    # Method execution
+    with pytest.raises(WrongMetaFileException):
+        meta_log.append(pd.DataFrame(data={'wrong_col': ['2022-11-24']}))
+
+    # Tests after method execution
+    assert meta_log.read() is None
+
+
+def test_parts_ignores_keys_sharing_the_name(s3_bucket, my_s3_conn, monkeypatch):
+    """
+    Tests if parts lists only the log's own prefix, not the objects of other keys starting with the same name.
+    """
+    # Test init
+    s3_bucket.put_object(Body='a,b\n1,2', Key='meta/meta_file_objects/2022-11-24.csv')
+    meta_log = MetaLog(my_s3_conn, 'meta/meta_file.csv', columns)
+    meta_log.append(meta_rows(['2022-11-24']))
+    list_objects_in_prefix = my_s3_conn.list_objects_in_prefix
+    prefixes = []
+
+    def list_and_record(prefix):
+        prefixes.append(prefix)
+        return list_objects_in_prefix(prefix)
+
+    monkeypatch.setattr(my_s3_conn, 'list_objects_in_prefix', list_and_record)
+
+    # Method execution
+    parts = meta_log.parts()
+
+    # Tests after method execution
+    assert prefixes == ['meta/meta_file/']
+    assert parts.legacy_key is None
+    assert len(parts.segment_keys) == 1
+    assert parts.segment_keys[0].startswith('meta/meta_file/segments/')
+
+
+def test_append_while_other_process_compacts(my_s3_conn):
+    """
+    Tests if an append due for compaction writes a segment, when another process holds the compaction lease.
+    """
+    # Test init
+    meta_log = MetaLog(my_s3_conn, 'meta/meta_file.csv', columns, compact_every=2)
+    meta_log.append(meta_rows(['2022-11-24']))
+    other_lease = S3Lease(my_s3_conn, meta_log.lock_key, owner='other-worker', settle_seconds=0)
+    assert other_lease.acquire()
+
+    # Method execution
+    meta_log.append(meta_rows(['2022-11-25']))
+
+    # Tests after method execution
+    parts = meta_log.parts()
+    assert parts.snapshot_key is None
+    assert len(parts.segment_keys) == 2
+    assert meta_log.read()['source_date'].tolist() == ['2022-11-24', '2022-11-25']
+
+
+def test_compact_snapshot_replaced_concurrently(my_s3_conn, monkeypatch):
+    """
+    Tests if the compaction is retried, when the snapshot is replaced between reading and writing it,
+    so no rows written by the other process are lost.
+    """
+    # Test init
+    meta_log = MetaLog(my_s3_conn, 'meta/meta_file.csv', columns, compact_every=100)
+    meta_log.append(meta_rows(['2022-11-24']))
+    meta_log.compact()
+
+    # The other process replaces the snapshot right after the first read
+    other_log = MetaLog(my_s3_conn, 'meta/meta_file.csv', columns)
+    read = meta_log.read
+    calls = []
+
+    def read_and_replace(parts=None):
+        df = read(parts)
+        if not calls:
+            calls.append(1)
+            my_s3_conn.write_df_to_s3(
+                pd.concat([other_log.read(), meta_rows(['2022-11-25'])]), other_log.snapshot_key, 'parquet'
+            )
+        return df
+
+    monkeypatch.setattr(meta_log, 'read', read_and_replace)
+
+    # Method execution
+    meta_log.compact(meta_rows(['2022-11-26']))
+
+    # Tests after method execution
+    assert len(calls) == 1
+    assert sorted(other_log.read()['source_date'].tolist()) == ['2022-11-24', '2022-11-25', '2022-11-26']
+
+
+def test_read_segment_compacted_concurrently(my_s3_conn):
+    """
+    Tests if read lists the log again, when a listed segment is merged and deleted by a concurrent compaction.
+    """
+    # Test init
+    meta_log = MetaLog(my_s3_conn, 'meta/meta_file.csv', columns, compact_every=100)
+    meta_log.append(meta_rows(['2022-11-24']))
+    meta_log.append(meta_rows(['2022-11-25']))
+    parts = meta_log.parts()
+    # The other process compacts the log after it was listed
+    MetaLog(my_s3_conn, 'meta/meta_file.csv', columns).compact()
+    assert meta_log.parts().segment_keys == []
+
+    # Method execution
+    df = meta_log.read(parts)
+
+    # Tests after method execution
+    assert df['source_date'].tolist() == ['2022-11-24', '2022-11-25']
@@ -6,13 +6,15 @@ from datetime import datetime, timedelta
 import logging
 from typing import Union
 
+import numpy as np
 import pandas as pd
 import pytest
 
 from xetra.common.constants import MetaProcessFormat
 from xetra.common.custom_exceptions import WrongMetaFileException
 from xetra.common.meta_process import MetaProcess
-from xetra.common.s3 import S3BucketConnector
+from xetra.common.s3 import S3BucketConnector, S3ObjectInfo
+from xetra.common.trading_calendar import TradingCalendar
 from tests.common.s3_bucket_fixture import s3_access_key, s3_secret_key, s3_endpoint_url, s3_bucket_name, s3_bucket
 
 
@@ -37,7 +39,7 @@ def test_update_meta_file_no_previous_meta_file(s3_bucket):
 
     # Test after method execution
 
-    meta_file_read = s3_bucket_conn.read_csv_to_df(meta_file_key)  # load the meta file back from the bucket
+    meta_file_read = MetaProcess.read_meta_file(s3_bucket_conn, meta_file_key)  # load the meta file back from the bucket
     date_list_result = meta_file_read[MetaProcessFormat.META_SOURCE_DATE_COL.value].tolist()
     proc_date_list_result = pd.to_datetime(
         meta_file_read[MetaProcessFormat.META_PROCESS_COL.value]
@@ -79,7 +81,7 @@ def test_update_meta_file_ok(s3_bucket):
 
     # Load the meta file back from the bucket
 
-    meta_file_read = s3_bucket_conn.read_csv_to_df(meta_file_key)  # load the meta file back from the bucket
+    meta_file_read = MetaProcess.read_meta_file(s3_bucket_conn, meta_file_key)  # load the meta file back from the bucket
     date_list_result = meta_file_read[MetaProcessFormat.META_SOURCE_DATE_COL.value].tolist()
     proc_date_list_result = pd.to_datetime(
         meta_file_read[MetaProcessFormat.META_PROCESS_COL.value]
@@ -334,3 +336,88 @@ def test_return_date_list_wrong_col_names(s3_bucket):
 
     with pytest.raises(KeyError):
         return_min_date, return_dates = MetaProcess().return_date_list(s3_bucket_conn, first_date, meta_file_key)
+
+
+def test_date_list_from_meta_long_history():
+    """
+    Test date_list_from_meta on a multi-year meta file with a few unprocessed days.
+    """
+    # Test init - all the days of the last three years are processed, except of two of them
+
+    first_date = (datetime.today() - timedelta(days=3 * 365)).date().strftime(MetaProcessFormat.META_DATE_FORMAT.value)
+    dates_all = dates_range(start=first_date)
+    missing = [dates_all[100], dates_all[500]]
+    df_meta = pd.DataFrame(data={
+        MetaProcessFormat.META_SOURCE_DATE_COL.value: [date for date in dates_all if date not in missing],
+        MetaProcessFormat.META_PROCESS_COL.value: datetime.today().strftime(MetaProcessFormat.META_DATE_FORMAT.value)
+    })
+
+    # Method execution
+
+    return_min_date, return_dates = MetaProcess.date_list_from_meta(df_meta, first_date)
+
+    # Test after method execution
+
+    assert return_min_date == missing[0]
+    assert return_dates == dates_all[99:]
+
+
+def test_date_list_from_meta_trading_calendar():
+    """
+    Test date_list_from_meta with a trading calendar. Weekends and holidays are skipped and the day before the first
+    unprocessed date is the previous trading day.
+    """
+    # Test init - 2022-04-14 is processed, 2022-04-15 and 2022-04-18 are Good Friday and Easter Monday
+
+    first_date = '2022-04-13'
+    calendar = TradingCalendar.xetra()
+    df_meta = pd.DataFrame(data={
+        MetaProcessFormat.META_SOURCE_DATE_COL.value: ['2022-04-13', '2022-04-14'],
+        MetaProcessFormat.META_PROCESS_COL.value: ['2022-04-14', '2022-04-14']
+    })
+    today = np.datetime64(datetime.today().date(), 'D')
+    trading_days_exp = np.datetime_as_string(calendar.trading_days('2022-04-14', today), unit='D').tolist()
+
+    # Method execution
+
+    return_min_date, return_dates = MetaProcess.date_list_from_meta(df_meta, first_date, calendar)
+
+    # Test after method execution
+
+    assert return_min_date == '2022-04-19'
+    assert return_dates[:2] == ['2022-04-14', '2022-04-19']
+    assert return_dates == trading_days_exp
+
+
+def test_return_changed_objects(s3_bucket):
+    """
+    Test return_changed_objects. New and changed objects of recorded dates are returned, dates without any
+    recorded object are skipped.
+    """
+    # Test init
+
+    meta_file_key = 'metafile.csv'
+    s3_bucket_conn = S3BucketConnector(
+        s3_access_key, s3_secret_key, s3_endpoint_url, s3_bucket_name
+    )
+    obj1 = S3ObjectInfo(key='2022-11-17/a.csv', etag='1', last_modified=None, size=1)
+    obj2 = S3ObjectInfo(key='2022-11-17/b.csv', etag='2', last_modified=None, size=1)
+    obj3 = S3ObjectInfo(key='2022-11-18/a.csv', etag='3', last_modified=None, size=1)
+    obj_legacy = S3ObjectInfo(key='2022-11-16/a.csv', etag='4', last_modified=None, size=1)
+
+    assert MetaProcess.return_changed_objects(s3_bucket_conn, meta_file_key, {'2022-11-17': [obj1]}) == {}
+
+    MetaProcess.update_object_meta_file(s3_bucket_conn, meta_file_key, {'2022-11-17': [obj1, obj2]})
+    MetaProcess.update_object_meta_file(s3_bucket_conn, meta_file_key, {'2022-11-18': [obj3]})
+
+    # Method execution
+
+    changed = MetaProcess.return_changed_objects(s3_bucket_conn, meta_file_key, {
+        '2022-11-16': [obj_legacy],
+        '2022-11-17': [obj1, obj2._replace(etag='5'), obj3._replace(key='2022-11-17/c.csv')],
+        '2022-11-18': [obj3]
+    })
+
+    # Test after method execution
+
+    assert changed == {'2022-11-17': [obj2._replace(etag='5'), obj3._replace(key='2022-11-17/c.csv')]}
@@ -0,0 +1,114 @@
+""" Test methods of xetra.common.metrics.MetricsRegistry. """
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+
+import pytest
+
+from xetra.common.metrics import MetricsRegistry
+
+
+def test_stage_accumulates_observations():
+    """ Test if the calls of a stage from several threads are summed and the rates are derived. """
+
+    metrics = MetricsRegistry()
+
+    def download(size):
+        with metrics.stage('download') as observation:
+            observation.add(objects=1, size=size)
+
+    # Method execution
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(download, range(100)))
+    metrics.observe('parse', seconds=2.0, objects=100, size=4950, rows_out=1000)
+    with pytest.raises(ValueError):
+        with metrics.stage('transform') as observation:
+            observation.add(rows_in=10)
+            raise ValueError
+
+    # Test after method execution
+
+    download, parse, transform = metrics.stages()
+    assert (download.stage, download.calls, download.objects, download.bytes) == ('download', 100, 100, 4950)
+    assert parse.rows_per_second == 500.0
+    assert parse.bytes_per_second == 2475.0
+    # A failed call is recorded as well, the rate falls back to the rows entering the stage
+    assert (transform.calls, transform.rows_in, transform.rows_out) == (1, 10, 0)
+    assert transform.rows_per_second > 0
+
+
+def test_write_json_and_prometheus(tmp_path):
+    """ Test if the metrics are written as JSON and in the Prometheus text format. """
+
+    metrics = MetricsRegistry()
+    metrics.observe('upload', seconds=0.5, objects=2, size=1000)
+    metrics.set_gauge('s3_concurrency_limit', 16, 'Limit of the S3 requests in flight at the end.')
+
+    # Method execution
+
+    metrics.write_json(str(tmp_path / 'metrics' / 'job.json'))
+    metrics.write_prometheus(str(tmp_path / 'job.prom'))
+
+    # Test after method execution
+
+    result = json.loads((tmp_path / 'metrics' / 'job.json').read_text())
+    assert result['stages'][0]['bytes_per_second'] == 2000.0
+    assert result['gauges'] == {'s3_concurrency_limit': 16}
+    lines = (tmp_path / 'job.prom').read_text().splitlines()
+    assert '# TYPE xetra_stage_bytes_total counter' in lines
+    assert 'xetra_stage_bytes_total{stage="upload"} 1000' in lines
+    assert '# TYPE xetra_stage_bytes_per_second gauge' in lines
+    assert 'xetra_stage_seconds_total{stage="upload"} 0.5' in lines
+    assert lines[-3:] == [
+        '# HELP xetra_s3_concurrency_limit Limit of the S3 requests in flight at the end.',
+        '# TYPE xetra_s3_concurrency_limit gauge',
+        'xetra_s3_concurrency_limit 16'
+    ]
+    assert [path.name for path in tmp_path.iterdir() if path.is_file()] == ['job.prom']
+
+
+def test_labelled_gauges():
+    """ Test if the values of a gauge with different labels are written under one HELP and TYPE line. """
+
+    metrics = MetricsRegistry()
+
+    # Method execution
+
+    metrics.set_gauge('s3_requests', 3, 'Number of the S3 requests of the run.', {'operation': 'GetObject'})
+    metrics.set_gauge('s3_requests', 1, 'Number of the S3 requests of the run.', {'operation': 'ListObjects'})
+    metrics.set_gauge('s3_requests', 4, 'Number of the S3 requests of the run.', {'operation': 'GetObject'})
+
+    # Test after method execution
+
+    assert metrics.gauges() == {
+        's3_requests{operation="GetObject"}': 4,
+        's3_requests{operation="ListObjects"}': 1
+    }
+    assert metrics.to_prometheus().splitlines()[-4:] == [
+        '# HELP xetra_s3_requests Number of the S3 requests of the run.',
+        '# TYPE xetra_s3_requests gauge',
+        'xetra_s3_requests{operation="GetObject"} 4',
+        'xetra_s3_requests{operation="ListObjects"} 1'
+    ]
+
+
+def test_merge_stages():
+    """ Test if the stages of another registry are added to the counters of the same stages. """
+
+    metrics = MetricsRegistry()
+    metrics.observe('download', seconds=1.0, objects=2, size=100)
+    worker_metrics = MetricsRegistry()
+    worker_metrics.observe('download', seconds=3.0, objects=1, size=300)
+    worker_metrics.observe('parse', seconds=0.5, rows_out=10)
+
+    # Method execution
+
+    metrics.merge(worker_metrics.stages())
+
+    # Test after method execution
+
+    download, parse = metrics.stages()
+    assert (download.calls, download.seconds, download.objects, download.bytes) == (2, 4.0, 3, 400)
+    assert download.bytes_per_second == 100.0
+    assert (parse.stage, parse.calls, parse.rows_out) == ('parse', 1, 10)
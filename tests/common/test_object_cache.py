@@ -0,0 +1,24 @@
+"""
+Test methods of LocalObjectCache class.
+"""
+
+from xetra.common.object_cache import CachedObject, LocalObjectCache
+
+
+def test_put_get_discard(tmp_path):
+    """
+    Tests storing, replacing and removing objects in the cache.
+    """
+    cache = LocalObjectCache(str(tmp_path / 'cache'))
+
+    assert cache.get('bucket', 'meta/meta_file.csv') is None
+
+    cache.put('bucket', 'meta/meta_file.csv', 'etag1', b'content1')
+    cache.put('bucket', 'meta/meta_file.csv', 'etag2', b'content2')
+    assert cache.get('bucket', 'meta/meta_file.csv') == CachedObject(etag='etag2', body=b'content2')
+
+    # The same key in another bucket is a different object
+    assert cache.get('other-bucket', 'meta/meta_file.csv') is None
+
+    cache.discard('bucket', 'meta/meta_file.csv')
+    assert cache.get('bucket', 'meta/meta_file.csv') is None
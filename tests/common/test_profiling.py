@@ -0,0 +1,100 @@
+""" Test methods of xetra.common.profiling.MemoryProfiler and CpuProfiler. """
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import pstats
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from xetra.common.metrics import MetricsRegistry
+from xetra.common.profiling import CpuProfiler, MemoryProfiler
+
+
+def test_memory_profiler_checkpoints(tmp_path):
+    """ Test if the checkpoints record the allocations of every stage and the report is rewritten after each. """
+
+    path = tmp_path / 'memory.json'
+    profiler = MemoryProfiler(path=str(path), top=3)
+
+    # Method execution
+
+    profiler.start()
+    df = pd.DataFrame({'isin': ['AT0000A0E9W5'] * 100_000, 'price': np.arange(100_000, dtype='float64')})
+    profiler.checkpoint('extract', df=df)
+    report_after_extract = json.loads(path.read_text())
+    del df
+    df_small = pd.DataFrame({'price': np.zeros(10)})
+    profiler.checkpoint('transform', df=df_small, missing=None)
+    profiler.stop()
+
+    # Test after method execution
+
+    start, extract, transform = profiler.checkpoints
+    assert not tracemalloc.is_tracing()
+    assert [checkpoint['stage'] for checkpoint in report_after_extract['checkpoints']] == ['start', 'extract']
+    assert start.stage == 'start'
+    # The price column alone takes 800 kB, the ISIN strings much more with deep=True
+    assert extract.dataframes['df'] > 800_000 + 100_000 * 50
+    assert extract.traced_peak_bytes >= 800_000
+    assert extract.top_allocators[0]['size_diff_bytes'] >= 800_000
+    assert len(extract.top_allocators) == 3
+    assert transform.dataframes == {'df': df_small.memory_usage(deep=True).sum()}
+    assert transform.traced_bytes < extract.traced_bytes
+    assert extract.peak_rss_bytes >= extract.rss_bytes > 0
+    assert json.loads(path.read_text())['peak_rss_bytes'] == transform.peak_rss_bytes
+
+
+def _busy_parse(n):
+    return pd.DataFrame({'price': np.arange(n)}).astype(str)['price'].str.len().sum()
+
+
+def test_cpu_profiler_stages(tmp_path):
+    """ Test if the stages of a metrics registry are profiled per stage in all the threads, nested stages apart. """
+
+    metrics = MetricsRegistry()
+    profiler = CpuProfiler(str(tmp_path), prefix='cpu_run', interval=0.001)
+    metrics.profiler = profiler
+
+    def parse(n):
+        with metrics.stage('parse'):
+            return _busy_parse(n)
+
+    # Method execution
+
+    profiler.start()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(parse, [200_000] * 4))
+    with metrics.stage('aggregate'):
+        _busy_parse(100_000)
+        with metrics.stage('upload'):
+            json.dumps({'rows': list(range(1000))})
+    paths = profiler.stop()
+
+    # Test after method execution
+
+    assert [stage.calls for stage in metrics.stages()] == [4, 1, 1]
+    assert sorted(path.name for path in tmp_path.iterdir() if path.suffix == '.pstats') == [
+        'cpu_run_aggregate.pstats', 'cpu_run_parse.pstats', 'cpu_run_upload.pstats'
+    ]
+    functions = {function for _, _, function in pstats.Stats(str(tmp_path / 'cpu_run_parse.pstats')).stats}
+    assert '_busy_parse' in functions
+    # The profiles of the 4 calls are merged into a single aggregate of the stage as the calls end
+    assert sorted(profiler._stats) == ['aggregate', 'parse', 'upload']
+    parse_calls = [
+        calls for (_, _, function), (_, calls, _, _, _) in profiler._stats['parse'].stats.items()
+        if function == '_busy_parse'
+    ]
+    assert parse_calls == [4]
+    # The nested stage is not part of the profile of the outer one
+    aggregate = {function for _, _, function in pstats.Stats(str(tmp_path / 'cpu_run_aggregate.pstats')).stats}
+    upload = {function for _, _, function in pstats.Stats(str(tmp_path / 'cpu_run_upload.pstats')).stats}
+    assert '_busy_parse' in aggregate
+    assert 'dumps' in upload
+    assert 'dumps' not in aggregate
+    collapsed = (tmp_path / 'cpu_run_parse.collapsed').read_text().splitlines()
+    assert collapsed
+    assert all(';' in line and line.rsplit(' ', 1)[1].isdigit() for line in collapsed)
+    assert any('_busy_parse' in line for line in collapsed)
+    assert str(tmp_path / 'cpu_run_parse.collapsed') in paths
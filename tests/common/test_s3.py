@@ -6,8 +6,9 @@ import logging
 import pandas as pd
 import pytest
 
-from xetra.common.s3 import S3BucketConnector
+from xetra.common.s3 import S3BucketConnector, S3ClientConfig, S3ConcurrencyConfig, S3ConnectorFactory
 from xetra.common.custom_exceptions import WrongFormatException
+from xetra.common.object_cache import LocalObjectCache
 from tests.common.s3_bucket_fixture import s3_access_key, s3_secret_key, s3_endpoint_url, s3_bucket_name, s3_bucket, my_s3_conn
 
 
@@ -214,3 +215,226 @@ def test_write_df_to_s3_wrong_file_format(s3_bucket):
     # Method execution
     with pytest.raises(WrongFormatException):
         s3_bucket_conn.write_df_to_s3(df, key=key_on_s3, file_format='jpg')
+
+
+def test_list_objects_in_prefix_ok(s3_bucket, my_s3_conn):
+    """
+    Tests the list_objects_in_prefix method if it returns keys together with ETags and sizes.
+    """
+    # Expected results
+    key_exp = 'prefix/test1.csv'
+    csv_content = 'col1,col2\nvalA,valB'
+    etag_exp = s3_bucket.put_object(Body=csv_content, Key=key_exp).e_tag.strip('"')
+
+    # Method execution
+    list_result = my_s3_conn.list_objects_in_prefix('prefix/')
+
+    # Tests after method execution
+    assert len(list_result) == 1
+    assert list_result[0].key == key_exp
+    assert list_result[0].etag == etag_exp
+    assert list_result[0].size == len(csv_content)
+
+
+def test_read_parquet_to_df(s3_bucket, my_s3_conn):
+    """
+    Test if a parquet file written by write_df_to_s3 is read back by read_parquet_to_df.
+    """
+    # Expected results
+    df_exp = pd.DataFrame(data={
+        'col1': ['valA', 'valC'],
+        'col2': [1, 2]
+    })
+    key_on_s3 = 'test.parquet'
+
+    # Method execution
+    my_s3_conn.write_df_to_s3(df_exp, key=key_on_s3, file_format='parquet')
+    df_result = my_s3_conn.read_parquet_to_df(key_on_s3)
+
+    # Tests after method execution
+    pd.testing.assert_frame_equal(df_exp, df_result)
+
+
+def test_delete_files(s3_bucket, my_s3_conn):
+    """
+    Test if delete_files removes only the given keys.
+    """
+    # Test init
+    s3_bucket.put_object(Body='a', Key='prefix/test1.csv')
+    s3_bucket.put_object(Body='b', Key='prefix/test2.csv')
+
+    # Method execution
+    my_s3_conn.delete_files(['prefix/test1.csv'])
+
+    # Tests after method execution
+    assert my_s3_conn.list_files_in_prefix('prefix/') == ['prefix/test2.csv']
+
+
+def test_read_object_cached_not_modified(s3_bucket, tmp_path):
+    """
+    Test if a cached read of an unchanged object uses the cached content (S3 answers 304 Not Modified)
+    and if a changed object is downloaded again.
+    """
+    # Test init
+    key = 'meta.csv'
+    s3_bucket.put_object(Body=b'col1\nvalA', Key=key)
+    cache = LocalObjectCache(str(tmp_path))
+    s3_bucket_conn = S3BucketConnector(
+        s3_access_key, s3_secret_key, s3_endpoint_url, s3_bucket_name, cache=cache
+    )
+
+    # Method execution - the first read fills the cache
+    assert s3_bucket_conn.read_object(key, cached=True) == b'col1\nvalA'
+
+    # Replace the cached content, so it is visible whether the body was downloaded or taken from the cache
+    cache.put(s3_bucket_name, key, cache.get(s3_bucket_name, key).etag, b'from cache')
+    assert s3_bucket_conn.read_object(key, cached=True) == b'from cache'
+
+    # The object changes -> its new content is downloaded
+    s3_bucket.put_object(Body=b'col1\nvalB', Key=key)
+    assert s3_bucket_conn.read_object(key, cached=True) == b'col1\nvalB'
+
+
+def test_read_object_immutable(s3_bucket, tmp_path):
+    """
+    Test if a cached immutable object is returned without any request and a written object is cached.
+    """
+    # Test init
+    key = 'segment.csv'
+    cache = LocalObjectCache(str(tmp_path))
+    s3_bucket_conn = S3BucketConnector(
+        s3_access_key, s3_secret_key, s3_endpoint_url, s3_bucket_name, cache=cache
+    )
+    df = pd.DataFrame(data={'col1': ['valA']})
+    s3_bucket_conn.write_df_to_s3(df, key=key, file_format='csv', cached=True)
+
+    # Method execution - the object is removed from S3, but it is still read from the cache
+    s3_bucket.Object(key).delete()
+    df_result = s3_bucket_conn.read_csv_to_df(key, cached=True, immutable=True)
+
+    # Tests after method execution
+    pd.testing.assert_frame_equal(df_result, df)
+
+
+def test_connector_factory_shares_client(s3_bucket):
+    """
+    Tests if the connectors created by the factory share one configured client.
+    """
+    # Test init
+    s3_bucket.put_object(Body='col1,col2\nvalA,valB', Key='test.csv')
+    factory = S3ConnectorFactory(
+        s3_access_key, s3_secret_key, client_config=S3ClientConfig(max_pool_connections=64, max_attempts=5)
+    )
+
+    # Method execution
+    conn1 = factory.connector(s3_endpoint_url, s3_bucket_name)
+    conn2 = factory.connector(s3_endpoint_url, s3_bucket_name)
+
+    # Tests after method execution
+    client = conn1._s3.meta.client
+    assert client is conn2._s3.meta.client
+    assert client.meta.config.max_pool_connections == 64
+    assert client.meta.config.retries == {'mode': 'adaptive', 'total_max_attempts': 5}
+    assert client.meta.config.tcp_keepalive
+    assert conn2.read_csv_to_df('test.csv')['col2'].tolist() == ['valB']
+
+
+def test_connector_factory_limited_client_retries(s3_bucket):
+    """
+    Tests if the client of a factory with the concurrency limiter uses the standard retries with at most 2 attempts.
+    """
+    # Test init
+    client_config = S3ClientConfig(retry_mode='adaptive', max_attempts=10)
+
+    # Method execution
+    factory = S3ConnectorFactory(
+        s3_access_key, s3_secret_key, client_config=client_config, concurrency_config=S3ConcurrencyConfig()
+    )
+    factory_unlimited = S3ConnectorFactory(s3_access_key, s3_secret_key, client_config=client_config)
+
+    # Tests after method execution
+    assert factory.s3_resource.meta.client.meta.config.retries == {'mode': 'standard', 'total_max_attempts': 2}
+    assert factory.client_config == S3ClientConfig(retry_mode='standard', max_attempts=2)
+    assert factory_unlimited.s3_resource.meta.client.meta.config.retries == {
+        'mode': 'adaptive', 'total_max_attempts': 10
+    }
+    assert S3ClientConfig(max_attempts=1).limited().max_attempts == 1
+
+
+def test_connector_factory_limits_concurrency(s3_bucket):
+    """
+    Tests if the connectors of the factory share the adaptive limiter, which retries GETs throttled with 503 SlowDown.
+    """
+    # Test init
+    s3_bucket.put_object(Body=b'content', Key='test.csv')
+    factory = S3ConnectorFactory(
+        s3_access_key, s3_secret_key, concurrency_config=S3ConcurrencyConfig(initial_limit=4, backoff_base_seconds=0)
+    )
+    conn1 = factory.connector(s3_endpoint_url, s3_bucket_name)
+    conn2 = factory.connector(s3_endpoint_url, s3_bucket_name)
+    slow_downs = [2]
+
+    class SlowDownResponse:
+        status_code = 503
+
+    def inject_slow_down(**kwargs):
+        # A response returned by a before-call handler replaces the request to S3
+        if slow_downs[0] > 0:
+            slow_downs[0] -= 1
+            return SlowDownResponse(), {
+                'Error': {'Code': 'SlowDown', 'Message': 'Please reduce your request rate.'},
+                'ResponseMetadata': {'HTTPStatusCode': 503}
+            }
+        return None
+
+    conn1._s3.meta.client.meta.events.register('before-call.s3.GetObject', inject_slow_down)
+
+    # Method execution
+    body = conn1.read_object('test.csv')
+
+    # Tests after method execution
+    stats = conn2.limiter.stats()
+    assert conn1.limiter is conn2.limiter
+    assert body == b'content'
+    assert stats.throttled == 2
+    assert stats.requests == 3
+    # 4 -> 2 -> 1 by the throttled attempts, the successful one completes a window of the limit 1
+    assert (stats.decreases, stats.increases, stats.limit) == (2, 1, 2)
+
+
+def test_list_objects_in_prefix_pages_under_limit(s3_bucket):
+    """
+    Tests if every page of a long listing is a separate request under the limiter, so a throttled page is retried
+    alone and the listing is complete.
+    """
+    # Test init
+    for i in range(1001):
+        s3_bucket.put_object(Body=b'', Key=f'prefix/{i:04d}.csv')
+    factory = S3ConnectorFactory(
+        s3_access_key, s3_secret_key, concurrency_config=S3ConcurrencyConfig(initial_limit=4, backoff_base_seconds=0)
+    )
+    conn = factory.connector(s3_endpoint_url, s3_bucket_name)
+    calls = []
+
+    class SlowDownResponse:
+        status_code = 503
+
+    def inject_slow_down(**kwargs):
+        # The first request of the second page is throttled
+        calls.append(1)
+        if len(calls) == 2:
+            return SlowDownResponse(), {
+                'Error': {'Code': 'SlowDown', 'Message': 'Please reduce your request rate.'},
+                'ResponseMetadata': {'HTTPStatusCode': 503}
+            }
+        return None
+
+    conn._s3.meta.client.meta.events.register('before-call.s3.ListObjectsV2', inject_slow_down)
+
+    # Method execution
+    objects = conn.list_objects_in_prefix('prefix/')
+
+    # Tests after method execution
+    stats = conn.limiter.stats()
+    assert [obj.key for obj in objects] == [f'prefix/{i:04d}.csv' for i in range(1001)]
+    assert (stats.requests, stats.throttled) == (3, 1)
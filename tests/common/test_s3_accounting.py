@@ -0,0 +1,125 @@
+""" Test methods of xetra.common.s3_accounting.S3RequestAccounting. """
+
+from io import BytesIO
+import logging
+
+from xetra.common.s3 import S3ConnectorFactory
+from xetra.common.s3_accounting import OperationUsage, S3RequestAccounting, body_size
+from xetra.common.s3_config import S3CostConfig
+from tests.common.s3_bucket_fixture import s3_access_key, s3_secret_key, s3_endpoint_url, s3_bucket_name, s3_bucket, my_s3_conn
+
+
+def test_accounting_counts_operations(s3_bucket, my_s3_conn):
+    """ Test if the LIST, GET, HEAD and PUT requests of a connector are counted with their bytes. """
+
+    # Test init
+    s3_bucket.put_object(Body=b'0123456789', Key='prefix/test.csv')
+
+    # Method execution
+    my_s3_conn.list_files_in_prefix('prefix/')
+    my_s3_conn.read_object('prefix/test.csv')
+    my_s3_conn.get_etag('prefix/missing.csv')
+    my_s3_conn.write_object('prefix/new.csv', b'abcde')
+
+    # Test after method execution
+    usage = {item.operation: item for item in my_s3_conn.accounting.usage()}
+    assert usage['ListObjectsV2'].requests == 1
+    assert usage['ListObjectsV2'].bytes_in > 0
+    assert usage['GetObject'] == OperationUsage('GetObject', requests=1, errors=0, bytes_in=10, bytes_out=0)
+    # The HEAD of a missing object is answered with 404 and has no body
+    assert usage['HeadObject'] == OperationUsage('HeadObject', requests=1, errors=1, bytes_in=0, bytes_out=0)
+    assert (usage['PutObject'].requests, usage['PutObject'].bytes_out) == (1, 5)
+
+
+def test_factory_shares_accounting(s3_bucket):
+    """ Test if the requests of all the connectors of a factory are counted once, by the accounting of the factory. """
+
+    # Test init
+    s3_bucket.put_object(Body=b'content', Key='test.csv')
+    factory = S3ConnectorFactory(s3_access_key, s3_secret_key)
+    conn1 = factory.connector(s3_endpoint_url, s3_bucket_name)
+    conn2 = factory.connector(s3_endpoint_url, s3_bucket_name)
+
+    # Method execution
+    conn1.read_object('test.csv')
+    conn2.read_object('test.csv')
+
+    # Test after method execution
+    assert conn1.accounting is conn2.accounting is factory.accounting
+    assert factory.accounting.usage() == [OperationUsage('GetObject', requests=2, errors=0, bytes_in=14, bytes_out=0)]
+
+
+def test_estimate_cost():
+    """ Test if the requests are priced by their class, DELETE requests are free and the transfer is priced per GB. """
+
+    # Test init
+    usage = [
+        OperationUsage('ListObjectsV2', requests=1000, errors=0, bytes_in=0, bytes_out=0),
+        OperationUsage('PutObject', requests=1000, errors=0, bytes_in=0, bytes_out=10),
+        OperationUsage('GetObject', requests=10000, errors=0, bytes_in=2 * 1024 ** 3, bytes_out=0),
+        OperationUsage('DeleteObjects', requests=500, errors=0, bytes_in=0, bytes_out=0)
+    ]
+    config = S3CostConfig(price_class_a=0.005, price_class_b=0.0004, price_transfer_gb=0.09)
+
+    # Method execution
+    cost = S3RequestAccounting.estimate_cost(usage, config)
+
+    # Test after method execution
+    assert round(cost, 6) == round(2 * 0.005 + 10 * 0.0004 + 2 * 0.09, 6)
+
+
+def test_report_warns_above_thresholds(s3_bucket, my_s3_conn, caplog):
+    """ Test if the report logs the usage and warns about a run exceeding the thresholds. """
+
+    # Test init
+    s3_bucket.put_object(Body=b'content', Key='test.csv')
+    for _ in range(3):
+        my_s3_conn.read_object('test.csv')
+
+    # Method execution
+    with caplog.at_level(logging.INFO):
+        summary = my_s3_conn.accounting.report(S3CostConfig(price_class_b=1000.0, warn_requests=2, warn_cost=1.0))
+        my_s3_conn.accounting.report(S3CostConfig(warn_requests=3))
+
+    # Test after method execution
+    assert summary.startswith('S3 usage: 3 requests, estimated cost 3.000000')
+    warnings = [record.message for record in caplog.records if record.levelno == logging.WARNING]
+    assert warnings == [
+        'The run made 3 S3 requests, more than 2',
+        'The estimated S3 cost of the run 3.000000 is higher than 1.0'
+    ]
+
+
+def test_body_size():
+    """ Test if the size of the request bodies is measured without moving the stream. """
+
+    # Test init
+    stream = BytesIO(b'0123456789')
+    stream.seek(4)
+
+    # Method execution and test after method execution
+    assert body_size(stream) == 6
+    assert stream.tell() == 4
+    assert body_size(b'abc') == 3
+    assert body_size('äb') == 3
+    assert body_size(None) == 0
+
+
+def test_merge_usage():
+    """ Test if the usage counted by another accounting is added to the usage of the same operations. """
+
+    # Test init
+    accounting = S3RequestAccounting()
+    accounting.merge([OperationUsage('GetObject', requests=1, errors=0, bytes_in=10, bytes_out=0)])
+
+    # Method execution
+    accounting.merge([
+        OperationUsage('GetObject', requests=2, errors=1, bytes_in=20, bytes_out=0),
+        OperationUsage('PutObject', requests=1, errors=0, bytes_in=0, bytes_out=5)
+    ])
+
+    # Test after method execution
+    assert accounting.usage() == [
+        OperationUsage('GetObject', requests=3, errors=1, bytes_in=30, bytes_out=0),
+        OperationUsage('PutObject', requests=1, errors=0, bytes_in=0, bytes_out=5)
+    ]
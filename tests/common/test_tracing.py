@@ -0,0 +1,190 @@
+""" Test methods of xetra.common.tracing.Tracer and its exporters. """
+
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import EndpointConnectionError
+import pytest
+
+from xetra.common.metrics import MetricsRegistry
+from xetra.common.s3 import S3ConnectorFactory
+from xetra.common.tracing import (
+    JsonLinesExporter, OpenTelemetryExporter, SpanExporter, Tracer, read_spans, summarize_s3_latency
+)
+from tests.common.s3_bucket_fixture import s3_access_key, s3_secret_key, s3_endpoint_url, s3_bucket_name, s3_bucket
+
+
+class ListExporter(SpanExporter):
+    """ Exporter collecting the ended spans. """
+
+    def __init__(self):
+        self.spans = []
+
+    def on_end(self, span):
+        self.spans.append(span)
+
+
+def test_nested_spans_across_threads():
+    """ Test if the stages are children of the run, also in worker threads, and a failed stage has the error status. """
+
+    exporter = ListExporter()
+    tracer = Tracer([exporter])
+    metrics = MetricsRegistry()
+    metrics.tracer = tracer
+
+    def download(size):
+        with metrics.stage('download') as observation:
+            observation.add(objects=1, size=size)
+
+    # Method execution
+
+    with tracer.span('run', run_id='test') as run:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(download, [10, 20]))
+        with pytest.raises(ValueError):
+            with metrics.stage('transform'):
+                raise ValueError('wrong data')
+    with tracer.span('next_run') as next_run:
+        pass
+
+    # Test after method execution
+
+    spans = {span.name: span for span in exporter.spans}
+    downloads = [span for span in exporter.spans if span.name == 'download']
+    assert exporter.spans[-2] is run
+    assert run.parent_id is None and run.attributes == {'run_id': 'test'}
+    assert {span.parent_id for span in downloads} == {run.span_id}
+    assert {span.trace_id for span in downloads} == {run.trace_id}
+    assert sorted(span.attributes['bytes'] for span in downloads) == [10, 20]
+    assert spans['transform'].status == 'error'
+    assert spans['transform'].attributes['error'] == "ValueError('wrong data')"
+    assert run.status == 'ok'
+    # The root of the finished run is not the parent of the next one
+    assert next_run.parent_id is None and next_run.trace_id != run.trace_id
+    assert all(span.duration >= 0 for span in exporter.spans)
+
+
+def test_s3_request_spans(s3_bucket, tmp_path):
+    """ Test if the S3 requests of a factory are traced with their key, bytes and status into a JSON-lines file. """
+
+    # Test init
+    s3_bucket.put_object(Body=b'col1,col2\nvalA,valB', Key='2022-11-17/test.csv')
+    path = str(tmp_path / 'traces' / 'spans.jsonl')
+    tracer = Tracer([JsonLinesExporter(path)])
+    factory = S3ConnectorFactory(s3_access_key, s3_secret_key, tracer=tracer)
+    conn = factory.connector(s3_endpoint_url, s3_bucket_name)
+
+    # Method execution
+    with tracer.span('run'):
+        conn.read_csv_to_df('2022-11-17/test.csv')
+        conn.write_object('2022-11-18/test.csv', b'abc')
+        conn.get_etag('2022-11-18/missing.csv')
+    tracer.close()
+
+    # Tests after method execution
+    spans = read_spans(path)
+    by_id = {span['span_id']: span for span in spans}
+    get, download = [span for span in spans if span['name'] in ('s3.GetObject', 'download')]
+    assert get['attributes'] == {
+        'bucket': s3_bucket_name, 'key': '2022-11-17/test.csv', 'bytes_out': 0, 'bytes_in': 19, 'status_code': 200,
+        'retries': 0
+    }
+    assert by_id[get['parent_id']] is download
+    assert by_id[download['parent_id']]['name'] == 'run'
+    put = next(span for span in spans if span['name'] == 's3.PutObject')
+    assert (put['attributes']['bytes_out'], by_id[put['parent_id']]['name']) == (3, 'upload')
+    head = next(span for span in spans if span['name'] == 's3.HeadObject')
+    assert (head['status'], head['attributes']['status_code']) == ('error', 404)
+    assert by_id[head['parent_id']]['name'] == 'run'
+    summaries = {summary.group: summary for summary in summarize_s3_latency(spans, prefix_depth=1)}
+    assert set(summaries) == {'GetObject 2022-11-17', 'PutObject 2022-11-18', 'HeadObject 2022-11-18'}
+
+
+def test_s3_request_span_connection_error():
+    """ Test if the span of a S3 request failing without a response ends with the error and its type. """
+
+    # Test init
+    exporter = ListExporter()
+    tracer = Tracer([exporter])
+    client = boto3.client(
+        's3', region_name='eu-central-1', aws_access_key_id='KEY1', aws_secret_access_key='KEY2',
+        config=Config(retries={'mode': 'standard', 'total_max_attempts': 1})
+    )
+
+    def refuse_connection(request, **kwargs):
+        raise EndpointConnectionError(endpoint_url=request.url)
+
+    client.meta.events.register('before-send.s3', refuse_connection)
+    tracer.attach(client)
+
+    # Method execution
+    with tracer.span('run'):
+        with pytest.raises(EndpointConnectionError):
+            client.get_object(Bucket=s3_bucket_name, Key='2022-11-17/test.csv')
+
+    # Tests after method execution
+    get, run = exporter.spans
+    assert (get.name, get.status, get.parent_id) == ('s3.GetObject', 'error', run.span_id)
+    assert get.attributes == {
+        'bucket': s3_bucket_name, 'key': '2022-11-17/test.csv', 'bytes_out': 0, 'error': 'EndpointConnectionError'
+    }
+    assert get.end_time is not None
+
+
+def test_summarize_s3_latency():
+    """ Test if the latency percentiles are computed per operation and the slowest key is found. """
+
+    # Test init
+    spans = [
+        {'name': 's3.GetObject', 'duration_ms': float(ms), 'attributes': {'key': f'2022-11-{17 + ms % 2}/{ms}.csv'}}
+        for ms in range(1, 101)
+    ]
+    spans.append({'name': 's3.ListObjects', 'duration_ms': 500.0, 'attributes': {'prefix': '2022-11-17'}})
+    spans.append({'name': 'download', 'duration_ms': 1000.0, 'attributes': {}})
+
+    # Method execution
+    by_operation = summarize_s3_latency(spans)
+    by_prefix = summarize_s3_latency(spans, prefix_depth=1)
+
+    # Tests after method execution
+    assert [summary.group for summary in by_operation] == ['ListObjects', 'GetObject']
+    get = by_operation[1]
+    assert (get.count, get.p50_ms, get.p90_ms, get.p99_ms, get.max_ms) == (100, 50.0, 90.0, 99.0, 100.0)
+    assert get.slowest == '2022-11-17/100.csv'
+    assert [(summary.group, summary.count) for summary in by_prefix] == [
+        ('ListObjects 2022-11-17', 1), ('GetObject 2022-11-17', 50), ('GetObject 2022-11-18', 50)
+    ]
+
+
+def test_opentelemetry_exporter():
+    """ Test if the spans are mirrored to OpenTelemetry with the same nesting. """
+
+    trace = pytest.importorskip('opentelemetry.trace')
+    sdk_trace = pytest.importorskip('opentelemetry.sdk.trace')
+    in_memory = pytest.importorskip('opentelemetry.sdk.trace.export.in_memory_span_exporter')
+    export = pytest.importorskip('opentelemetry.sdk.trace.export')
+    provider = sdk_trace.TracerProvider()
+    otel_spans = in_memory.InMemorySpanExporter()
+    provider.add_span_processor(export.SimpleSpanProcessor(otel_spans))
+    exporter = OpenTelemetryExporter()
+    exporter._tracer = provider.get_tracer(__name__)
+    tracer = Tracer([exporter])
+
+    # Method execution
+
+    with tracer.span('run'):
+        with tracer.span('download', key='2022-11-17/test.csv'):
+            pass
+        with pytest.raises(RuntimeError):
+            with tracer.span('upload'):
+                raise RuntimeError
+
+    # Test after method execution
+
+    download, upload, run = otel_spans.get_finished_spans()
+    assert (download.name, upload.name, run.name) == ('download', 'upload', 'run')
+    assert download.parent.span_id == run.context.span_id == upload.parent.span_id
+    assert download.attributes['key'] == '2022-11-17/test.csv'
+    assert upload.status.status_code == trace.StatusCode.ERROR
+    assert run.start_time <= download.start_time <= download.end_time <= run.end_time
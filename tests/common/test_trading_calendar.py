@@ -0,0 +1,65 @@
+"""
+Test methods of TradingCalendar class.
+"""
+
+import numpy as np
+import pytest
+
+from xetra.common.custom_exceptions import WrongCalendarException
+from xetra.common.trading_calendar import TradingCalendar
+
+
+def test_xetra_skips_weekends_and_holidays():
+    """
+    Tests if the Xetra calendar skips weekends and the bundled holidays (Good Friday and Easter Monday 2022).
+    """
+    # Expected results
+    days_exp = np.array(['2022-04-13', '2022-04-14', '2022-04-19'], dtype='datetime64[D]')
+
+    # Method execution
+    days_result = TradingCalendar.xetra().trading_days('2022-04-13', '2022-04-19')
+
+    # Tests after method execution
+    np.testing.assert_array_equal(days_result, days_exp)
+
+
+def test_previous_trading_day():
+    """
+    Tests if previous_trading_day skips weekends and holidays, both for trading and non-trading days.
+    """
+    calendar = TradingCalendar.xetra()
+
+    assert calendar.previous_trading_day('2022-04-19') == np.datetime64('2022-04-14')
+    assert calendar.previous_trading_day('2022-11-19') == np.datetime64('2022-11-18')
+    assert calendar.previous_trading_day('2022-11-21') == np.datetime64('2022-11-18')
+
+
+def test_xetra_overrides(tmp_path):
+    """
+    Tests if the holidays file, extra holidays and removed holidays override the bundled holidays.
+    """
+    # Test init
+    holidays_file = tmp_path / 'holidays.csv'
+    holidays_file.write_text('date,name\n2022-11-16,Closure\n2022-11-17,Closure\n')
+
+    # Method execution
+    calendar = TradingCalendar.xetra(
+        holidays_file=holidays_file, extra_holidays=['2022-11-18'], removed_holidays=['2022-11-17']
+    )
+
+    # Tests after method execution
+    assert calendar.is_trading_day('2022-04-15')
+    assert not calendar.is_trading_day('2022-11-16')
+    assert calendar.is_trading_day('2022-11-17')
+    assert not calendar.is_trading_day('2022-11-18')
+
+
+def test_from_config():
+    """
+    Tests creating calendars from the configuration and rejecting unknown ones.
+    """
+    assert TradingCalendar.from_config({'name': 'every_day'}).is_trading_day('2022-11-19')
+    assert not TradingCalendar.from_config({'name': 'xetra'}).is_trading_day('2022-11-19')
+
+    with pytest.raises(WrongCalendarException):
+        TradingCalendar.from_config({'name': 'nyse'})
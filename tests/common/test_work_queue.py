@@ -0,0 +1,148 @@
+"""
+Test methods of the work queues.
+"""
+
+import json
+import time
+
+import pytest
+
+from tests.common.s3_bucket_fixture import s3_bucket, my_s3_conn
+from xetra.common.constants import WorkItemStatus
+from xetra.common.work_queue import S3WorkQueue, SQLiteWorkQueue
+
+
+@pytest.fixture(params=['sqlite', 's3'])
+def queue(request, tmp_path):
+    """
+    Work queue of every backend, with a short lease and two attempts per item.
+    """
+    if request.param == 'sqlite':
+        return SQLiteWorkQueue(str(tmp_path / 'queue.db'), lease_seconds=60, max_attempts=2)
+    my_s3_conn = request.getfixturevalue('my_s3_conn')
+    return S3WorkQueue(my_s3_conn, 'queue/', lease_seconds=60, max_attempts=2, settle_seconds=0)
+
+
+def test_claim_complete(queue):
+    """
+    Tests if items are claimed once in the order of their identifiers and completed.
+    """
+    # Test init
+    assert queue.put('b', {'start': '2022-11-18'})
+    assert queue.put('a', {'start': '2022-11-17'})
+    assert not queue.put('a', {'start': '2022-11-17'})
+
+    # Method execution
+    item1 = queue.claim('worker1')
+    item2 = queue.claim('worker2')
+
+    # Tests after method execution
+    assert (item1.item_id, item1.payload, item1.attempts) == ('a', {'start': '2022-11-17'}, 1)
+    assert item2.item_id == 'b'
+    assert queue.claim('worker3') is None
+    assert queue.heartbeat(item1, 'worker1')
+
+    queue.complete(item1, 'worker1', {'dates': 1})
+    queue.complete(item2, 'worker2')
+
+    items = queue.items()
+    assert [item.status for item in items] == [WorkItemStatus.DONE.value] * 2
+    assert items[0].result == {'dates': 1}
+    progress = queue.progress()
+    assert (progress.total, progress.done, progress.finished) == (2, 2, True)
+    assert progress.items_per_hour > 0
+    assert progress.eta_seconds == 0
+
+
+def test_fail_retry(queue):
+    """
+    Tests if a failed item is retried until max_attempts.
+    """
+    queue.put('a', {})
+
+    queue.fail(queue.claim('worker1'), 'worker1', 'error 1')
+    item = queue.claim('worker2')
+    assert (item.attempts, item.error) == (2, 'error 1')
+    queue.fail(item, 'worker2', 'error 2')
+
+    assert queue.claim('worker3') is None
+    progress = queue.progress()
+    assert (progress.failed, progress.finished) == (1, True)
+    assert queue.items()[0].error == 'error 2'
+
+
+def test_expired_claim(queue, monkeypatch):
+    """
+    Tests if the item of a crashed worker is claimed again after its claim expires.
+    """
+    queue.put('a', {})
+    item = queue.claim('crashed')
+    assert queue.claim('worker1') is None
+
+    # The claim is not renewed for longer than the lease
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+
+    item = queue.claim('worker1')
+    assert (item.item_id, item.owner, item.attempts) == ('a', 'worker1', 2)
+
+    # The second expiry exhausts the attempts
+    monkeypatch.setattr(time, 'time', lambda: now + 122)
+    assert queue.claim('worker2') is None
+    assert queue.items()[0].status == WorkItemStatus.FAILED.value
+
+
+def test_s3_layout(my_s3_conn):
+    """
+    Tests the objects of the S3 work queue.
+    """
+    queue = S3WorkQueue(my_s3_conn, 'queue/', settle_seconds=0)
+    queue.put('a', {'start': '2022-11-17'})
+    queue.claim('worker1')
+
+    assert sorted(my_s3_conn.list_files_in_prefix('queue/')) == ['queue/claims/a.lock', 'queue/items/a.json']
+    assert json.loads(my_s3_conn.read_object('queue/items/a.json'))['owner'] == 'worker1'
+
+
+def test_complete_lost_claim(queue, monkeypatch):
+    """
+    Tests if a worker whose claim has expired and been taken over can neither complete nor fail the item.
+    """
+    # Test init
+    queue.put('a', {})
+    stale_item = queue.claim('slow')
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    item = queue.claim('worker1')
+
+    # Method execution
+    completed = queue.complete(stale_item, 'slow', {'dates': 1})
+    failed = queue.fail(stale_item, 'slow', 'error')
+
+    # Tests after method execution
+    assert not completed
+    assert not failed
+    assert queue.items()[0] == item
+    assert queue.complete(item, 'worker1')
+    assert queue.items()[0].status == WorkItemStatus.DONE.value
+
+
+def test_s3_claim_write_error_releases_lease(my_s3_conn, monkeypatch):
+    """
+    Tests if the claim lease is released, when the claimed item cannot be written.
+    """
+    # Test init
+    queue = S3WorkQueue(my_s3_conn, 'queue/', settle_seconds=0)
+    queue.put('a', {})
+
+    def write_error(item):
+        raise OSError('write error')
+
+    monkeypatch.setattr(queue, '_write', write_error)
+
+    # Method execution
+    with pytest.raises(OSError):
+        queue.claim('worker1')
+
+    # Tests after method execution
+    assert my_s3_conn.list_files_in_prefix('queue/claims/') == []
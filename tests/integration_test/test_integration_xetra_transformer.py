@@ -14,6 +14,7 @@ import yaml
 # from tests.transformers.xetra_data import conf_dict_src, conf_dict_trg, df_src, df_report
 from tests.integration_test.data import DataCreator
 from xetra.transformers.xetra_transformer import XetraETL, XetraTargetConfig, XetraSourceConfig
+from xetra.common.meta_process import MetaProcess
 from xetra.common.s3 import S3BucketConnector
 
 
@@ -104,6 +105,5 @@ def test_integration_etl_report1_no_metafile(source_bucket, target_bucket):
     df_result = pd.read_parquet(out_buffer)
     pd.testing.assert_frame_equal(df_exp, df_result)
 
-    meta_file = s3_bucket_trg.list_files_in_prefix(meta_key)[0]
-    df_meta_result = s3_bucket_trg.read_csv_to_df(meta_file)
+    df_meta_result = MetaProcess.read_meta_file(s3_bucket_trg, meta_key)
     assert df_meta_result['source_date'].tolist() == meta_exp
@@ -0,0 +1,26 @@
+""" Test the start-up of the CLI in run.py. """
+
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_import_time import HEAVY_MODULES, parse_importtime
+
+
+@pytest.mark.parametrize('cli_args', [['--help'], ['configs/xetra_report1_config.yml', 'validate']])
+def test_fast_commands_skip_heavy_imports(cli_args):
+    """ Test if `--help` and `validate` run without importing pandas, pyarrow or boto3. """
+
+    # Method execution
+
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', 'run.py', *cli_args], capture_output=True, text=True, check=False
+    )
+
+    # Test after method execution
+
+    assert completed.returncode == 0
+    modules = {module.strip() for module in parse_importtime(completed.stderr)}
+    assert 'xetra.common.constants' in modules
+    assert not modules & set(HEAVY_MODULES)
@@ -0,0 +1,121 @@
+""" Test the backfill of xetra.transformers.backfill. """
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from tests.transformers.s3_bucket_fixture import buckets
+from tests.transformers.xetra_data import conf_dict_src, conf_dict_trg, df_report
+from xetra.common.meta_process import MetaProcess
+from xetra.common.trading_calendar import TradingCalendar
+from xetra.transformers.backfill import BackfillShard, XetraBackfill, run_queue_worker, split_date_range, submit_backfill
+from xetra.transformers.job import create_work_queue
+
+meta_key = 'meta_file'
+
+
+def test_split_date_range():
+    """ Test if the trading days of a range are split into contiguous shards. """
+
+    calendar = TradingCalendar(holidays=['2022-11-16'])
+
+    shards = split_date_range('2022-11-14', '2022-11-25', 3, calendar)
+
+    assert shards == [
+        BackfillShard('2022-11-14', '2022-11-17'),
+        BackfillShard('2022-11-18', '2022-11-22'),
+        BackfillShard('2022-11-23', '2022-11-25')
+    ]
+    # More workers than trading days
+    assert split_date_range('2022-11-18', '2022-11-21', 5, calendar) == [
+        BackfillShard('2022-11-18', '2022-11-18'), BackfillShard('2022-11-21', '2022-11-21')
+    ]
+    assert split_date_range('2022-11-19', '2022-11-20', 2, calendar) == []
+
+
+def test_backfill_run(buckets):
+    """ Test if the shards together write the same report as a single run and the dates are recorded once. """
+
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+    config = {
+        's3': {
+            'access_key': 'AWS_ACCESS_KEY_ID',
+            'secret_key': 'AWS_SECRET_ACCESS_KEY',
+            'src_endpoint_url': 'https://s3.eu-central-1.amazonaws.com',
+            'src_bucket': 'src-bucket',
+            'trg_endpoint_url': 'https://s3.eu-central-1.amazonaws.com',
+            'trg_bucket': 'trg-bucket'
+        },
+        'source': dict(conf_dict_src, first_extract_date='2022-11-17'),
+        'target': conf_dict_trg,
+        'meta': {'meta_key': meta_key}
+    }
+
+    # Method execution - moto mocks only the current process, so the shards are run in threads
+
+    backfill = XetraBackfill(config, '2022-11-17', '2022-11-19', workers=2)
+    results = backfill.run(executor=ThreadPoolExecutor(2))
+
+    # Test after method execution
+
+    assert [result.shard for result in results] == [
+        BackfillShard('2022-11-17', '2022-11-18'), BackfillShard('2022-11-19', '2022-11-19')
+    ]
+    trg_files = s3_bucket_trg_connector.list_files_in_prefix(conf_dict_trg['key'])
+    assert len(trg_files) == 2
+    df_result = pd.concat(
+        [s3_bucket_trg_connector.read_parquet_to_df(key) for key in trg_files]
+    ).sort_values(by='Date').reset_index(drop=True)
+    pd.testing.assert_frame_equal(df_result, df_report)
+
+    df_meta_result = MetaProcess.read_meta_file(s3_bucket_trg_connector, meta_key)
+    assert sorted(df_meta_result['source_date'].tolist()) == ['2022-11-17', '2022-11-18', '2022-11-19']
+    # The metrics and the S3 usage of the shards are collected by the connectors of the coordinator
+    stages = {stage.stage: stage for stage in backfill.s3_bucket_src.metrics.stages()}
+    assert stages['download'].objects == sum(
+        stage.objects for result in results for stage in result.stages if stage.stage == 'download'
+    )
+    usage = {item.operation: item for item in backfill.s3_bucket_src.accounting.usage()}
+    assert usage['GetObject'].requests >= stages['download'].objects > 0
+
+
+def test_queue_worker(buckets, tmp_path):
+    """ Test if a worker processes all the shards of the work queue and records their dates itself. """
+
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+    config = {
+        's3': {
+            'access_key': 'AWS_ACCESS_KEY_ID',
+            'secret_key': 'AWS_SECRET_ACCESS_KEY',
+            'src_endpoint_url': 'https://s3.eu-central-1.amazonaws.com',
+            'src_bucket': 'src-bucket',
+            'trg_endpoint_url': 'https://s3.eu-central-1.amazonaws.com',
+            'trg_bucket': 'trg-bucket'
+        },
+        'source': dict(conf_dict_src, first_extract_date='2022-11-17'),
+        'target': conf_dict_trg,
+        'meta': {'meta_key': meta_key},
+        'queue': {'backend': 'sqlite', 'path': str(tmp_path / 'queue.db')}
+    }
+    queue = create_work_queue(config, s3_bucket_trg_connector)
+    item_ids = submit_backfill(queue, '2022-11-17', '2022-11-19', 2, TradingCalendar.every_day())
+    assert item_ids == ['2022-11-17_2022-11-18', '2022-11-19_2022-11-19']
+
+    # Method execution
+
+    completed = run_queue_worker(config, queue, owner='worker1', s3_bucket=s3_bucket_trg_connector)
+
+    # Test after method execution
+
+    assert completed == 2
+    assert queue.progress().done == 2
+    assert [item.result['dates'] for item in queue.items()] == [2, 1]
+    assert 'download' in {stage.stage for stage in s3_bucket_trg_connector.metrics.stages()}
+    trg_files = s3_bucket_trg_connector.list_files_in_prefix(conf_dict_trg['key'])
+    df_result = pd.concat(
+        [s3_bucket_trg_connector.read_parquet_to_df(key) for key in trg_files]
+    ).sort_values(by='Date').reset_index(drop=True)
+    pd.testing.assert_frame_equal(df_result, df_report)
+
+    df_meta_result = MetaProcess.read_meta_file(s3_bucket_trg_connector, meta_key)
+    assert sorted(df_meta_result['source_date'].tolist()) == ['2022-11-17', '2022-11-18', '2022-11-19']
@@ -0,0 +1,35 @@
+""" Test methods of xetra.transformers.config. """
+
+import yaml
+
+from xetra.transformers.config import validate_config
+
+
+def test_validate_config():
+    """ Test if the shipped config is valid and the errors of a broken config are reported. """
+
+    with open('configs/xetra_report1_config.yml') as config_file:
+        config = yaml.safe_load(config_file)
+    assert validate_config(config) == []
+
+    del config['meta']
+    del config['source']['col_isin']
+    config['target']['col_opening'] = 'opening'
+    config['pipeline']['workers'] = 4
+    config['queue']['backend'] = 'redis'
+    config['calendar'] = {'weekmask': '1111100'}
+
+    # Method execution
+
+    errors = validate_config(config)
+
+    # Test after method execution
+
+    assert errors == [
+        'missing section meta',
+        'source: missing key col_isin',
+        'target: unknown key col_opening',
+        'pipeline: unknown key workers',
+        "queue: backend must be one of ['s3', 'sqlite']"
+    ]
+    assert validate_config(None) == ['the configuration is not a mapping']
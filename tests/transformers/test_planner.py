@@ -0,0 +1,66 @@
+""" Test methods of xetra.transformers.planner.ExecutionPlanner. """
+
+from tests.transformers.s3_bucket_fixture import buckets
+from xetra.common.constants import ExecutionModes
+from xetra.transformers.planner import ExecutionPlanner, PlannerConfig
+
+
+def test_plan(buckets):
+    """ Test if the plan sums the listed objects and estimates the peak memory of every mode. """
+
+    s3_bucket_src_connector, _ = buckets
+    dates = ['2022-11-16', '2022-11-17', '2022-11-18', '2022-11-19', '2022-11-20']
+    sizes = {
+        obj.key: obj.size for date in dates for obj in s3_bucket_src_connector.list_objects_in_prefix(prefix=date)
+    }
+    planner = ExecutionPlanner(
+        s3_bucket_src_connector,
+        PlannerConfig(csv_bytes_per_row=1, memory_bytes_per_row=1, memory_factor=1, memory_limit_mb=1)
+    )
+
+    # Method execution
+
+    plan = planner.plan(dates)
+
+    # Test after method execution
+
+    assert plan.objects == 8
+    assert plan.total_bytes == sum(sizes.values())
+    assert plan.estimated_rows == plan.total_bytes
+    assert plan.max_object_bytes == max(sizes.values())
+    assert plan.peak_memory == {
+        ExecutionModes.IN_MEMORY.value: plan.total_bytes,
+        ExecutionModes.PIPELINED.value: (16 + 8 + 2) * max(sizes.values()),
+        ExecutionModes.STREAMING.value: sum(size for key, size in sizes.items() if key.startswith('2022-11-19')),
+        ExecutionModes.OUT_OF_CORE.value: max(sizes.values())
+    }
+    assert plan.mode == ExecutionModes.IN_MEMORY.value
+    assert 'Requests:         5 LIST, 8 GET' in plan.format()
+    assert list(plan.listing) == dates
+    assert {obj.key: obj.size for objects in plan.listing.values() for obj in objects} == sizes
+
+
+def test_plan_mode_by_memory_limit(buckets):
+    """ Test if the planner falls back to the modes using less memory when the memory is short. """
+
+    s3_bucket_src_connector, _ = buckets
+    dates = ['2022-11-17', '2022-11-18', '2022-11-19']
+    mb = 1024 ** 2
+
+    def plan_mode(memory_limit_bytes):
+        planner = ExecutionPlanner(
+            s3_bucket_src_connector,
+            PlannerConfig(csv_bytes_per_row=1, memory_bytes_per_row=1, memory_factor=1,
+                          memory_limit_mb=memory_limit_bytes / mb)
+        )
+        return planner.plan(dates)
+
+    plan = plan_mode(10 ** 6)
+    assert plan.mode == ExecutionModes.IN_MEMORY.value
+    # The first mode (in the order of preference) which fits is chosen
+    for peak in plan.peak_memory.values():
+        expected = next(mode for mode, mode_peak in plan.peak_memory.items() if mode_peak <= peak)
+        assert plan_mode(peak).mode == expected
+    plan_short = plan_mode(1)
+    assert plan_short.mode == ExecutionModes.OUT_OF_CORE.value
+    assert 'Warning' in plan_short.format()
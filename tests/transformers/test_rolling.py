@@ -0,0 +1,210 @@
+""" Test methods of xetra.transformers.rolling.RollingWindowReport. """
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.transformers.s3_bucket_fixture import buckets
+from tests.transformers.xetra_data import conf_dict_src, conf_dict_trg
+from xetra.common.custom_exceptions import RollingStateConflictException, WrongRollingStateException
+from xetra.common.lease import S3Lease
+from xetra.common.metrics import MetricsRegistry
+from xetra.transformers.rolling import RollingWindowReport
+from xetra.transformers.xetra_transformer import XetraETL, XetraSourceConfig, XetraTargetConfig
+
+state_key = 'rolling/state.npz'
+
+
+def _daily_aggregates() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    dates = np.datetime_as_string(np.arange('2022-10-03', '2022-11-02', dtype='datetime64[D]'), unit='D')
+    df = pd.DataFrame(
+        [(isin, date) for date in dates for isin in ['AT0000A0E9W5', 'DE000A0D6554', 'DE0005772206']],
+        columns=['ISIN', 'Date']
+    )
+    df['closing_price_eur'] = rng.uniform(10, 30, len(df)).round(2)
+    # An ISIN which is not traded every day
+    return df[(df['ISIN'] != 'DE0005772206') | (df.index % 2 == 0)].reset_index(drop=True)
+
+
+def test_update_incremental(buckets):
+    """ Test if the windows updated run by run are the same as the rolling windows computed from the whole history. """
+
+    # Expected results
+    df = _daily_aggregates()
+    grouped = df.groupby('ISIN')['closing_price_eur']
+    df_exp = df.copy()
+    for window in (3, 5):
+        df_exp[f'ma_{window}'] = grouped.transform(lambda closes: closes.rolling(window).mean())
+        df_exp[f'std_{window}'] = grouped.transform(lambda closes: closes.rolling(window).std())
+    df_exp = df_exp.sort_values(by=['ISIN', 'Date']).round(decimals=2).reset_index(drop=True)
+
+    # Test init
+    _, s3_bucket_trg_connector = buckets
+    dates = sorted(df['Date'].unique())
+
+    # Method execution - every run reads the state, pushes a few dates and saves the state
+    dfs = []
+    for chunk in np.array_split(dates, 4):
+        rolling = RollingWindowReport(s3_bucket_trg_connector, state_key, 'rolling/report_', windows=(5, 3))
+        dfs.append(rolling.update(df[df['Date'].isin(chunk)]))
+        assert rolling.save()
+    rerun = RollingWindowReport(s3_bucket_trg_connector, state_key, 'rolling/report_', windows=(3, 5))
+    df_rerun = rerun.update(df[df['Date'] == dates[-1]])
+
+    # Test after method execution
+    df_result = pd.concat(dfs).sort_values(by=['ISIN', 'Date']).reset_index(drop=True)
+    assert list(df_result.columns) == [
+        'ISIN', 'Date', 'closing_price_eur', 'ma_3', 'std_3', 'ma_5', 'std_5'
+    ]
+    pd.testing.assert_frame_equal(df_result, df_exp[df_result.columns])
+    assert df_rerun.empty
+
+
+def test_state_shorter_than_window(buckets):
+    """ Test if a state with shorter buffers than the longest window is refused. """
+
+    # Test init
+    _, s3_bucket_trg_connector = buckets
+    rolling = RollingWindowReport(s3_bucket_trg_connector, state_key, 'rolling/report_', windows=(3,))
+    rolling.update(_daily_aggregates())
+    rolling.save()
+
+    # Method execution and test after method execution
+    with pytest.raises(WrongRollingStateException):
+        RollingWindowReport(s3_bucket_trg_connector, state_key, 'rolling/report_', windows=(3, 5)).load()
+
+
+def test_save_replaced_state(buckets):
+    """ Test if a state replaced by another run after it was read is not overwritten. """
+
+    # Test init
+    _, s3_bucket_trg_connector = buckets
+    df = _daily_aggregates()
+    rolling1 = RollingWindowReport(s3_bucket_trg_connector, state_key, 'rolling/report_', windows=(3,))
+    rolling2 = RollingWindowReport(s3_bucket_trg_connector, state_key, 'rolling/report_', windows=(3,))
+    rolling1.load()
+    rolling2.load()
+
+    # Method execution
+    rolling2.update(df)
+    saved2 = rolling2.save()
+    rolling1.update(df)
+    saved1 = rolling1.save()
+
+    # Test after method execution
+    assert (saved2, saved1) == (True, False)
+
+
+def test_commit_concurrent_updates(buckets):
+    """ Test if the dates of two runs updating the state concurrently both end up in the state. """
+
+    # Expected results
+    df = _daily_aggregates()
+    dates = sorted(df['Date'].unique())
+    df_first, df_second = df[df['Date'] <= dates[14]], df[df['Date'] > dates[14]]
+    df_exp = df.copy()
+    grouped = df.groupby('ISIN')['closing_price_eur']
+    df_exp['ma_3'] = grouped.transform(lambda closes: closes.rolling(3).mean())
+    df_exp['std_3'] = grouped.transform(lambda closes: closes.rolling(3).std())
+    df_exp = df_exp[df_exp['Date'] > dates[14]].sort_values(by=['ISIN', 'Date']).round(decimals=2).reset_index(drop=True)
+
+    # Test init
+    _, s3_bucket_trg_connector = buckets
+    rolling1 = RollingWindowReport(s3_bucket_trg_connector, state_key, 'rolling/report_', windows=(3,))
+    rolling2 = RollingWindowReport(s3_bucket_trg_connector, state_key, 'rolling/report_', windows=(3,))
+    rolling1.load()
+    rolling2.load()
+    df_result1 = rolling1.update(df_first)
+    df_result2 = rolling2.update(df_second)
+
+    # Method execution
+    df_committed1 = rolling1.commit(df_result1)
+    df_committed2 = rolling2.commit(df_result2)
+
+    # Test after method execution
+    assert df_committed1 is df_result1
+    # The second run pushes its dates into the state of the first one, its windows include the dates of the first run
+    pd.testing.assert_frame_equal(df_committed2, df_exp)
+    rolling = RollingWindowReport(s3_bucket_trg_connector, state_key, 'rolling/report_', windows=(3,))
+    rolling.load()
+    assert rolling._counts.sum() == len(df)
+    last_dates = df.groupby('ISIN')['Date'].max()
+    assert np.datetime_as_string(rolling._last_dates, unit='D').tolist() == last_dates[rolling._isins].tolist()
+
+
+def test_commit_older_dates_than_concurrent_run(buckets):
+    """ Test if closing prices older than those pushed by a concurrent run are refused instead of being lost. """
+
+    # Test init
+    _, s3_bucket_trg_connector = buckets
+    df = _daily_aggregates()
+    dates = sorted(df['Date'].unique())
+    rolling1 = RollingWindowReport(s3_bucket_trg_connector, state_key, 'rolling/report_', windows=(3,))
+    rolling2 = RollingWindowReport(s3_bucket_trg_connector, state_key, 'rolling/report_', windows=(3,))
+    rolling1.load()
+    rolling2.load()
+    df_result1 = rolling1.update(df[df['Date'] <= dates[14]])
+    df_result2 = rolling2.update(df[df['Date'] > dates[14]])
+    rolling2.commit(df_result2)
+
+    # Method execution and test after method execution
+    with pytest.raises(RollingStateConflictException):
+        rolling1.commit(df_result1)
+
+
+def test_save_lease_held(buckets):
+    """ Test if the state is not written while another run holds the lease of the state. """
+
+    # Test init
+    _, s3_bucket_trg_connector = buckets
+    rolling = RollingWindowReport(
+        s3_bucket_trg_connector, state_key, 'rolling/report_', windows=(3,), max_retries=2, retry_seconds=0
+    )
+    rolling.update(_daily_aggregates())
+    other_lease = S3Lease(s3_bucket_trg_connector, rolling.lock_key, owner='other-run', settle_seconds=0)
+    assert other_lease.acquire()
+
+    # Method execution
+    saved = rolling.save()
+
+    # Test after method execution
+    assert not saved
+    assert s3_bucket_trg_connector.get_etag(state_key) is None
+    other_lease.release()
+    assert rolling.save()
+    assert s3_bucket_trg_connector.list_files_in_prefix('rolling/') == [state_key]
+
+
+def test_etl_report1_rolling(buckets):
+    """ Test if the job writes the rolling-window report of the processed dates and saves the state. """
+
+    # Test init
+    conf_dict_src['first_extract_date'] = '2022-11-17'
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+    rolling = RollingWindowReport(s3_bucket_trg_connector, state_key, 'rolling/report_', windows=(2,))
+    metrics = MetricsRegistry()
+
+    # Method execution
+    XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key='meta_file',
+        src_args=XetraSourceConfig(**conf_dict_src),
+        trg_args=XetraTargetConfig(**conf_dict_trg),
+        rolling_report=rolling,
+        metrics=metrics
+    ).etl_report1()
+
+    # Test after method execution
+    report_file, = s3_bucket_trg_connector.list_files_in_prefix('rolling/report_')
+    df_result = s3_bucket_trg_connector.read_parquet_to_df(report_file)
+    assert df_result['Date'].tolist() == ['2022-11-17', '2022-11-18', '2022-11-19']
+    assert df_result['closing_price_eur'].tolist() == [21.19, 21.14, 22.21]
+    assert df_result['ma_2'].tolist()[1:] == [21.16, 21.68]
+    assert np.isnan(df_result['ma_2'][0])
+    assert s3_bucket_trg_connector.get_etag(state_key) is not None
+    # The rolling update is recorded apart from the transformation of report 1
+    stages = {stage.stage: stage for stage in metrics.stages()}
+    assert (stages['transform'].calls, stages['transform_rolling'].calls) == (1, 1)
+    assert (stages['transform_rolling'].rows_in, stages['transform_rolling'].rows_out) == (3, 3)
@@ -0,0 +1,119 @@
+""" Test methods of xetra.transformers.streaming.XetraStreamingETL. """
+
+import pandas as pd
+import pytest
+
+from tests.transformers.s3_bucket_fixture import buckets
+from tests.transformers.xetra_data import conf_dict_src, conf_dict_trg, df_src, df_report
+from xetra.common.meta_process import MetaProcess
+from xetra.transformers.streaming import XetraStreamConfig, XetraStreamingETL
+from xetra.transformers.xetra_transformer import XetraSourceConfig, XetraTargetConfig
+
+meta_key = 'meta_file'
+stream_config = XetraStreamConfig(poll_seconds=0, flush_seconds=0)
+
+
+def create_streaming_etl(s3_bucket_src, s3_bucket_trg):
+    return XetraStreamingETL(
+        s3_bucket_src=s3_bucket_src,
+        s3_bucket_trg=s3_bucket_trg,
+        meta_key=meta_key,
+        src_args=XetraSourceConfig(**conf_dict_src),
+        trg_args=XetraTargetConfig(**conf_dict_trg),
+        stream_args=stream_config
+    )
+
+
+def test_stream_final_reports(buckets):
+    """ Test if the final reports of the streamed dates are equal to the report of the batch job. """
+
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+    streaming_etl = create_streaming_etl(s3_bucket_src_connector, s3_bucket_trg_connector)
+
+    # Method execution
+
+    streaming_etl.start(today='2022-11-17')
+    streaming_etl.step(today='2022-11-20')
+
+    # Test after method execution
+
+    assert streaming_etl.date == '2022-11-20'
+    trg_files = s3_bucket_trg_connector.list_files_in_prefix(conf_dict_trg['key'])
+    df_result = pd.concat(
+        [s3_bucket_trg_connector.read_parquet_to_df(key) for key in trg_files]
+    ).sort_values(by='Date').reset_index(drop=True)
+    pd.testing.assert_frame_equal(df_result, df_report)
+
+    df_meta_result = MetaProcess.read_meta_file(s3_bucket_trg_connector, meta_key)
+    assert df_meta_result['source_date'].tolist() == ['2022-11-17', '2022-11-18', '2022-11-19']
+
+
+def test_stream_intraday_and_restart(buckets):
+    """ Test if the intraday report follows the landed files and a restarted process continues from the snapshot. """
+
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+    streaming_etl = create_streaming_etl(s3_bucket_src_connector, s3_bucket_trg_connector)
+    intraday_key = f'{stream_config.intraday_key}2022-11-19.parquet'
+
+    # The first two files of the day have landed
+
+    streaming_etl.start(today='2022-11-19')
+    streaming_etl.step(today='2022-11-19')
+    df_intraday = s3_bucket_trg_connector.read_parquet_to_df(intraday_key)
+    assert df_intraday['daily_traded_volume'].tolist() == [1035 + 1028 + 1523]
+
+    s3_bucket_src_connector.write_df_to_s3(
+        df_src.loc[8:8].assign(Time='10:00', EndPrice=30.0, TradedVolume=100),
+        '2022-11-19/2022-11-19_BINS_XETR10.csv', 'csv'
+    )
+
+    # Method execution - a new process restores the state and folds only the new file
+
+    restarted_etl = create_streaming_etl(s3_bucket_src_connector, s3_bucket_trg_connector)
+    restarted_etl.start(today='2022-11-19')
+    assert len(restarted_etl.objects) == 3
+    assert restarted_etl.poll() == 1
+
+    # Test after method execution
+
+    df_report_result = restarted_etl.report()
+    assert df_report_result['daily_traded_volume'].tolist() == [1035 + 1028 + 1523 + 100]
+    assert df_report_result['closing_price_eur'].tolist() == [30.0]
+    assert df_report_result['opening_price_eur'].tolist() == [23.58]
+    # The previous closing price is taken from the source data of 2022-11-18
+    assert df_report_result['change_prev_closing_%'].tolist() == [round((30.0 - 21.14) / 21.14 * 100, 2)]
+
+
+def test_stream_crash_while_saving_state(buckets, monkeypatch):
+    """ Test if a crash between writing the aggregates and state.json leaves the previous snapshot consistent. """
+
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+    streaming_etl = create_streaming_etl(s3_bucket_src_connector, s3_bucket_trg_connector)
+    streaming_etl.start(today='2022-11-19')
+    streaming_etl.step(today='2022-11-19')
+    assert len(s3_bucket_trg_connector.list_files_in_prefix(streaming_etl.aggregates_prefix)) == 1
+    s3_bucket_src_connector.write_df_to_s3(
+        df_src.loc[8:8].assign(Time='10:00', EndPrice=30.0, TradedVolume=100),
+        '2022-11-19/2022-11-19_BINS_XETR10.csv', 'csv'
+    )
+    write_object = s3_bucket_trg_connector.write_object
+
+    def crash_on_state(key, body, **kwargs):
+        if key == streaming_etl.state_key:
+            raise OSError('crash')
+        return write_object(key, body, **kwargs)
+
+    monkeypatch.setattr(s3_bucket_trg_connector, 'write_object', crash_on_state)
+
+    # Method execution
+
+    with pytest.raises(OSError):
+        streaming_etl.step(today='2022-11-19')
+    monkeypatch.setattr(s3_bucket_trg_connector, 'write_object', write_object)
+    restarted_etl = create_streaming_etl(s3_bucket_src_connector, s3_bucket_trg_connector)
+    restarted_etl.start(today='2022-11-19')
+    restarted_etl.poll()
+
+    # Test after method execution
+
+    assert restarted_etl.report()['daily_traded_volume'].tolist() == [1035 + 1028 + 1523 + 100]
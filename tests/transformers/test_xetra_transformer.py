@@ -9,6 +9,15 @@ import pytest
 
 from tests.transformers.s3_bucket_fixture import buckets
 from tests.transformers.xetra_data import conf_dict_src, conf_dict_trg, df_src, df_report
+from xetra.common.checkpoint import CheckpointStore
+from xetra.common.constants import CheckpointKinds
+from xetra.common.isin_dictionary import IsinDictionary
+from xetra.common.meta_process import MetaProcess
+from xetra.common.metrics import MetricsRegistry
+from xetra.common.profiling import MemoryProfiler
+from xetra.transformers.config import IntradayConfig
+from xetra.transformers.pipeline import PipelineConfig
+from xetra.transformers.planner import ExecutionPlanner
 from xetra.transformers.xetra_transformer import XetraETL, XetraTargetConfig, XetraSourceConfig
 
 meta_key = 'meta_file'
@@ -99,6 +108,32 @@ def test_extract_ok(buckets):
     pd.testing.assert_frame_equal(df_return, df_exp)
 
 
+
+def test_extract_concurrent_fetch(buckets):
+    """ Test if objects fetched concurrently are extracted in the same order as sequentially. """
+
+    # Expected results
+    df_exp = df_src.loc[1:8].reset_index(drop=True)
+
+    # Test init
+    conf_dict_src['first_extract_date'] = '2022-11-17'
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+
+    # Method execution
+
+    xetra_etl1 = XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key=meta_key,
+        src_args=XetraSourceConfig(**conf_dict_src),
+        trg_args=XetraTargetConfig(**conf_dict_trg),
+        fetch_workers=4
+    )
+
+    df_return = xetra_etl1.extract()
+
+    pd.testing.assert_frame_equal(df_return, df_exp)
+
 def test_transform_report1_empty(buckets, caplog):
     """ Test transform_report1 in case when the input data frame is empty. """
 
@@ -224,8 +259,7 @@ def test_load(buckets, caplog, meta_file_expected_dates):
     df_result = pd.read_parquet(out_buffer)
     pd.testing.assert_frame_equal(df_result, df_exp)
 
-    meta_file = s3_bucket_trg_connector.list_files_in_prefix(meta_key)[0]
-    df_meta_result = s3_bucket_trg_connector.read_csv_to_df(meta_file)
+    df_meta_result = MetaProcess.read_meta_file(s3_bucket_trg_connector, meta_key)
     
     print(f"{df_meta_result['source_date'].tolist()=}")
     assert df_meta_result['source_date'].tolist() == meta_file_expected_dates
@@ -267,8 +301,427 @@ def test_etl_report1(buckets, meta_file_expected_dates):
     df_result = pd.read_parquet(out_buffer)
     pd.testing.assert_frame_equal(df_result, df_exp)
 
-    meta_file = s3_bucket_trg_connector.list_files_in_prefix(meta_key)[0]
-    df_meta_result = s3_bucket_trg_connector.read_csv_to_df(meta_file)
+    df_meta_result = MetaProcess.read_meta_file(s3_bucket_trg_connector, meta_key)
 
     print(f"{df_meta_result['source_date'].tolist()=}")
     assert df_meta_result['source_date'].tolist() == meta_file_expected_dates
+
+
+@pytest.mark.parametrize('mode', ['pipelined', 'streaming', 'out_of_core'])
+def test_etl_report1_modes(buckets, mode):
+    """ Test if the other execution modes write the same report as the in memory mode. """
+
+    # Test init
+
+    conf_dict_src['first_extract_date'] = '2022-11-17'
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+    target_config = XetraTargetConfig(**conf_dict_trg)
+
+    # Method execution
+
+    xetra_etl1 = XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key=meta_key,
+        src_args=XetraSourceConfig(**conf_dict_src),
+        trg_args=target_config
+    )
+    xetra_etl1.etl_report1(mode=mode)
+
+    # Test after method execution
+
+    trg_file = s3_bucket_trg_connector.list_files_in_prefix(target_config.key)[0]
+    df_result = s3_bucket_trg_connector.read_parquet_to_df(trg_file)
+    pd.testing.assert_frame_equal(df_result, df_report)
+
+
+@pytest.mark.parametrize('mode', ['in_memory', 'pipelined', 'streaming', 'out_of_core'])
+def test_etl_report1_reuses_plan_listing(buckets, monkeypatch, mode):
+    """ Test if the extraction reuses the listing of the execution plan instead of listing the dates again. """
+
+    # Test init
+
+    conf_dict_src['first_extract_date'] = '2022-11-17'
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+    target_config = XetraTargetConfig(**conf_dict_trg)
+    xetra_etl1 = XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key=meta_key,
+        src_args=XetraSourceConfig(**conf_dict_src),
+        trg_args=target_config
+    )
+    plan = ExecutionPlanner(s3_bucket_src_connector).plan(xetra_etl1.extract_date_list)
+    list_objects_in_prefix = s3_bucket_src_connector.list_objects_in_prefix
+    prefixes = []
+
+    def list_and_record(prefix):
+        prefixes.append(prefix)
+        return list_objects_in_prefix(prefix)
+
+    monkeypatch.setattr(s3_bucket_src_connector, 'list_objects_in_prefix', list_and_record)
+
+    # Method execution
+
+    xetra_etl1.use_listing(plan.listing)
+    xetra_etl1.etl_report1(mode=mode)
+
+    # Test after method execution
+
+    assert prefixes == []
+    trg_file = s3_bucket_trg_connector.list_files_in_prefix(target_config.key)[0]
+    df_result = s3_bucket_trg_connector.read_parquet_to_df(trg_file)
+    pd.testing.assert_frame_equal(df_result, df_report)
+
+
+@pytest.mark.parametrize('mode', ['in_memory', 'pipelined', 'out_of_core'])
+def test_etl_report1_isin_dictionary(buckets, mode):
+    """ Test if the report processed with ISIN codes is the same, also when it is written with the codes. """
+
+    # Test init
+
+    conf_dict_src['first_extract_date'] = '2022-11-17'
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+    target_config = XetraTargetConfig(**conf_dict_trg)
+    isin_dictionary = IsinDictionary(s3_bucket_trg_connector, 'dictionary/isin_codes.csv')
+
+    # Method execution
+
+    for encode_output, suffix in ((False, '_decoded'), (True, '_encoded')):
+        XetraETL(
+            s3_bucket_src=s3_bucket_src_connector,
+            s3_bucket_trg=s3_bucket_trg_connector,
+            meta_key=meta_key,
+            src_args=XetraSourceConfig(**conf_dict_src),
+            trg_args=target_config,
+            update_meta=False,
+            report_key_suffix=suffix,
+            isin_dictionary=isin_dictionary,
+            encode_output=encode_output
+        ).etl_report1(mode=mode)
+
+    # Test after method execution
+
+    dictionary_file, = s3_bucket_trg_connector.list_files_in_prefix(f'{target_config.key}isin_dictionary_')
+    decoded_file, encoded_file = sorted(
+        (key for key in s3_bucket_trg_connector.list_files_in_prefix(target_config.key) if key != dictionary_file),
+        key=lambda key: key.endswith('_encoded.parquet')
+    )
+    pd.testing.assert_frame_equal(s3_bucket_trg_connector.read_parquet_to_df(decoded_file), df_report)
+    df_encoded = s3_bucket_trg_connector.read_parquet_to_df(encoded_file)
+    df_dictionary = s3_bucket_trg_connector.read_parquet_to_df(dictionary_file)
+    assert df_encoded['ISIN'].dtype == 'int32'
+    df_encoded['ISIN'] = df_dictionary.set_index('code').loc[df_encoded['ISIN'], 'isin'].to_numpy()
+    pd.testing.assert_frame_equal(
+        df_encoded.sort_values(by=['ISIN', 'Date']).reset_index(drop=True), df_report
+    )
+
+
+@pytest.mark.parametrize('mode', ['in_memory', 'streaming'])
+def test_etl_report1_intraday(buckets, mode):
+    """ Test if the intraday report is written with the bars and the VWAP of the extracted dates. """
+
+    # Expected results
+
+    vwap_0800 = ((23.31 + 24.34 + 24.22) / 3 * 1028 + (22.21 + 25.01 + 22.21) / 3 * 1523) / 2551
+    daily_vwap_1119 = (vwap_0800 * 2551 + 23.58 * 1035) / (2551 + 1035)
+
+    # Test init
+
+    conf_dict_src['first_extract_date'] = '2022-11-17'
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+
+    # Method execution
+
+    xetra_etl1 = XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key=meta_key,
+        src_args=XetraSourceConfig(**conf_dict_src),
+        trg_args=XetraTargetConfig(**conf_dict_trg),
+        intraday_config=IntradayConfig(key='intraday/xetra_intraday_', bucket_minutes=120),
+        metrics=MetricsRegistry()
+    )
+    if mode == 'streaming':
+        # The bars of an earlier extraction are not written again
+        xetra_etl1.extract_aggregated()
+    xetra_etl1.etl_report1(mode=mode)
+
+    # Test after method execution
+
+    intraday_file, = s3_bucket_trg_connector.list_files_in_prefix('intraday/xetra_intraday_')
+    df_result = s3_bucket_trg_connector.read_parquet_to_df(intraday_file)
+    stages = {stage.stage: stage for stage in xetra_etl1.metrics.stages()}
+    # The bars are recorded as a stage of their own, from the same source rows as the daily aggregates
+    assert stages['aggregate_intraday'].rows_in == stages['aggregate'].rows_in
+    assert df_result[['Date', 'Time']].values.tolist() == [
+        ['2022-11-17', '12:00'], ['2022-11-17', '14:00'], ['2022-11-18', '06:00'], ['2022-11-18', '08:00'],
+        ['2022-11-19', '06:00'], ['2022-11-19', '08:00']
+    ]
+    bar = df_result.iloc[-1]
+    assert (bar['opening_price_eur'], bar['closing_price_eur']) == (23.58, 22.21)
+    assert (bar['minimum_price_eur'], bar['maximum_price_eur'], bar['traded_volume']) == (22.21, 25.01, 2551)
+    assert bar['vwap_eur'] == round(vwap_0800, 2)
+    assert df_result['daily_vwap_eur'].tolist()[-2:] == [round(daily_vwap_1119, 2)] * 2
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_etl_report1_resume_from_checkpoint(buckets, monkeypatch, tmp_path, streaming):
+    """ Test if a retried run takes the source data from the checkpoint instead of downloading it again. """
+
+    # Expected output
+
+    df_exp = df_report
+
+    # Test init
+
+    extract_date = '2022-11-17'
+    conf_dict_src['first_extract_date'] = extract_date
+
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+
+    source_config = XetraSourceConfig(**conf_dict_src)
+    target_config = XetraTargetConfig(**conf_dict_trg)
+    checkpoint = CheckpointStore(prefix=f'{tmp_path}/')
+
+    # The first run fails before loading, but the extracted and aggregated dates are checkpointed
+
+    xetra_etl1 = XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key=meta_key,
+        src_args=source_config,
+        trg_args=target_config,
+        checkpoint=checkpoint
+    )
+    if streaming:
+        xetra_etl1.transform_report1(xetra_etl1.extract_aggregated(), aggregated=True)
+    else:
+        xetra_etl1.transform_report1(xetra_etl1.extract())
+
+    # Method execution - the retried run must not download any source file
+
+    def read_csv_to_df(*args, **kwargs):
+        raise AssertionError('Source file downloaded despite the checkpoint')
+
+    monkeypatch.setattr(s3_bucket_src_connector, 'read_csv_to_df', read_csv_to_df)
+
+    # The aggregated dates are not read from their parsed checkpoints either
+    loaded_kinds = []
+    load = checkpoint.load
+
+    def load_checkpoint(kind, date, fingerprint):
+        loaded_kinds.append(kind)
+        return load(kind, date, fingerprint)
+
+    monkeypatch.setattr(checkpoint, 'load', load_checkpoint)
+
+    xetra_etl2 = XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key=meta_key,
+        src_args=source_config,
+        trg_args=target_config,
+        checkpoint=checkpoint
+    )
+    if streaming:
+        df_result = xetra_etl2.transform_report1(xetra_etl2.extract_aggregated(), aggregated=True)
+    else:
+        df_result = xetra_etl2.transform_report1(xetra_etl2.extract())
+    xetra_etl2.load(df_result)
+
+    # Test after method execution
+
+    pd.testing.assert_frame_equal(df_result, df_exp)
+    assert loaded_kinds and set(loaded_kinds) == {CheckpointKinds.AGGREGATED.value}
+    assert not list(tmp_path.glob('*/*/*.parquet'))
+
+
+def test_etl_report1_late_source_file(buckets):
+    """ Test if a late source file of a processed date is picked up and only the affected rows are recomputed. """
+
+    # Test init - the first run processes all the dates and records the source objects
+
+    extract_date = '2022-11-17'
+    conf_dict_src['first_extract_date'] = extract_date
+    late_lookback_days = (datetime.date.today() - datetime.date(2022, 11, 16)).days
+
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+
+    source_config = XetraSourceConfig(**conf_dict_src)
+    target_config = XetraTargetConfig(**conf_dict_trg)
+
+    XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key=meta_key,
+        src_args=source_config,
+        trg_args=target_config,
+        late_lookback_days=late_lookback_days
+    ).etl_report1()
+
+    # A late file for 2022-11-18 arrives, it changes the closing price of the ISIN and adds a new ISIN
+
+    df_late_file = pd.DataFrame([
+        ['AT0000A0E9W5', 'SANT', '2022-11-18', '09:00', 21.14, 25.00, 21.14, 25.00, 100],
+        ['DE0005772206', 'FIE', '2022-11-18', '09:00', 10.00, 11.00, 10.00, 11.00, 50]
+    ], columns=df_src.columns)
+    s3_bucket_src_connector.write_df_to_s3(df_late_file, '2022-11-18/2022-11-18_BINS_XETR09.csv', 'csv')
+
+    # Method execution
+
+    xetra_etl2 = XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key=meta_key,
+        src_args=source_config,
+        trg_args=target_config,
+        late_lookback_days=late_lookback_days
+    )
+    df_late, df_affected = xetra_etl2.extract_late()
+    df_corrections = xetra_etl2.transform_late(df_late, df_affected)
+    xetra_etl2.load(xetra_etl2.transform_report1(xetra_etl2.extract()), df_corrections)
+
+    # Test after method execution
+
+    assert df_corrections[['ISIN', 'Date']].values.tolist() == [
+        ['AT0000A0E9W5', '2022-11-18'], ['AT0000A0E9W5', '2022-11-19'], ['DE0005772206', '2022-11-18']
+    ]
+    assert df_corrections['closing_price_eur'].tolist() == [25.0, 22.21, 11.0]
+    assert df_corrections['change_prev_closing_%'].tolist()[:2] == [17.98, -11.16]
+
+    corrections_file = s3_bucket_trg_connector.list_files_in_prefix(f'{target_config.key}corrections_')[0]
+    pd.testing.assert_frame_equal(s3_bucket_trg_connector.read_parquet_to_df(corrections_file), df_corrections)
+
+    # The late file is recorded, so the next run does not find anything
+    xetra_etl3 = XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key=meta_key,
+        src_args=source_config,
+        trg_args=target_config,
+        late_lookback_days=late_lookback_days
+    )
+    assert xetra_etl3.extract_late()[0].empty
+
+
+def test_extract_pipelined_stats(buckets):
+    """ Test if the pipelined extraction reports the statistics of its stages and records the source objects. """
+
+    # Test init
+
+    conf_dict_src['first_extract_date'] = '2022-11-17'
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+
+    xetra_etl1 = XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key=meta_key,
+        src_args=XetraSourceConfig(**conf_dict_src),
+        trg_args=XetraTargetConfig(**conf_dict_trg),
+        pipeline_config=PipelineConfig(download_workers=3, parse_workers=2, queue_size=1)
+    )
+
+    # Method execution
+
+    df_result = xetra_etl1.extract_pipelined()
+
+    # Test after method execution
+
+    assert len(df_result) == 4
+    assert sorted(xetra_etl1.processed_objects) == ['2022-11-16', '2022-11-17', '2022-11-18', '2022-11-19']
+    stats = {stage.name: stage for stage in xetra_etl1.pipeline_stats}
+    assert list(stats) == ['list', 'download', 'parse', 'aggregate', 'collect']
+    assert (stats['download'].workers, stats['download'].items) == (3, 8)
+    assert (stats['parse'].items, stats['aggregate'].items, stats['collect'].items) == (8, 8, 4)
+    assert all(0 <= stage.utilization <= 1 for stage in stats.values())
+
+
+def test_extract_pipelined_error(buckets, monkeypatch):
+    """ Test if an error of a stage is raised without blocking the pipeline. """
+
+    conf_dict_src['first_extract_date'] = '2022-11-17'
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+
+    def read_object(*args, **kwargs):
+        raise ValueError('Download failed')
+
+    monkeypatch.setattr(s3_bucket_src_connector, 'read_object', read_object)
+    xetra_etl1 = XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key=meta_key,
+        src_args=XetraSourceConfig(**conf_dict_src),
+        trg_args=XetraTargetConfig(**conf_dict_trg),
+        pipeline_config=PipelineConfig(download_workers=2, parse_workers=1, queue_size=1)
+    )
+
+    with pytest.raises(ValueError, match='Download failed'):
+        xetra_etl1.extract_pipelined()
+
+
+@pytest.mark.parametrize('mode', ['in_memory', 'pipelined', 'out_of_core'])
+def test_etl_report1_metrics(buckets, mode):
+    """ Test if the job records the metrics of its stages in the registry shared with the connectors. """
+
+    # Test init
+
+    conf_dict_src['first_extract_date'] = '2022-11-17'
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+    metrics = MetricsRegistry()
+    s3_bucket_src_connector.metrics = s3_bucket_trg_connector.metrics = metrics
+    xetra_etl = XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key=meta_key,
+        src_args=XetraSourceConfig(**conf_dict_src),
+        trg_args=XetraTargetConfig(**conf_dict_trg)
+    )
+
+    # Method execution
+
+    xetra_etl.etl_report1(mode=mode)
+
+    # Test after method execution
+
+    stages = {stage.stage: stage for stage in metrics.stages()}
+    assert xetra_etl.metrics is metrics
+    assert {'list', 'download', 'parse', 'aggregate', 'transform', 'serialize', 'upload'} <= set(stages)
+    # Source objects of 2022-11-16 .. 2022-11-19 (the previous day of the first date is read as well)
+    assert stages['download'].objects >= 7
+    assert stages['download'].bytes > 0
+    assert stages['aggregate'].rows_in == len(df_src[df_src['Date'] >= '2022-11-16'])
+    assert stages['transform'].rows_out == len(df_report)
+    assert stages['serialize'].rows_in >= len(df_report)
+    assert all(stage.seconds > 0 for stage in stages.values())
+
+
+def test_etl_report1_profile_memory(buckets):
+    """ Test if a memory profiler records a checkpoint at every stage boundary with the size of the DataFrames. """
+
+    # Test init
+
+    conf_dict_src['first_extract_date'] = '2022-11-17'
+    s3_bucket_src_connector, s3_bucket_trg_connector = buckets
+    profiler = MemoryProfiler()
+    xetra_etl = XetraETL(
+        s3_bucket_src=s3_bucket_src_connector,
+        s3_bucket_trg=s3_bucket_trg_connector,
+        meta_key=meta_key,
+        src_args=XetraSourceConfig(**conf_dict_src),
+        trg_args=XetraTargetConfig(**conf_dict_trg),
+        memory_profiler=profiler
+    )
+
+    # Method execution
+
+    profiler.start()
+    xetra_etl.etl_report1()
+    profiler.stop()
+
+    # Test after method execution
+
+    checkpoints = {checkpoint.stage: checkpoint for checkpoint in profiler.checkpoints}
+    assert list(checkpoints) == ['start', 'extract', 'extract_late', 'transform_report1', 'transform_late', 'load']
+    assert checkpoints['extract'].dataframes['df'] > checkpoints['transform_report1'].dataframes['df'] > 0
+    assert checkpoints['load'].dataframes == {}
@@ -0,0 +1,112 @@
+"""
+Staging area for per-date checkpoints of the ETL job.
+"""
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+from xetra.common.constants import CheckpointKinds, S3FileTypes
+from xetra.common.s3 import S3BucketConnector, S3ObjectInfo
+
+
+class CheckpointStore:
+    """
+    Class for storing and retrieving per-date shards of the ETL job.
+
+    A shard is saved under `<prefix><kind>/<date>/<fingerprint>.parquet`, where the fingerprint is computed from the
+    keys and ETags of the source objects of the date. If any source object of a date changes, its fingerprint changes
+    as well and the old shard is not used anymore.
+
+    The shards are stored in a local directory if no S3 bucket connector is given, otherwise in the S3 bucket.
+    """
+
+    def __init__(self, prefix: str, s3_bucket: S3BucketConnector = None):
+        """
+        Constructor for CheckpointStore
+
+        :param prefix: local directory or a key prefix in the S3 bucket, under which the shards are stored
+        :param s3_bucket: connection to the S3 bucket used as the staging area. If None, the local directory is used.
+        """
+        self._logger = logging.getLogger(__name__)
+        self.prefix = prefix
+        self.s3_bucket = s3_bucket
+
+    def __repr__(self):
+        return f"CheckpointStore(prefix='{self.prefix}', s3_bucket={self.s3_bucket!r})"
+
+    @staticmethod
+    def fingerprint(objects: List[S3ObjectInfo]) -> str:
+        """
+        Compute a fingerprint of a list of source objects.
+
+        :param objects: list of source objects of a single date
+        :return: hex digest which changes whenever any of the objects is added, removed or modified
+        """
+        content = '\n'.join(sorted(f'{obj.key}:{obj.etag}' for obj in objects))
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def _key(self, kind: str, date: str, fingerprint: str) -> str:
+        return f'{self.prefix}{kind}/{date}/{fingerprint}.{S3FileTypes.PARQUET.value}'
+
+    def load(self, kind: str, date: str, fingerprint: str) -> Optional[pd.DataFrame]:
+        """
+        Load a shard from the staging area.
+
+        :param kind: kind of the shard, one of xetra.common.constants.CheckpointKinds values
+        :param date: source date of the shard
+        :param fingerprint: fingerprint of the source objects of the date
+        :return: the stored data frame, or None if there is no such shard
+        """
+        key = self._key(kind, date, fingerprint)
+        if self.s3_bucket is None:
+            path = Path(key)
+            if not path.exists():
+                return None
+            df = pd.read_parquet(path)
+        else:
+            if key not in self.s3_bucket.list_files_in_prefix(prefix=key):
+                return None
+            df = self.s3_bucket.read_parquet_to_df(key)
+        self._logger.info(f'Using the {kind} checkpoint of {date}')
+        return df
+
+    def save(self, kind: str, date: str, fingerprint: str, df: pd.DataFrame):
+        """
+        Save a shard to the staging area. Shards of the same kind and date with other fingerprints are removed.
+
+        :param kind: kind of the shard, one of xetra.common.constants.CheckpointKinds values
+        :param date: source date of the shard
+        :param fingerprint: fingerprint of the source objects of the date
+        :param df: data frame to be stored
+        """
+        self.clear([date], kinds=[kind])
+        key = self._key(kind, date, fingerprint)
+        if self.s3_bucket is None:
+            path = Path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(path, index=False)
+        else:
+            self.s3_bucket.write_df_to_s3(df=df, key=key, file_format=S3FileTypes.PARQUET.value)
+
+    def clear(self, dates: List[str], kinds: List[str] = None):
+        """
+        Remove all the shards of given dates.
+
+        :param dates: list of source dates whose shards should be removed
+        :param kinds: kinds of the shards to be removed. By default, shards of every kind are removed.
+        """
+        kinds = kinds if kinds is not None else [kind.value for kind in CheckpointKinds]
+        for kind in kinds:
+            for date in dates:
+                prefix = f'{self.prefix}{kind}/{date}/'
+                if self.s3_bucket is None:
+                    for path in Path(prefix).glob('*'):
+                        path.unlink()
+                else:
+                    keys = self.s3_bucket.list_files_in_prefix(prefix=prefix)
+                    if keys:
+                        self.s3_bucket.delete_files(keys)
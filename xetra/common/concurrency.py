@@ -0,0 +1,218 @@
+"""
+Adaptive concurrency of the S3 requests: additive increase / multiplicative decrease (AIMD) of the number of requests
+in flight, driven by throttling (503 SlowDown) and latency.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+from botocore.exceptions import ClientError
+
+from xetra.common.s3_config import S3ConcurrencyConfig
+
+# Error codes by which S3 and the AWS APIs ask the client to slow down
+THROTTLING_ERROR_CODES = frozenset({
+    'SlowDown', 'ServiceUnavailable', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded',
+    'TooManyRequestsException', '503'
+})
+
+
+def is_throttling_error(error: ClientError) -> bool:
+    """
+    Whether the error asks the client to slow down.
+    """
+    code = error.response.get('Error', {}).get('Code')
+    status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    return code in THROTTLING_ERROR_CODES or status == 503
+
+
+class ConcurrencyStats(NamedTuple):
+    """
+    Class for the statistics of an AdaptiveConcurrencyLimiter.
+
+    limit: current number of requests allowed in flight
+    in_flight: number of requests in flight
+    max_in_flight: maximal number of requests which were in flight at once
+    requests: number of finished attempts of requests
+    throttled: number of attempts rejected by throttling
+    decreases: number of decreases of the limit
+    increases: number of increases of the limit
+    backoff_seconds: time the throttled requests waited before their next attempts, summed over the requests
+    latency_seconds: moving average of the latency of the successful attempts
+    """
+    limit: int
+    in_flight: int
+    max_in_flight: int
+    requests: int
+    throttled: int
+    decreases: int
+    increases: int
+    backoff_seconds: float
+    latency_seconds: Optional[float]
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits the number of S3 requests in flight and adapts the limit with AIMD:
+
+    - after `limit` consecutive attempts without a congestion signal the limit grows by `increase_step`
+    - on a congestion signal the limit is multiplied by `decrease_factor`
+
+    A congestion signal is a throttled attempt (503 SlowDown), a successful response which botocore had to retry, or a
+    moving average of the latency above `latency_target_seconds`. The attempts started before the last decrease do not
+    decrease the limit again, so a burst of throttled requests halves the limit only once. Throttled attempts are
+    retried with an exponential backoff with full jitter.
+
+    The limiter is thread safe and is shared by the connectors of a S3ConnectorFactory, i.e. by one connection pool.
+    """
+
+    # Weight of the last attempt in the moving average of the latency
+    _latency_weight = 0.2
+
+    def __init__(
+            self,
+            config: S3ConcurrencyConfig = S3ConcurrencyConfig(),
+            sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Constructor for AdaptiveConcurrencyLimiter
+
+        :param config: NamedTuple class with the concurrency configuration data
+        :param sleep: function sleeping between the attempts of a throttled request
+        """
+        self._logger = logging.getLogger(__name__)
+        self.config = config
+        self._sleep = sleep
+        self._condition = threading.Condition()
+        self.limit = min(max(config.initial_limit, config.min_limit), config.max_limit)
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._requests = 0
+        self._throttled = 0
+        self._decreases = 0
+        self._increases = 0
+        self._backoff_seconds = 0.0
+        self._latency: Optional[float] = None
+        # Attempts without a congestion signal since the last change of the limit
+        self._successes = 0
+        # Incremented by every decrease, attempts of an older epoch do not decrease the limit
+        self._epoch = 0
+
+    def __repr__(self):
+        return f'AdaptiveConcurrencyLimiter(config={self.config!r})'
+
+    def acquire(self) -> int:
+        """
+        Wait until a request may be sent.
+
+        :return: epoch of the attempt, to be passed to `release`
+        """
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+            return self._epoch
+
+    def release(self, epoch: int, latency: Optional[float] = None, congested: bool = False, throttled: bool = False):
+        """
+        Record a finished attempt and adapt the limit.
+
+        :param epoch: epoch returned by `acquire`
+        :param latency: latency of a successful attempt in seconds, None if the attempt failed
+        :param congested: whether the attempt signalled congestion
+        :param throttled: whether the attempt was throttled, it implies `congested`
+        """
+        with self._condition:
+            self._in_flight -= 1
+            self._requests += 1
+            self._throttled += int(throttled)
+            if latency is not None:
+                self._latency = latency if self._latency is None else (
+                    self._latency_weight * latency + (1 - self._latency_weight) * self._latency
+                )
+                target = self.config.latency_target_seconds
+                congested = congested or (target is not None and self._latency > target)
+            if congested or throttled:
+                self._successes = 0
+                if epoch == self._epoch:
+                    self._decrease('throttling' if throttled else 'congestion')
+            elif latency is not None:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.config.max_limit:
+                    self.limit = min(self.limit + self.config.increase_step, self.config.max_limit)
+                    self._increases += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+    def _decrease(self, reason: str):
+        limit = max(int(self.limit * self.config.decrease_factor), self.config.min_limit)
+        self._epoch += 1
+        self._decreases += 1
+        if limit != self.limit:
+            self._logger.info(f'S3 concurrency is decreased from {self.limit} to {limit} because of {reason}')
+        self.limit = limit
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Return the time to wait before the next attempt of a throttled request (exponential backoff, full jitter).
+
+        :param attempt: number of the failed attempt, starting with 1
+        """
+        cap = min(self.config.backoff_base_seconds * 2 ** (attempt - 1), self.config.backoff_max_seconds)
+        return random.uniform(0, cap)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        Call a function sending a S3 request under the limit. Throttled attempts are retried with a backoff.
+
+        :param func: function sending the request, e.g. a boto3 client method
+        :return: the result of the function
+
+        :raises
+        ClientError of the last attempt, if all the attempts are throttled, or of any not throttled attempt
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            epoch = self.acquire()
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except ClientError as error:
+                throttled = is_throttling_error(error)
+                self.release(epoch, throttled=throttled)
+                if not throttled or attempt >= self.config.max_attempts:
+                    raise
+                wait = self.backoff(attempt)
+                with self._condition:
+                    self._backoff_seconds += wait
+                self._sleep(wait)
+                continue
+            except BaseException:
+                self.release(epoch)
+                raise
+            # botocore retries throttled requests on its own as well, a retried response is a congestion signal
+            retried = isinstance(result, dict) and result.get('ResponseMetadata', {}).get('RetryAttempts', 0) > 0
+            self.release(epoch, latency=time.perf_counter() - started, congested=retried)
+            return result
+
+    def stats(self) -> ConcurrencyStats:
+        """
+        Return the statistics of the limiter.
+        """
+        with self._condition:
+            return ConcurrencyStats(
+                limit=self.limit,
+                in_flight=self._in_flight,
+                max_in_flight=self._max_in_flight,
+                requests=self._requests,
+                throttled=self._throttled,
+                decreases=self._decreases,
+                increases=self._increases,
+                backoff_seconds=round(self._backoff_seconds, 6),
+                latency_seconds=round(self._latency, 6) if self._latency is not None else None
+            )
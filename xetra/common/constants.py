@@ -22,3 +22,39 @@ class MetaProcessFormat(Enum):
     META_SOURCE_DATE_COL = 'source_date'
     META_PROCESS_COL = 'datetime_of_processing'
     META_FILE_FORMAT = 'csv'
+    META_SNAPSHOT_FORMAT = 'parquet'
+    META_SNAPSHOT_NAME = 'snapshot'
+    META_SEGMENTS_DIR = 'segments'
+    META_LOCK_NAME = 'compaction.lock'
+    META_OBJECTS_SUFFIX = '_objects'
+    META_OBJECT_KEY_COL = 'source_key'
+    META_OBJECT_ETAG_COL = 'source_etag'
+    META_OBJECT_LAST_MODIFIED_COL = 'source_last_modified'
+
+
+class CheckpointKinds(Enum):
+    """
+    Kinds of the per-date shards stored by CheckpointStore
+    """
+    PARSED = 'parsed'
+    AGGREGATED = 'aggregated'
+
+
+class WorkItemStatus(Enum):
+    """
+    Statuses of the items of a work queue
+    """
+    PENDING = 'pending'
+    CLAIMED = 'claimed'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+class ExecutionModes(Enum):
+    """
+    Execution modes of the report 1 job, see xetra.transformers.planner
+    """
+    IN_MEMORY = 'in_memory'
+    PIPELINED = 'pipelined'
+    STREAMING = 'streaming'
+    OUT_OF_CORE = 'out_of_core'
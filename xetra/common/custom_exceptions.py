@@ -16,4 +16,45 @@ class WrongMetaFileException(Exception):
     WrongMetaFileException class.
 
     Exception is raised when columns of an already existing meta file does not match columns of a new meta file.
-    """
\ No newline at end of file
+    """
+
+
+class WrongCalendarException(Exception):
+    """
+    WrongCalendarException class.
+
+    Exception is raised when a trading calendar defined in the configuration is not supported.
+    """
+
+
+class LeaseNotAcquiredException(Exception):
+    """
+    LeaseNotAcquiredException class.
+
+    Exception is raised when a lease required for an operation is held by another owner.
+    """
+
+
+class WrongWorkQueueException(Exception):
+    """
+    WrongWorkQueueException class.
+
+    Exception is raised when a work queue backend defined in the configuration is not supported.
+    """
+
+
+class WrongRollingStateException(Exception):
+    """
+    WrongRollingStateException class.
+
+    Exception is raised when the persisted state of the rolling windows is too short for the configured windows.
+    """
+
+
+class RollingStateConflictException(Exception):
+    """
+    RollingStateConflictException class.
+
+    Exception is raised when the closing prices of a run cannot be saved into the state of the rolling windows replaced
+    concurrently by another run.
+    """
@@ -0,0 +1,188 @@
+"""
+Persisted dictionary of ISIN codes.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from botocore.exceptions import ClientError
+import numpy as np
+import pandas as pd
+
+from xetra.common.constants import S3FileTypes
+from xetra.common.custom_exceptions import LeaseNotAcquiredException
+from xetra.common.lease import S3Lease
+from xetra.common.s3 import S3BucketConnector
+
+CODE_COL = 'code'
+ISIN_COL = 'isin'
+MAX_CODE = np.iinfo(np.int32).max
+
+
+class IsinDictionary:
+    """
+    Class for an append-only dictionary mapping ISINs to int32 codes, stored as a single object in an S3 bucket and
+    maintained across runs.
+
+    The code of an ISIN is its position in the dictionary. New ISINs are appended at the end, so a code is never
+    reassigned and reports or checkpoints written with codes stay valid. The ISINs are appended under a lease
+    (<key without extension>.lock): the dictionary is read again under the lease, so ISINs appended concurrently by
+    another process keep their codes.
+
+    Grouping, sorting and joining on int32 codes is cheaper than on the ISIN strings, and a column of codes takes
+    4 bytes per row instead of a Python string object.
+    """
+
+    def __init__(
+            self,
+            s3_bucket: S3BucketConnector,
+            key: str = 'dictionary/isin_codes.csv',
+            lease_ttl_seconds: float = 60,
+            max_retries: int = 10,
+            retry_seconds: float = 0.5
+    ):
+        """
+        Constructor for IsinDictionary
+
+        :param s3_bucket: connection to the S3 bucket storing the dictionary
+        :param key: key of the dictionary object, its extension is the file format ('csv' or 'parquet')
+        :param lease_ttl_seconds: expiry of the lease appending new ISINs
+        :param max_retries: number of attempts to acquire the lease
+        :param retry_seconds: time to wait between two attempts
+        """
+        self._logger = logging.getLogger(__name__)
+        self.s3_bucket = s3_bucket
+        self.key = key
+        self.file_format = os.path.splitext(key)[1].lstrip('.') or S3FileTypes.CSV.value
+        self.lock_key = f'{os.path.splitext(key)[0]}.lock'
+        self.lease_ttl_seconds = lease_ttl_seconds
+        self.max_retries = max_retries
+        self.retry_seconds = retry_seconds
+        self._isins = np.array([], dtype=object)
+        self._index = pd.Index(self._isins)
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"IsinDictionary(key='{self.key}', isins={len(self._isins)})"
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._isins)
+
+    def _read(self) -> Optional[pd.DataFrame]:
+        try:
+            if self.file_format == S3FileTypes.PARQUET.value:
+                return self.s3_bucket.read_parquet_to_df(self.key, cached=True)
+            return self.s3_bucket.read_csv_to_df(self.key, cached=True)
+        except ClientError as error:
+            if error.response['ResponseMetadata']['HTTPStatusCode'] == 404:
+                return None
+            raise
+
+    def load(self):
+        """
+        Read the dictionary from the bucket, replacing the codes held in memory.
+        """
+        df = self._read()
+        isins = np.array([], dtype=object) if df is None else df.sort_values(CODE_COL)[ISIN_COL].to_numpy(dtype=object)
+        self._isins = isins
+        self._index = pd.Index(isins)
+        self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Return the dictionary as a pandas DataFrame with the code and the isin columns.
+        """
+        self._ensure_loaded()
+        return pd.DataFrame({CODE_COL: np.arange(len(self._isins), dtype=np.int32), ISIN_COL: self._isins})
+
+    def _append(self, isins: np.ndarray):
+        """
+        Append ISINs missing in the dictionary under the lease and write the dictionary.
+        """
+        lease = S3Lease(self.s3_bucket, self.lock_key, ttl_seconds=self.lease_ttl_seconds)
+        for _ in range(self.max_retries):
+            if lease.acquire():
+                break
+            time.sleep(self.retry_seconds)
+        else:
+            raise LeaseNotAcquiredException(f'The lease {self.lock_key} of the ISIN dictionary could not be acquired')
+        try:
+            self.load()
+            missing = isins[self._index.get_indexer(isins) < 0]
+            if len(missing) == 0:
+                return
+            if len(self._isins) + len(missing) > MAX_CODE:
+                raise OverflowError(f'The ISIN dictionary {self.key} cannot hold more than {MAX_CODE} ISINs')
+            self._isins = np.concatenate([self._isins, missing.astype(object)])
+            self._index = pd.Index(self._isins)
+            self.s3_bucket.write_df_to_s3(self.to_frame(), self.key, self.file_format, cached=True)
+            self._logger.info(f'{len(missing)} ISINs are appended to the ISIN dictionary {self.key}.')
+        finally:
+            lease.release()
+
+    def encode(self, isins) -> np.ndarray:
+        """
+        Map ISINs to their codes, ISINs missing in the dictionary are appended to it.
+
+        :param isins: array-like of ISIN strings without missing values
+        :return: numpy array of int32 codes
+        """
+        self._ensure_loaded()
+        inverse, uniques = pd.factorize(np.asarray(isins, dtype=object))
+        codes = self._index.get_indexer(uniques)
+        if (codes < 0).any():
+            with self._lock:
+                self._append(uniques[self._index.get_indexer(uniques) < 0])
+            codes = self._index.get_indexer(uniques)
+        return codes.astype(np.int32)[inverse]
+
+    def decode(self, codes) -> np.ndarray:
+        """
+        Map codes back to their ISINs.
+
+        :param codes: array-like of codes
+        :return: numpy array of ISIN strings
+        """
+        self._ensure_loaded()
+        codes = np.asarray(codes)
+        if len(codes) and codes.max() >= len(self._isins):
+            # The codes were assigned by another process after the dictionary has been read
+            with self._lock:
+                self.load()
+        return self._isins[codes]
+
+    def encode_column(self, df: pd.DataFrame, column: str) -> pd.DataFrame:
+        """
+        Replace a column of ISINs by their codes. Rows without an ISIN are dropped, a column of codes is kept.
+
+        :param df: pandas DataFrame with the column
+        :param column: name of the ISIN column
+        :return: pandas DataFrame with the int32 codes in the column
+        """
+        if column not in df.columns or pd.api.types.is_integer_dtype(df[column]):
+            return df
+        df = df[df[column].notna()]
+        return df.assign(**{column: self.encode(df[column].to_numpy())})
+
+    def decode_column(self, df: pd.DataFrame, column: str) -> pd.DataFrame:
+        """
+        Replace a column of codes by their ISINs, a column of ISINs is kept.
+
+        :param df: pandas DataFrame with the column
+        :param column: name of the code column
+        :return: pandas DataFrame with the ISINs in the column
+        """
+        if column not in df.columns or not pd.api.types.is_integer_dtype(df[column]):
+            return df
+        return df.assign(**{column: self.decode(df[column].to_numpy())})
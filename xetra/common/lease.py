@@ -0,0 +1,120 @@
+"""
+Leases emulated by lock objects in S3.
+"""
+
+import json
+import logging
+import socket
+import time
+from typing import Optional
+import uuid
+
+from botocore.exceptions import ClientError
+
+from xetra.common.custom_exceptions import LeaseNotAcquiredException
+from xetra.common.s3 import S3BucketConnector
+
+
+class S3Lease:
+    """
+    Class for a lease (a lock with an expiry) emulated by a lock object in the S3 bucket.
+
+    The lock object holds the owner of the lease and the time the lease expires. An expired lease can be taken over by
+    another owner, so a crashed process does not block the others forever.
+
+    If botocore supports conditional PUT requests, a free lease is acquired with `If-None-Match: *`, so only one of the
+    competing processes can create the lock object. Otherwise (and when taking over an expired lease) the lock object
+    is written, and after `settle_seconds` read back to check that no other process has overwritten it.
+    """
+
+    def __init__(
+            self,
+            s3_bucket: S3BucketConnector,
+            key: str,
+            ttl_seconds: float = 300,
+            owner: str = None,
+            settle_seconds: float = 0.2
+    ):
+        """
+        Constructor for S3Lease
+
+        :param s3_bucket: connection to the S3 bucket storing the lock object
+        :param key: key of the lock object
+        :param ttl_seconds: time after which the lease expires if it is not renewed
+        :param owner: identifier of the lease owner, by default unique for every instance
+        :param settle_seconds: time to wait before reading the written lock object back
+        """
+        self._logger = logging.getLogger(__name__)
+        self.s3_bucket = s3_bucket
+        self.key = key
+        self.ttl_seconds = ttl_seconds
+        self.owner = owner or f'{socket.gethostname()}-{uuid.uuid4().hex[:8]}'
+        self.settle_seconds = settle_seconds
+        self.acquired = False
+
+    def __repr__(self):
+        return f"S3Lease(key='{self.key}', owner='{self.owner}', ttl_seconds={self.ttl_seconds})"
+
+    def __enter__(self):
+        if not self.acquire():
+            raise LeaseNotAcquiredException(f'The lease {self.key} is held by another owner')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def _read(self) -> Optional[dict]:
+        try:
+            return json.loads(self.s3_bucket.read_object(self.key))
+        except ClientError as error:
+            if error.response['ResponseMetadata']['HTTPStatusCode'] == 404:
+                return None
+            raise
+
+    def _body(self) -> bytes:
+        return json.dumps({'owner': self.owner, 'expires_at': time.time() + self.ttl_seconds}).encode('utf-8')
+
+    def acquire(self) -> bool:
+        """
+        Try to acquire the lease. It does not wait for the lease to be released.
+
+        :return: True if the lease is acquired (or has already been held by the owner), False otherwise
+        """
+        current = self._read()
+        if current is not None and current['owner'] != self.owner and current['expires_at'] > time.time():
+            return False
+
+        if current is None and self.s3_bucket.supports_conditional_writes:
+            self.acquired = self.s3_bucket.write_object(self.key, self._body(), if_none_match=True) is not None
+        else:
+            self.s3_bucket.write_object(self.key, self._body())
+            time.sleep(self.settle_seconds)
+            current = self._read()
+            self.acquired = current is not None and current['owner'] == self.owner
+
+        if self.acquired:
+            self._logger.info(f'The lease {self.key} is acquired by {self.owner}')
+        return self.acquired
+
+    def renew(self) -> bool:
+        """
+        Extend the lease by `ttl_seconds` from now.
+
+        :return: True if the lease is still held by the owner, False if it has been taken over by someone else
+        """
+        current = self._read()
+        if current is None or current['owner'] != self.owner:
+            self.acquired = False
+            return False
+        self.s3_bucket.write_object(self.key, self._body())
+        return True
+
+    def release(self):
+        """
+        Release the lease, if it is held by the owner.
+        """
+        current = self._read()
+        if current is not None and current['owner'] == self.owner:
+            self.s3_bucket.delete_files([self.key])
+            self._logger.info(f'The lease {self.key} is released by {self.owner}')
+        self.acquired = False
@@ -0,0 +1,228 @@
+"""
+Append-only log for storing meta data in S3.
+"""
+
+from datetime import datetime
+import logging
+import os
+from typing import List, NamedTuple, Optional
+import uuid
+
+from botocore.exceptions import ClientError
+import pandas as pd
+
+from xetra.common.constants import MetaProcessFormat
+from xetra.common.custom_exceptions import WrongMetaFileException
+from xetra.common.lease import S3Lease
+from xetra.common.s3 import S3BucketConnector
+
+
+class MetaLogParts(NamedTuple):
+    """
+    Class for the keys of the objects building a meta log.
+
+    legacy_key: key of a meta file written as a single csv (by earlier versions), or None
+    snapshot_key: key of the compacted snapshot, or None
+    segment_keys: keys of the segments written after the last compaction, in the order of writing
+    snapshot_etag: ETag of the snapshot, or None
+    """
+    legacy_key: Optional[str]
+    snapshot_key: Optional[str]
+    segment_keys: List[str]
+    snapshot_etag: Optional[str] = None
+
+
+class MetaLog:
+    """
+    Class for a meta table stored as an append-only log of small segment objects, which are periodically compacted
+    into a single parquet snapshot.
+
+    For the meta_key 'meta/meta_file.csv' the log is stored as:
+        meta/meta_file/snapshot.parquet
+        meta/meta_file/segments/<timestamp>_<id>.csv
+
+    Every append writes one small segment, so neither writing nor reading has to rewrite the whole history. A meta file
+    stored as a single csv under the meta_key itself (the layout used before the log) is read as the oldest part of the
+    log and folded into the snapshot by the first compaction.
+
+    The log is safe for concurrent writers: segments have unique keys, so appends never overwrite each other, and
+    compaction is done only under a lease (meta/meta_file/compaction.lock). The snapshot is replaced only if its ETag is
+    still the one that was read, otherwise the compaction is retried on the new snapshot. If the lease is held by
+    another process, the compaction is skipped and the new rows are written as a segment.
+    """
+
+    def __init__(
+            self,
+            s3_bucket: S3BucketConnector,
+            meta_key: str,
+            columns: List[str],
+            compact_every: int = 20,
+            lease_ttl_seconds: float = 300,
+            max_retries: int = 3
+    ):
+        """
+        Constructor for MetaLog
+
+        :param s3_bucket: connection to the S3 bucket storing the log
+        :param meta_key: key of the meta file, the log is stored under the key without its extension
+        :param columns: column names of the meta table
+        :param compact_every: number of segments, after which the log is compacted into the snapshot
+        :param lease_ttl_seconds: expiry of the compaction lease
+        :param max_retries: number of compaction attempts when the snapshot is replaced concurrently
+        """
+        self._logger = logging.getLogger(__name__)
+        self.s3_bucket = s3_bucket
+        self.meta_key = meta_key
+        self.columns = columns
+        self.compact_every = compact_every
+        self.lease_ttl_seconds = lease_ttl_seconds
+        self.max_retries = max_retries
+
+        base_key = os.path.splitext(meta_key)[0]
+        self.snapshot_key = (
+            f'{base_key}/{MetaProcessFormat.META_SNAPSHOT_NAME.value}.{MetaProcessFormat.META_SNAPSHOT_FORMAT.value}'
+        )
+        self.log_prefix = f'{base_key}/'
+        self.segments_prefix = f'{base_key}/{MetaProcessFormat.META_SEGMENTS_DIR.value}/'
+        self.lock_key = f'{base_key}/{MetaProcessFormat.META_LOCK_NAME.value}'
+
+    def parts(self) -> MetaLogParts:
+        """
+        List the objects the log consists of. It costs a LIST request of the log's own prefix and a HEAD request for
+        the legacy meta file. Objects of other keys sharing the name, e.g. '<base>_objects/...', are never listed.
+        """
+        etags = {obj.key: obj.etag for obj in self.s3_bucket.list_objects_in_prefix(prefix=self.log_prefix)}
+        return MetaLogParts(
+            legacy_key=self.meta_key if self.s3_bucket.get_etag(self.meta_key) is not None else None,
+            snapshot_key=self.snapshot_key if self.snapshot_key in etags else None,
+            segment_keys=sorted(key for key in etags if key.startswith(self.segments_prefix)),
+            snapshot_etag=etags.get(self.snapshot_key)
+        )
+
+    def read(self, parts: MetaLogParts = None) -> Optional[pd.DataFrame]:
+        """
+        Read the whole meta table.
+
+        If a part was deleted after listing it (merged by a concurrent compaction), the log is listed and read again.
+
+        :param parts: parts of the log to be read. By default, the bucket is listed to find them.
+        :return: pandas DataFrame with the meta table, or None if the log does not exist
+        """
+        parts = parts if parts is not None else self.parts()
+        for _ in range(self.max_retries):
+            try:
+                return self._read_parts(parts)
+            except ClientError as error:
+                if error.response['ResponseMetadata']['HTTPStatusCode'] != 404:
+                    raise
+                self._logger.info('A part of the meta log was merged by a concurrent compaction. Listing it again...')
+                parts = self.parts()
+        return self._read_parts(parts)
+
+    def _read_parts(self, parts: MetaLogParts) -> Optional[pd.DataFrame]:
+        dfs = []
+        # All the meta values are strings, e.g. an ETag of digits only must not be parsed as a number.
+        # The snapshot is read with a conditional GET, segments are never modified, so a cached segment is not fetched
+        if parts.legacy_key is not None:
+            dfs.append(self.s3_bucket.read_csv_to_df(parts.legacy_key, cached=True, dtype=str))
+        if parts.snapshot_key is not None:
+            dfs.append(self.s3_bucket.read_parquet_to_df(parts.snapshot_key, cached=True))
+        dfs.extend(
+            self.s3_bucket.read_csv_to_df(key, cached=True, immutable=True, dtype=str) for key in parts.segment_keys
+        )
+        if not dfs:
+            return None
+        return pd.concat(dfs, ignore_index=True)
+
+    def append(self, df: pd.DataFrame):
+        """
+        Append rows to the log. The rows are written as a new segment, or, if the log is due for compaction, together
+        with the rest of the log into a new snapshot.
+
+        :param df: pandas DataFrame with new rows of the meta table
+
+        :raises
+        WrongMetaFileException, if columns of the new rows or of the existing meta data does not match the columns of
+        the meta table
+        """
+        # The order of the columns is not important
+        if sorted(df.columns) != sorted(self.columns):
+            raise WrongMetaFileException(f'Columns {df.columns} and {self.columns} does not match')
+        parts = self.parts()
+        if parts.legacy_key is not None or len(parts.segment_keys) + 1 >= self.compact_every:
+            self.compact(df)
+        else:
+            self._write_segment(df)
+
+    def _write_segment(self, df: pd.DataFrame):
+        key = (
+            f'{self.segments_prefix}{datetime.now().strftime("%Y%m%d%H%M%S%f")}_{uuid.uuid4().hex[:8]}.'
+            f'{MetaProcessFormat.META_FILE_FORMAT.value}'
+        )
+        self.s3_bucket.write_df_to_s3(
+            df=df, key=key, file_format=MetaProcessFormat.META_FILE_FORMAT.value, cached=True
+        )
+
+    def compact(self, df_new: pd.DataFrame = None):
+        """
+        Merge the legacy meta file, the snapshot and all the segments (and optionally new rows) into a new snapshot.
+        The merged objects are deleted afterwards.
+
+        If the compaction cannot be done, because another process holds the lease or keeps replacing the snapshot,
+        the new rows are written as a segment.
+
+        :param df_new: pandas DataFrame with new rows to be added to the snapshot
+
+        :raises
+        WrongMetaFileException, if columns of the existing meta data does not match the columns of the meta table
+        """
+        lease = S3Lease(self.s3_bucket, self.lock_key, ttl_seconds=self.lease_ttl_seconds)
+        if not lease.acquire():
+            self._logger.info('Another process is compacting the meta log. The compaction is skipped.')
+            if df_new is not None:
+                self._write_segment(df_new)
+            return
+
+        try:
+            for _ in range(self.max_retries):
+                if self._compact_once(df_new):
+                    return
+                self._logger.info('The meta snapshot was replaced concurrently. Retrying the compaction...')
+        finally:
+            lease.release()
+
+        self._logger.info('The meta log could not be compacted. The new rows are written as a segment.')
+        if df_new is not None:
+            self._write_segment(df_new)
+
+    def _compact_once(self, df_new: Optional[pd.DataFrame]) -> bool:
+        """
+        Do a single compaction attempt.
+
+        :return: False if the snapshot was replaced since it was read, True otherwise
+        """
+        parts = self.parts()
+        df_old = self.read(parts)
+        dfs = [df for df in [df_old, df_new] if df is not None]
+        for df in dfs:
+            # The order of the columns is not important
+            if sorted(df.columns) != sorted(self.columns):
+                raise WrongMetaFileException(f'Columns {df.columns} and {self.columns} does not match')
+        if not dfs or all(df.empty for df in dfs):
+            self._logger.info('The meta log is empty. Nothing to compact.')
+            return True
+
+        df_all = pd.concat(dfs, ignore_index=True).loc[:, self.columns].astype(str)
+
+        # Emulation of a conditional write - the snapshot is replaced only if it is the one that was read
+        if self.s3_bucket.get_etag(self.snapshot_key) != parts.snapshot_etag:
+            return False
+        self.s3_bucket.write_df_to_s3(
+            df=df_all, key=self.snapshot_key, file_format=MetaProcessFormat.META_SNAPSHOT_FORMAT.value, cached=True
+        )
+
+        merged_keys = parts.segment_keys + ([parts.legacy_key] if parts.legacy_key is not None else [])
+        if merged_keys:
+            self.s3_bucket.delete_files(merged_keys)
+        self._logger.info(f'Compacted {len(merged_keys)} meta objects into {self.snapshot_key}')
+        return True
@@ -2,27 +2,73 @@
 Methods for processing the meta file.
 """
 
-import collections
-from datetime import datetime, timedelta
-from typing import List, Tuple
+from datetime import datetime
+import os
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
 from xetra.common.constants import MetaProcessFormat
-from xetra.common.custom_exceptions import WrongMetaFileException
-from xetra.common.s3 import S3BucketConnector
+from xetra.common.meta_log import MetaLog
+from xetra.common.s3 import S3BucketConnector, S3ObjectInfo
+from xetra.common.trading_calendar import TradingCalendar
 
 
 class MetaProcess:
     """
     Class for working with the meta file.
 
-    The class has two static method and no attributes. One could design them as two normal functions, but class oriented
+    The class has only static methods and no attributes. One could design them as normal functions, but class oriented
     approach is taken here to be consistent with other parts of the project.
+
+    The meta file is stored as an append-only MetaLog, see xetra.common.meta_log. Next to the meta file there is an
+    object meta file (with the `_objects` suffix), which records every processed source object with its ETag.
     """
 
     @staticmethod
-    def update_meta_file(s3_bucket_meta: S3BucketConnector, meta_key: str, extract_date_list: List):
+    def _meta_log(s3_bucket_meta: S3BucketConnector, meta_key: str, compact_every: int = 20) -> MetaLog:
+        return MetaLog(
+            s3_bucket=s3_bucket_meta,
+            meta_key=meta_key,
+            columns=[MetaProcessFormat.META_SOURCE_DATE_COL.value, MetaProcessFormat.META_PROCESS_COL.value],
+            compact_every=compact_every
+        )
+
+    @staticmethod
+    def read_meta_file(s3_bucket_meta: S3BucketConnector, meta_key: str) -> Optional[pd.DataFrame]:
+        """
+        Read the whole meta file.
+
+        :param s3_bucket_meta: S3 bucket connector, for connecting with the bucket and reading the meta file.
+        :param meta_key: A key (name) of the meta file in the bucket.
+
+        :returns
+        pandas DataFrame with the meta file, or None if there is no meta file in the bucket
+        """
+        return MetaProcess._meta_log(s3_bucket_meta, meta_key).read()
+
+    @staticmethod
+    def update_meta_file(
+            s3_bucket_meta: S3BucketConnector,
+            meta_key: str,
+            extract_date_list: List,
+            compact_every: int = 20
+    ):
+        """
+        Record the processed dates in the meta file.
+
+        Only the new rows are written (as a small segment of the meta log), the existing meta file is neither read nor
+        rewritten. Every `compact_every` updates the segments are compacted into a single snapshot.
+
+        :param s3_bucket_meta: S3 bucket connector, for connecting with the bucket and writing the meta file.
+        :param meta_key: A key (name) of the meta file in the bucket.
+        :param extract_date_list: A list of processed dates.
+        :param compact_every: Number of segments, after which the meta log is compacted.
+
+        :raises
+        WrongMetaFileException, if columns of an already existing meta file does not match columns of a new meta file
+        """
         # Create an empty DataFrame with column names predefined with the MetaProcessFormat enum.
         new_meta_file_df = pd.DataFrame(
             columns=[
@@ -38,31 +84,118 @@ class MetaProcess:
         new_meta_file_df[MetaProcessFormat.META_PROCESS_COL.value] = \
             datetime.today().strftime(MetaProcessFormat.META_DATE_FORMAT.value)
 
-        try:
-            # If some meta file already exists -> concatenate it with new meta data frame
-            old_meta_file_df = s3_bucket_meta.read_csv_to_df(key=meta_key)
+        MetaProcess._meta_log(s3_bucket_meta, meta_key, compact_every).append(new_meta_file_df)
 
-            # Check if the two meta files has the same columns (but an order of columns is not important)
-            if collections.Counter(old_meta_file_df.columns) != collections.Counter(new_meta_file_df.columns):
-                raise WrongMetaFileException(
-                    f'Columns {old_meta_file_df.columns} and {new_meta_file_df.columns} does not match'
-                )
-            meta_file_all_df = pd.concat([old_meta_file_df, new_meta_file_df])
+    @staticmethod
+    def _object_meta_log(s3_bucket_meta: S3BucketConnector, meta_key: str, compact_every: int = 20) -> MetaLog:
+        base_key, extension = os.path.splitext(meta_key)
+        return MetaLog(
+            s3_bucket=s3_bucket_meta,
+            meta_key=f'{base_key}{MetaProcessFormat.META_OBJECTS_SUFFIX.value}{extension}',
+            columns=[
+                MetaProcessFormat.META_OBJECT_KEY_COL.value,
+                MetaProcessFormat.META_OBJECT_ETAG_COL.value,
+                MetaProcessFormat.META_OBJECT_LAST_MODIFIED_COL.value,
+                MetaProcessFormat.META_SOURCE_DATE_COL.value,
+                MetaProcessFormat.META_PROCESS_COL.value
+            ],
+            compact_every=compact_every
+        )
+
+    @staticmethod
+    def read_object_meta_file(s3_bucket_meta: S3BucketConnector, meta_key: str) -> Optional[pd.DataFrame]:
+        """
+        Read the whole object meta file.
+
+        :param s3_bucket_meta: S3 bucket connector, for connecting with the bucket and reading the meta file.
+        :param meta_key: A key (name) of the meta file in the bucket.
 
-        except s3_bucket_meta.session.client('s3').exceptions.NoSuchKey:
-            # No meta file exists -> use only the new data
-            meta_file_all_df = new_meta_file_df
+        :returns
+        pandas DataFrame with the object meta file, or None if there is no object meta file in the bucket
+        """
+        return MetaProcess._object_meta_log(s3_bucket_meta, meta_key).read()
+
+    @staticmethod
+    def update_object_meta_file(
+            s3_bucket_meta: S3BucketConnector,
+            meta_key: str,
+            objects: Dict[str, List[S3ObjectInfo]],
+            compact_every: int = 20
+    ):
+        """
+        Record the processed source objects in the object meta file.
 
-        # Write the meta file to S3
-        s3_bucket_meta.write_df_to_s3(
-            df=meta_file_all_df, key=meta_key, file_format=MetaProcessFormat.META_FILE_FORMAT.value
+        :param s3_bucket_meta: S3 bucket connector, for connecting with the bucket and writing the meta file.
+        :param meta_key: A key (name) of the meta file in the bucket.
+        :param objects: A dictionary of processed source objects per source date.
+        :param compact_every: Number of segments, after which the object meta log is compacted.
+        """
+        rows = [
+            (obj.key, obj.etag, str(obj.last_modified), date)
+            for date, date_objects in objects.items()
+            for obj in date_objects
+        ]
+        new_meta_file_df = pd.DataFrame(
+            rows,
+            columns=[
+                MetaProcessFormat.META_OBJECT_KEY_COL.value,
+                MetaProcessFormat.META_OBJECT_ETAG_COL.value,
+                MetaProcessFormat.META_OBJECT_LAST_MODIFIED_COL.value,
+                MetaProcessFormat.META_SOURCE_DATE_COL.value
+            ]
+        )
+        new_meta_file_df[MetaProcessFormat.META_PROCESS_COL.value] = \
+            datetime.today().strftime(MetaProcessFormat.META_PROCESS_DATA_FORMAT.value)
+
+        MetaProcess._object_meta_log(s3_bucket_meta, meta_key, compact_every).append(new_meta_file_df)
+
+    @staticmethod
+    def return_changed_objects(
+            s3_bucket_meta: S3BucketConnector,
+            meta_key: str,
+            objects: Dict[str, List[S3ObjectInfo]]
+    ) -> Dict[str, List[S3ObjectInfo]]:
+        """
+        Return the source objects which are new or changed since the last time their date was processed.
+
+        Only dates which have some objects recorded in the object meta file are checked. Dates processed before the
+        objects were recorded are skipped, because it is not known which of their objects were processed.
+
+        :param s3_bucket_meta: S3 bucket connector, for connecting with the bucket and reading the meta file.
+        :param meta_key: A key (name) of the meta file in the bucket.
+        :param objects: A dictionary of the current source objects per source date, as listed in the source bucket.
+
+        :returns
+        dictionary of the new or changed source objects per source date, dates without such objects are omitted
+        """
+        df_objects = MetaProcess.read_object_meta_file(s3_bucket_meta, meta_key)
+        if df_objects is None:
+            return {}
+
+        # The log is ordered by the time of writing, so the last row of a key holds its latest processed ETag
+        processed_etags = (
+            df_objects
+            .drop_duplicates(subset=MetaProcessFormat.META_OBJECT_KEY_COL.value, keep='last')
+            .set_index(MetaProcessFormat.META_OBJECT_KEY_COL.value)[MetaProcessFormat.META_OBJECT_ETAG_COL.value]
+            .to_dict()
         )
+        recorded_dates = set(df_objects[MetaProcessFormat.META_SOURCE_DATE_COL.value].astype(str))
+
+        changed_objects = {}
+        for date, date_objects in objects.items():
+            if date not in recorded_dates:
+                continue
+            changed = [obj for obj in date_objects if processed_etags.get(obj.key) != obj.etag]
+            if changed:
+                changed_objects[date] = changed
+        return changed_objects
 
     @staticmethod
     def return_date_list(
             s3_bucket_meta: S3BucketConnector,
             first_date: str,
-            meta_key: str = 'meta_file.csv'
+            meta_key: str = 'meta_file.csv',
+            calendar: TradingCalendar = None
     ) -> Tuple[str, List[str]]:
         """
         Return dates that were not processed since `first_date` to today and the earliest such unprocessed date
@@ -83,36 +216,68 @@ class MetaProcess:
         :param first_date: A string representing the date. It has to be in the format specified by
         xetra.common.constants.MetaProcessFormat.META_DATE_FORMAT.value
         :param meta_key: A key (name) of the meta file in the bucket.
+        :param calendar: A trading calendar. If given, only its trading days are returned and the day before means
+        the previous trading day. By default, every calendar day is returned.
 
         :returns
         minimal unprocessed date `min_date` and a list of unprocessed since `min_date` to today
         """
 
-        # We have to take the day before in order to calculate percentage change of prices
-        min_date = datetime.strptime(first_date, MetaProcessFormat.META_DATE_FORMAT.value).date() - timedelta(days=1)
-        today = datetime.today().date()
+        df_meta = MetaProcess.read_meta_file(s3_bucket_meta, meta_key)
+        return MetaProcess.date_list_from_meta(df_meta, first_date, calendar)
 
-        try:
-            df_meta = s3_bucket_meta.read_csv_to_df(meta_key)
-        except s3_bucket_meta.session.client('s3').exceptions.NoSuchKey:
-            return_dates = [
-                (min_date + timedelta(days=x)).strftime(MetaProcessFormat.META_DATE_FORMAT.value)
-                for x in range((today - min_date).days + 1)
-            ]
-            return_min_date = first_date
-        else:
-            dates = [min_date + timedelta(days=x) for x in range((today - min_date).days + 1)]
-            src_dates = set(pd.to_datetime(df_meta['source_date']).dt.date)
-
-            # Dates since `first_date` that were not in the meta file
-            dates_missing = set(dates[1:]) - src_dates
-
-            if dates_missing:
-                min_date = min(dates_missing) - timedelta(days=1)
-                return_dates = [date.strftime(MetaProcessFormat.META_DATE_FORMAT.value) for date in dates if date >= min_date]
-                return_min_date = (min_date + timedelta(days=1)).strftime(MetaProcessFormat.META_DATE_FORMAT.value)
-            else:
-                return_dates = []
-                return_min_date = datetime(2200, 1, 1).date().strftime(MetaProcessFormat.META_DATE_FORMAT.value)
+    @staticmethod
+    def date_list_from_meta(
+            df_meta: Optional[pd.DataFrame],
+            first_date: str,
+            calendar: TradingCalendar = None
+    ) -> Tuple[str, List[str]]:
+        """
+        Compute the return value of `return_date_list` from an already read meta file.
+
+        The computation is done on datetime64[D] arrays, so it does not loop over the days in Python.
+
+        :param df_meta: pandas DataFrame with the meta file, or None if there is no meta file.
+        :param first_date: A string representing the date. It has to be in the format specified by
+        xetra.common.constants.MetaProcessFormat.META_DATE_FORMAT.value
+        :param calendar: A trading calendar, by default every calendar day is a trading day.
 
+        :returns
+        minimal unprocessed date `min_date` and a list of unprocessed since `min_date` to today
+        """
+        date_format = MetaProcessFormat.META_DATE_FORMAT.value
+        calendar = calendar if calendar is not None else TradingCalendar.every_day()
+
+        # We have to take the (trading) day before in order to calculate percentage change of prices
+        min_date = calendar.previous_trading_day(datetime.strptime(first_date, date_format).date())
+        today = np.datetime64(datetime.today().date(), 'D')
+        dates = calendar.trading_days(min_date, today)
+
+        if df_meta is None:
+            return first_date, MetaProcess._format_dates(dates)
+
+        src_dates = (
+            pd.to_datetime(df_meta[MetaProcessFormat.META_SOURCE_DATE_COL.value], format=date_format)
+            .values
+            .astype('datetime64[D]')
+        )
+
+        # Dates since `first_date` that were not in the meta file, sorted ascending
+        dates_missing = np.setdiff1d(dates[1:], src_dates)
+
+        if dates_missing.size == 0:
+            return datetime(2200, 1, 1).date().strftime(date_format), []
+
+        # `dates` contains every trading day, so the previous trading day of the first missing date directly precedes it
+        first_missing_idx = np.searchsorted(dates, dates_missing[0])
+        return_dates = MetaProcess._format_dates(dates[first_missing_idx - 1:])
+        return_min_date = MetaProcess._format_dates(dates_missing[:1])[0]
         return return_min_date, return_dates
+
+    @staticmethod
+    def _format_dates(dates: np.ndarray) -> List[str]:
+        """ Format an array of datetime64[D] dates as strings in MetaProcessFormat.META_DATE_FORMAT. """
+        if MetaProcessFormat.META_DATE_FORMAT.value == '%Y-%m-%d':
+            # ISO format is produced by numpy directly, which is much faster than strftime
+            return np.datetime_as_string(dates, unit='D').tolist()
+        return pd.DatetimeIndex(dates).strftime(MetaProcessFormat.META_DATE_FORMAT.value).tolist()
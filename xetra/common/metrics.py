@@ -0,0 +1,279 @@
+"""
+Lightweight registry of the job metrics, written as JSON and as a Prometheus textfile (node_exporter textfile
+collector).
+"""
+
+from contextlib import contextmanager, nullcontext
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+
+class StageMetrics(NamedTuple):
+    """
+    Class for the metrics of a stage of the job, e.g. listing, download, parsing, aggregation or upload.
+
+    stage: name of the stage
+    calls: number of the observed calls of the stage
+    seconds: time spent in the stage, summed over the calls (and thus over concurrent workers)
+    objects: number of processed objects
+    bytes: number of processed bytes
+    rows_in: number of rows entering the stage
+    rows_out: number of rows produced by the stage
+    rows_per_second: rows_out (or rows_in if the stage produces no rows) / seconds
+    bytes_per_second: bytes / seconds
+    """
+    stage: str
+    calls: int
+    seconds: float
+    objects: int
+    bytes: int
+    rows_in: int
+    rows_out: int
+    rows_per_second: float
+    bytes_per_second: float
+
+
+class StageObservation:
+    """
+    Counts of a single observed call of a stage, filled in by the code of the stage.
+    """
+
+    def __init__(self):
+        self.objects = 0
+        self.size = 0
+        self.rows_in = 0
+        self.rows_out = 0
+
+    def add(self, objects: int = 0, size: int = 0, rows_in: int = 0, rows_out: int = 0):
+        """
+        Add counts to the observation.
+
+        :param objects: number of processed objects
+        :param size: number of processed bytes
+        :param rows_in: number of rows entering the stage
+        :param rows_out: number of rows produced by the stage
+        """
+        self.objects += objects
+        self.size += size
+        self.rows_in += rows_in
+        self.rows_out += rows_out
+
+
+class MetricsRegistry:
+    """
+    Collects the metrics of the stages of a job and gauges (e.g. the S3 concurrency limit). It is thread safe, so the
+    connectors and the workers of a job share one registry.
+    """
+
+    _stage_counters = [
+        ('calls', 'Number of the calls of the stage.'),
+        ('seconds', 'Time spent in the stage, summed over the workers.'),
+        ('objects', 'Number of the objects processed by the stage.'),
+        ('bytes', 'Number of the bytes processed by the stage.'),
+        ('rows_in', 'Number of the rows entering the stage.'),
+        ('rows_out', 'Number of the rows produced by the stage.')
+    ]
+    _stage_gauges = [
+        ('rows_per_second', 'Rows processed per second spent in the stage.'),
+        ('bytes_per_second', 'Bytes processed per second spent in the stage.')
+    ]
+
+    def __init__(self, namespace: str = 'xetra'):
+        """
+        Constructor for MetricsRegistry
+
+        :param namespace: prefix of the Prometheus metric names
+        """
+        self.namespace = namespace
+        # Profiler of the stages, e.g. xetra.common.profiling.CpuProfiler, set when profiling is requested
+        self.profiler = None
+        # Tracer of the stages, xetra.common.tracing.Tracer, set when tracing is configured
+        self.tracer = None
+        self._lock = threading.Lock()
+        self._stages: Dict[str, dict] = {}
+        self._gauges: Dict[Tuple[str, tuple], tuple] = {}
+
+    def __repr__(self):
+        return f"MetricsRegistry(namespace='{self.namespace}')"
+
+    def observe(
+            self,
+            stage: str,
+            seconds: float = 0.0,
+            objects: int = 0,
+            size: int = 0,
+            rows_in: int = 0,
+            rows_out: int = 0
+    ):
+        """
+        Record a call of a stage.
+
+        :param stage: name of the stage
+        :param seconds: duration of the call
+        :param objects: number of processed objects
+        :param size: number of processed bytes
+        :param rows_in: number of rows entering the stage
+        :param rows_out: number of rows produced by the stage
+        """
+        with self._lock:
+            counters = self._stages.setdefault(stage, dict.fromkeys([name for name, _ in self._stage_counters], 0))
+            counters['calls'] += 1
+            counters['seconds'] += seconds
+            counters['objects'] += objects
+            counters['bytes'] += size
+            counters['rows_in'] += rows_in
+            counters['rows_out'] += rows_out
+
+    def merge(self, stages: List[StageMetrics]):
+        """
+        Add the metrics of stages observed by another registry, e.g. of a worker process.
+
+        :param stages: metrics of the stages, see `stages`
+        """
+        with self._lock:
+            for metrics in stages:
+                counters = self._stages.setdefault(
+                    metrics.stage, dict.fromkeys([name for name, _ in self._stage_counters], 0)
+                )
+                for name, _ in self._stage_counters:
+                    counters[name] += getattr(metrics, name)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageObservation]:
+        """
+        Time a call of a stage. The code of the stage adds its counts to the yielded observation, e.g.
+
+            with metrics.stage('parse') as observation:
+                df = pd.read_csv(...)
+                observation.add(objects=1, size=len(body), rows_out=len(df))
+
+        :param name: name of the stage
+        """
+        observation = StageObservation()
+        profiling = self.profiler.stage(name) if self.profiler is not None else nullcontext()
+        tracing = self.tracer.span(name) if self.tracer is not None else nullcontext()
+        with tracing as span, profiling:
+            started = time.perf_counter()
+            try:
+                yield observation
+            finally:
+                self.observe(
+                    name, time.perf_counter() - started, observation.objects, observation.size, observation.rows_in,
+                    observation.rows_out
+                )
+                if span is not None:
+                    span.attributes.update(
+                        objects=observation.objects, bytes=observation.size, rows_in=observation.rows_in,
+                        rows_out=observation.rows_out
+                    )
+
+    def set_gauge(self, name: str, value: float, help_text: str = '', labels: Dict[str, str] = None):
+        """
+        Set a gauge, e.g. a statistic of a component at the end of the job.
+
+        :param name: name of the gauge, without the namespace
+        :param value: value of the gauge
+        :param help_text: description written into the Prometheus textfile
+        :param labels: labels of the gauge, e.g. {'operation': 'GetObject'}, a gauge has a value per set of labels
+        """
+        with self._lock:
+            self._gauges[(name, tuple(sorted((labels or {}).items())))] = (value, help_text)
+
+    @staticmethod
+    def _format_labels(labels: tuple) -> str:
+        return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}' if labels else ''
+
+    def stages(self) -> List[StageMetrics]:
+        """
+        Return the metrics of all the observed stages, in the order they were first observed.
+        """
+        with self._lock:
+            stages = [(stage, dict(counters)) for stage, counters in self._stages.items()]
+        result = []
+        for stage, counters in stages:
+            seconds = counters['seconds']
+            rows = counters['rows_out'] or counters['rows_in']
+            result.append(StageMetrics(
+                stage=stage,
+                calls=counters['calls'],
+                seconds=round(seconds, 6),
+                objects=counters['objects'],
+                bytes=counters['bytes'],
+                rows_in=counters['rows_in'],
+                rows_out=counters['rows_out'],
+                rows_per_second=round(rows / seconds, 3) if seconds > 0 else 0.0,
+                bytes_per_second=round(counters['bytes'] / seconds, 3) if seconds > 0 else 0.0
+            ))
+        return result
+
+    def gauges(self) -> Dict[str, float]:
+        """
+        Return the values of all the gauges.
+        """
+        with self._lock:
+            return {name + self._format_labels(labels): value for (name, labels), (value, _) in self._gauges.items()}
+
+    def to_dict(self) -> dict:
+        """
+        Return all the metrics as a JSON serializable dictionary.
+        """
+        return {
+            'timestamp': time.time(),
+            'stages': [stage._asdict() for stage in self.stages()],
+            'gauges': self.gauges()
+        }
+
+    def to_prometheus(self) -> str:
+        """
+        Return all the metrics in the Prometheus text exposition format.
+        """
+        stages = self.stages()
+        lines = []
+        for field, help_text in self._stage_counters + self._stage_gauges:
+            is_counter = (field, help_text) in self._stage_counters
+            name = f'{self.namespace}_stage_{field}' + ('_total' if is_counter else '')
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f"# TYPE {name} {'counter' if is_counter else 'gauge'}")
+            lines.extend(f'{name}{{stage="{stage.stage}"}} {getattr(stage, field)}' for stage in stages)
+        with self._lock:
+            gauges = dict(self._gauges)
+        # The values of a gauge with different labels follow a single HELP and TYPE line
+        grouped: Dict[str, list] = {}
+        for (gauge, labels), (value, help_text) in gauges.items():
+            grouped.setdefault(gauge, []).append((labels, value, help_text))
+        for gauge, values in grouped.items():
+            name = f'{self.namespace}_{gauge}'
+            lines.append(f'# HELP {name} {values[0][2] or gauge}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.extend(f'{name}{self._format_labels(labels)} {value}' for labels, value, _ in values)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _write_atomically(path: str, content: str):
+        # node_exporter must never read a partially written file, so the file is written aside and renamed
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+
+    def write_json(self, path: str):
+        """
+        Write all the metrics into a JSON file.
+
+        :param path: path of the file
+        """
+        self._write_atomically(path, json.dumps(self.to_dict(), indent=2))
+
+    def write_prometheus(self, path: str):
+        """
+        Write all the metrics into a Prometheus textfile, to be collected by the textfile collector of node_exporter.
+
+        :param path: path of the file, it should end with `.prom`
+        """
+        self._write_atomically(path, self.to_prometheus())
@@ -0,0 +1,80 @@
+"""
+Local cache of small S3 objects, keyed by their ETags.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import NamedTuple, Optional
+import uuid
+
+
+class CachedObject(NamedTuple):
+    """
+    Class for an object stored in the cache.
+
+    etag: entity tag of the object at the time it was cached
+    body: content of the object
+    """
+    etag: str
+    body: bytes
+
+
+class LocalObjectCache:
+    """
+    Class for caching S3 objects in a local directory.
+
+    Every object is stored as two files named after the hash of the bucket name and the key: `<hash>.body` with the
+    content and `<hash>.etag` with the ETag. The files are replaced atomically, so the cache can be shared by several
+    processes.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Constructor for LocalObjectCache
+
+        :param directory: local directory with the cached objects, it is created if it does not exist
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def __repr__(self):
+        return f"LocalObjectCache(directory='{self.directory}')"
+
+    def _path(self, bucket_name: str, key: str) -> Path:
+        return self.directory / hashlib.sha1(f'{bucket_name}/{key}'.encode('utf-8')).hexdigest()
+
+    def get(self, bucket_name: str, key: str) -> Optional[CachedObject]:
+        """
+        Return the cached object, or None if it is not in the cache.
+        """
+        path = self._path(bucket_name, key)
+        try:
+            etag = path.with_suffix('.etag').read_text()
+            body = path.with_suffix('.body').read_bytes()
+        except FileNotFoundError:
+            return None
+        return CachedObject(etag=etag, body=body)
+
+    def put(self, bucket_name: str, key: str, etag: str, body: bytes):
+        """
+        Store an object in the cache, replacing its previous version.
+        """
+        path = self._path(bucket_name, key)
+        # The body is written before the etag, so a reader never gets a new etag with an old body
+        self._write_atomic(path.with_suffix('.body'), body)
+        self._write_atomic(path.with_suffix('.etag'), etag.encode('utf-8'))
+
+    def discard(self, bucket_name: str, key: str):
+        """
+        Remove an object from the cache, if it is there.
+        """
+        path = self._path(bucket_name, key)
+        for suffix in ['.etag', '.body']:
+            path.with_suffix(suffix).unlink(missing_ok=True)
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        tmp_path = path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
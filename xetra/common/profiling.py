@@ -0,0 +1,343 @@
+"""
+Opt-in profiling of the job. A profiler is created only when profiling is requested, so a normal run pays nothing.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+import cProfile
+from datetime import datetime
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import tracemalloc
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+import pandas as pd
+
+# Allocations of the profiler itself and of the import machinery are not reported
+_TRACEMALLOC_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>')
+]
+
+
+class MemoryCheckpoint(NamedTuple):
+    """
+    Class for the memory state recorded at a stage boundary.
+
+    stage: name of the stage which has just finished
+    rss_bytes: resident set size of the process at the boundary
+    peak_rss_bytes: peak resident set size of the process so far
+    traced_bytes: memory allocated by Python (and numpy) at the boundary, traced by tracemalloc
+    traced_peak_bytes: peak of the traced memory during the stage
+    dataframes: memory of the intermediate DataFrames of the stage (`memory_usage(deep=True)`), per name
+    top_allocators: source lines which allocated the most memory during the stage
+    """
+    stage: str
+    rss_bytes: Optional[int]
+    peak_rss_bytes: int
+    traced_bytes: int
+    traced_peak_bytes: int
+    dataframes: Dict[str, int]
+    top_allocators: List[dict]
+
+
+def current_rss() -> Optional[int]:
+    """
+    Return the resident set size of the process in bytes, or None if it cannot be determined (only Linux is supported).
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss() -> int:
+    """
+    Return the peak resident set size of the process in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    peak = peak if sys.platform == 'darwin' else peak * 1024
+    # Linux updates the high-water mark lazily, so it can lag behind the current RSS
+    return max(peak, current_rss() or 0)
+
+
+def dataframe_memory(df: pd.DataFrame) -> int:
+    """
+    Return the memory of a DataFrame in bytes, including the contents of the object columns.
+    """
+    if not len(df.columns):
+        return int(df.index.memory_usage(deep=True))
+    return int(df.memory_usage(deep=True).sum())
+
+
+class MemoryProfiler:
+    """
+    Records the memory of the process at the stage boundaries of a job: the current and the peak RSS, the memory traced
+    by tracemalloc with its peak during the stage, the source lines which allocated the most during the stage, and the
+    deep memory usage of the intermediate DataFrames.
+
+    With a `path` the report is rewritten after every checkpoint, so it survives a process killed for running out of
+    memory and shows the last finished stage.
+    """
+
+    def __init__(self, path: str = None, top: int = 10, frames: int = 1):
+        """
+        Constructor for MemoryProfiler
+
+        :param path: path of the JSON report rewritten after every checkpoint, by default the report is only returned
+            by `report`
+        :param top: number of the reported top allocators per stage
+        :param frames: number of the frames stored per traced allocation, more frames show the callers as well
+        """
+        self.path = path
+        self.top = top
+        self.frames = frames
+        self.checkpoints: List[MemoryCheckpoint] = []
+        self.started_at: Optional[datetime] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def __repr__(self):
+        return f"MemoryProfiler(path='{self.path}', top={self.top}, frames={self.frames})"
+
+    def start(self):
+        """
+        Start tracing the allocations and record the `start` checkpoint.
+        """
+        self.started_at = datetime.now()
+        tracemalloc.start(self.frames)
+        self._snapshot = tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+        self.checkpoint('start')
+
+    def stop(self):
+        """
+        Stop tracing the allocations.
+        """
+        tracemalloc.stop()
+        self._snapshot = None
+
+    def checkpoint(self, stage: str, **dataframes: pd.DataFrame) -> MemoryCheckpoint:
+        """
+        Record the memory at the end of a stage.
+
+        :param stage: name of the stage which has just finished
+        :param dataframes: intermediate DataFrames of the stage, by name
+        :return: the recorded checkpoint
+        """
+        usage = {name: dataframe_memory(df) for name, df in dataframes.items() if isinstance(df, pd.DataFrame)}
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        top_allocators = []
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+            if self._snapshot is not None:
+                top_allocators = [
+                    {
+                        'location': str(stat.traceback),
+                        'size_bytes': stat.size,
+                        'size_diff_bytes': stat.size_diff,
+                        'count': stat.count
+                    }
+                    for stat in snapshot.compare_to(self._snapshot, 'lineno')[:self.top]
+                ]
+            self._snapshot = snapshot
+            # The peak of the next stage is measured from now on
+            tracemalloc.reset_peak()
+        # The peak never decreases, even when the sampled high-water mark lags behind an earlier current RSS
+        peak = max([peak_rss()] + [previous.peak_rss_bytes for previous in self.checkpoints[-1:]])
+        checkpoint = MemoryCheckpoint(
+            stage=stage,
+            rss_bytes=current_rss(),
+            peak_rss_bytes=peak,
+            traced_bytes=traced,
+            traced_peak_bytes=traced_peak,
+            dataframes=usage,
+            top_allocators=top_allocators
+        )
+        self.checkpoints.append(checkpoint)
+        if self.path is not None:
+            self.write(self.path)
+        return checkpoint
+
+    def report(self) -> dict:
+        """
+        Return the recorded checkpoints as a JSON serializable dictionary.
+        """
+        return {
+            'started_at': self.started_at.isoformat() if self.started_at is not None else None,
+            'peak_rss_bytes': max((checkpoint.peak_rss_bytes for checkpoint in self.checkpoints), default=None),
+            'checkpoints': [checkpoint._asdict() for checkpoint in self.checkpoints]
+        }
+
+    def write(self, path: str):
+        """
+        Write the report into a JSON file.
+
+        :param path: path of the file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # A process killed while writing must not leave a truncated report behind
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+        os.replace(tmp_path, path)
+
+
+def collapse_stack(frame) -> str:
+    """
+    Return the stack of a frame in the collapsed format of flame graphs: the frames from the outermost to the innermost,
+    separated by semicolons, each as `function (file:line)`.
+    """
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+class CpuProfiler:
+    """
+    Profiles the CPU time of the stages of a job, named as in the metrics (`list`, `download`, `parse`, `aggregate`,
+    `transform`, `serialize`, `upload`). Set it as the `profiler` of the MetricsRegistry of the job, and every stage
+    observed with `MetricsRegistry.stage` is profiled, in whichever thread it runs.
+
+    Per stage, two files are written into `directory`:
+    - `<prefix>_<stage>.pstats`: deterministic profile (cProfile), to be read with `pstats` or e.g. snakeviz
+    - `<prefix>_<stage>.collapsed`: stacks sampled every `interval` seconds in the collapsed format, to be rendered by
+      flamegraph.pl or speedscope
+
+    Time of a stage nested in another one (e.g. an upload of a checkpoint during the aggregation) is profiled in the
+    inner stage only.
+    """
+
+    def __init__(self, directory: str, prefix: str = 'cpu', interval: float = 0.005, deterministic: bool = True):
+        """
+        Constructor for CpuProfiler
+
+        :param directory: directory the profiles are written to
+        :param prefix: prefix of the file names, e.g. with the id of the run
+        :param interval: seconds between two samples of the stacks
+        :param deterministic: whether the stages are profiled by cProfile as well, which slows down Python code
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.interval = interval
+        self.deterministic = deterministic
+        self._lock = threading.Lock()
+        # Stack of the running stages with their cProfile profiles, per thread
+        self._active: Dict[int, list] = {}
+        # Profiles of the finished calls, merged into one aggregate per stage
+        self._stats: Dict[str, pstats.Stats] = {}
+        self._samples: Dict[str, Counter] = {}
+        self._stopped = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def __repr__(self):
+        return f"CpuProfiler(directory='{self.directory}', prefix='{self.prefix}', interval={self.interval})"
+
+    def start(self):
+        """
+        Start sampling the stacks of the running stages.
+        """
+        self._stopped.clear()
+        self._sampler = threading.Thread(target=self._sample, name='cpu-profiler', daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> List[str]:
+        """
+        Stop sampling and write the profiles.
+
+        :return: paths of the written files
+        """
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        return self.write()
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stages in self._active.items():
+                    if stages and thread_id in frames:
+                        stage = stages[-1][0]
+                        self._samples.setdefault(stage, Counter())[collapse_stack(frames[thread_id])] += 1
+
+    @staticmethod
+    def _enable(profile: Optional[cProfile.Profile]) -> bool:
+        if profile is None:
+            return False
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active (since Python 3.12 cProfile can run in one thread only), samples still work
+            return False
+        return True
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Profile a call of a stage in the current thread.
+
+        :param name: name of the stage
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            stages = self._active.setdefault(thread_id, [])
+            outer = stages[-1][1] if stages else None
+        if outer is not None:
+            outer.disable()
+        profile = cProfile.Profile() if self.deterministic else None
+        if not self._enable(profile):
+            profile = None
+        with self._lock:
+            stages.append((name, profile))
+        try:
+            yield
+        finally:
+            stats = None
+            if profile is not None:
+                profile.disable()
+                # Only the aggregate of the stage is kept, not a profile object per call
+                stats = pstats.Stats(profile)
+            with self._lock:
+                stages.pop()
+                if stats is not None:
+                    if name in self._stats:
+                        self._stats[name].add(stats)
+                    else:
+                        self._stats[name] = stats
+            if outer is not None:
+                self._enable(outer)
+
+    def write(self) -> List[str]:
+        """
+        Write the profiles of all the stages profiled so far.
+
+        :return: paths of the written files
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            profiles = {stage: pstats.Stats().add(stage_stats) for stage, stage_stats in self._stats.items()}
+            samples = {stage: Counter(stage_samples) for stage, stage_samples in self._samples.items()}
+        paths = []
+        for stage, stats in profiles.items():
+            path = os.path.join(self.directory, f'{self.prefix}_{stage}.pstats')
+            stats.dump_stats(path)
+            paths.append(path)
+        for stage, stage_samples in samples.items():
+            path = os.path.join(self.directory, f'{self.prefix}_{stage}.collapsed')
+            with open(path, 'w') as file:
+                file.writelines(f'{stack} {count}\n' for stack, count in sorted(stage_samples.items()))
+            paths.append(path)
+        return paths
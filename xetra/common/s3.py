@@ -2,24 +2,58 @@
 Connector and methods accessing AWS S3
 """
 
+from datetime import datetime
 from io import BytesIO, StringIO
 import logging
 import os
+from typing import Iterator, List, NamedTuple, Optional
 
 import boto3
+from botocore.exceptions import ClientError
 import pandas as pd
 
+from xetra.common.concurrency import AdaptiveConcurrencyLimiter
 from xetra.common.constants import S3FileTypes
 from xetra.common.custom_exceptions import WrongFormatException
+from xetra.common.metrics import MetricsRegistry
+from xetra.common.object_cache import LocalObjectCache
+from xetra.common.s3_accounting import S3RequestAccounting
+from xetra.common.s3_config import S3ClientConfig, S3ConcurrencyConfig
+from xetra.common.tracing import Tracer
+
+
+class S3ObjectInfo(NamedTuple):
+    """
+    Class for the listing data of a single S3 object.
+
+    key: key of the object
+    etag: entity tag of the object, changes whenever the content of the object changes
+    last_modified: time of the last modification of the object
+    size: size of the object in bytes
+    """
+    key: str
+    etag: str
+    last_modified: datetime
+    size: int
 
 
 class S3BucketConnector:
     """
     Class for interacting with S3 Buckets
     """
-    # TODO currently there is no way to ready parquet data (although you can save one)
 
-    def __init__(self, access_key: str, secret_key: str, endpoint_url: str, bucket_name: str):
+    def __init__(
+            self,
+            access_key: str,
+            secret_key: str,
+            endpoint_url: str,
+            bucket_name: str,
+            cache: LocalObjectCache = None,
+            s3_resource=None,
+            limiter: AdaptiveConcurrencyLimiter = None,
+            metrics: MetricsRegistry = None,
+            accounting: S3RequestAccounting = None
+    ):
         """
         Constructor for S3BucketConnector
 
@@ -27,15 +61,35 @@ class S3BucketConnector:
         :param secret_key: secret key for accessing S3
         :param endpoint_url: endpoint url to S3
         :param bucket_name: S3 bucket name
+        :param cache: local cache for objects read with `cached=True`, e.g. the meta file
+        :param s3_resource: boto3 S3 resource shared with other connectors, see S3ConnectorFactory. By default, the
+            connector creates its own session and resource.
+        :param limiter: adaptive limit of the requests in flight shared with other connectors, see S3ConnectorFactory.
+            By default, the requests are not limited.
+        :param metrics: registry of the metrics of the list, download, parse, serialize and upload stages, shared with
+            other connectors and the job. By default, the connector has its own registry.
+        :param accounting: accounting of the S3 requests attached to the client of `s3_resource`, shared with other
+            connectors. By default, the connector attaches its own accounting to its client.
         """
         self._logger = logging.getLogger(__name__)
         self.endpoint_url = endpoint_url
-        self.session = boto3.Session(
-            aws_access_key_id=os.environ[access_key],
-            aws_secret_access_key=os.environ[secret_key]
-        )
-        self._s3 = self.session.resource(service_name='s3')
+        if s3_resource is None:
+            self.session = boto3.Session(
+                aws_access_key_id=os.environ[access_key],
+                aws_secret_access_key=os.environ[secret_key]
+            )
+            s3_resource = self.session.resource(service_name='s3')
+        else:
+            self.session = None
+        self._s3 = s3_resource
         self._bucket = self._s3.Bucket(bucket_name)
+        self.cache = cache
+        self.limiter = limiter
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        if accounting is None:
+            accounting = S3RequestAccounting()
+            accounting.attach(self._s3.meta.client)
+        self.accounting = accounting
 
         self._access_key = access_key
         self._secret_key = secret_key
@@ -47,6 +101,30 @@ class S3BucketConnector:
             f"endpoint_url='{self.endpoint_url}', bucket_name='{self._bucket_name}')"
         )
 
+    def _request(self, func, *args, **kwargs):
+        """
+        Send a request under the limit of the connector, if it has one.
+        """
+        if self.limiter is None:
+            return func(*args, **kwargs)
+        return self.limiter.call(func, *args, **kwargs)
+
+    def _list_pages(self, prefix: str) -> Iterator[dict]:
+        """
+        Yield the listed objects starting with a prefix. Every page of the listing is a separate request under the
+        limit of the connector, so a long listing neither holds a slot of the limiter for all its pages nor repeats
+        the pages already listed when a throttled page is retried.
+
+        :param prefix: prefix on S3 bucket that should be filtered with
+        """
+        kwargs = {'Bucket': self._bucket_name, 'Prefix': prefix}
+        while True:
+            page = self._request(self._s3.meta.client.list_objects_v2, **kwargs)
+            yield from page.get('Contents', [])
+            if not page.get('IsTruncated'):
+                return
+            kwargs['ContinuationToken'] = page['NextContinuationToken']
+
     def list_files_in_prefix(self, prefix: str):
         """
         List all the files in the S3 bucket starting with a prefix.
@@ -54,40 +132,193 @@ class S3BucketConnector:
         :param prefix: prefix on S3 bucket that should be filtered with
         :return: list of all the file names containing the prefix in the key
         """
-        files = [obj.key for obj in self._bucket.objects.filter(Prefix=prefix)]
+        with self.metrics.stage('list') as observation:
+            files = [obj['Key'] for obj in self._list_pages(prefix)]
+            observation.add(objects=len(files))
         return files
 
-    def read_csv_to_df(self, key: str, encoding: str = 'utf-8', sep: str = ','):
+    def list_objects_in_prefix(self, prefix: str) -> List[S3ObjectInfo]:
+        """
+        List all the objects in the S3 bucket starting with a prefix, together with their ETags and sizes.
+
+        :param prefix: prefix on S3 bucket that should be filtered with
+        :return: list of S3ObjectInfo of all the objects containing the prefix in the key
+        """
+        with self.metrics.stage('list') as observation:
+            objects = [
+                S3ObjectInfo(
+                    key=obj['Key'], etag=obj['ETag'].strip('"'), last_modified=obj['LastModified'], size=obj['Size']
+                )
+                for obj in self._list_pages(prefix)
+            ]
+            observation.add(objects=len(objects))
+        return objects
+
+    def read_object(self, key: str, cached: bool = False, immutable: bool = False) -> bytes:
+        """
+        Fetch the content of an object from the bucket.
+
+        If `cached` is set and the connector has a cache, the object is fetched with a conditional GET: when the object
+        has not changed since it was cached (its ETag is the same), S3 answers with 304 Not Modified and the cached
+        content is returned. It is meant for small control objects which are read on every run, e.g. the meta file.
+
+        :param key: A key of the object that should be read.
+        :param cached: Whether to use the cache of the connector.
+        :param immutable: Whether the object is known to never change (e.g. a meta log segment). A cached immutable
+            object is returned without any request to S3.
+
+        returns:
+            content of the object
+        """
+        cache = self.cache if cached else None
+        cached_obj = cache.get(self._bucket_name, key) if cache is not None else None
+        if cached_obj is not None and immutable:
+            return cached_obj.body
+
+        self._logger.info(f'Reading the {self.endpoint_url}/{self._bucket.name}/{key}')
+        # The low-level client is thread safe (unlike the resource objects), so objects can be fetched concurrently
+        kwargs = {'IfNoneMatch': f'"{cached_obj.etag}"'} if cached_obj is not None else {}
+
+        def get_object() -> dict:
+            response = self._s3.meta.client.get_object(Bucket=self._bucket_name, Key=key, **kwargs)
+            # The body is downloaded under the limit of the connector as well
+            response['Body'] = response['Body'].read()
+            return response
+
+        with self.metrics.stage('download') as observation:
+            observation.add(objects=1)
+            try:
+                response = self._request(get_object)
+            except ClientError as error:
+                if error.response['ResponseMetadata']['HTTPStatusCode'] != 304:
+                    raise
+                self._logger.info(f'The {key} has not been modified, using the cached version')
+                return cached_obj.body
+            body = response['Body']
+            observation.add(size=len(body))
+        if cache is not None:
+            cache.put(self._bucket_name, key, response['ETag'].strip('"'), body)
+        return body
+
+    def read_csv_to_df(
+            self,
+            key: str,
+            encoding: str = 'utf-8',
+            sep: str = ',',
+            cached: bool = False,
+            immutable: bool = False,
+            dtype=None
+    ):
         """
         Fetch a .csv object from the bucket and convert it a pandas DataFrame.
 
         :param key: A key of the .csv object that should be read.
         :param encoding: Encoding of the data inside the csv file.
         :param sep: A separator used by pandas read_csv.
+        :param cached: Whether to use the cache of the connector, see `read_object`.
+        :param immutable: Whether the object is known to never change, see `read_object`.
+        :param dtype: Data types of the columns used by pandas read_csv, by default they are inferred.
 
         returns:
             df: pandas DataFrame containing the data of the .csv file.
         """
-        self._logger.info(f'Reading the {self.endpoint_url}/{self._bucket.name}/{key}')
-        csv_obj = (
-            self._bucket
-            .Object(key=key)
-            .get()
-            .get('Body')
-            .read()
-            .decode(encoding)
-        )
-        data = StringIO(csv_obj)
-        df = pd.read_csv(data, delimiter=sep)
+        body = self.read_object(key, cached=cached, immutable=immutable)
+        with self.metrics.stage('parse') as observation:
+            data = StringIO(body.decode(encoding))
+            df = pd.read_csv(data, delimiter=sep, dtype=dtype)
+            observation.add(objects=1, size=len(body), rows_out=len(df))
         return df
 
-    def write_df_to_s3(self, df: pd.DataFrame, key: str, file_format: str):
+    def read_parquet_to_df(self, key: str, cached: bool = False, immutable: bool = False):
+        """
+        Fetch a .parquet object from the bucket and convert it a pandas DataFrame.
+
+        :param key: A key of the .parquet object that should be read.
+        :param cached: Whether to use the cache of the connector, see `read_object`.
+        :param immutable: Whether the object is known to never change, see `read_object`.
+
+        returns:
+            df: pandas DataFrame containing the data of the .parquet file.
+        """
+        parquet_obj = self.read_object(key, cached=cached, immutable=immutable)
+        with self.metrics.stage('parse') as observation:
+            df = pd.read_parquet(BytesIO(parquet_obj))
+            observation.add(objects=1, size=len(parquet_obj), rows_out=len(df))
+        return df
+
+    def delete_files(self, keys: List[str]):
+        """
+        Delete objects from the bucket. The objects are removed from the cache as well.
+
+        :param keys: list of keys of the objects to be deleted
+        """
+        # delete_objects accepts at most 1000 keys per request
+        for i in range(0, len(keys), 1000):
+            self._request(
+                self._bucket.delete_objects,
+                Delete={'Objects': [{'Key': key} for key in keys[i:i + 1000]], 'Quiet': True}
+            )
+        if self.cache is not None:
+            for key in keys:
+                self.cache.discard(self._bucket_name, key)
+        self._logger.info(f'Deleted {len(keys)} objects from {self._bucket.name}')
+
+    def get_etag(self, key: str) -> Optional[str]:
+        """
+        Return the ETag of an object (with a HEAD request), or None if the object does not exist.
+
+        :param key: A key of the object.
+        """
+        try:
+            return self._request(lambda: self._bucket.Object(key=key).e_tag.strip('"'))
+        except ClientError as error:
+            if error.response['ResponseMetadata']['HTTPStatusCode'] == 404:
+                return None
+            raise
+
+    @property
+    def supports_conditional_writes(self) -> bool:
+        """
+        Whether the installed botocore supports conditional PUT requests (`If-None-Match: *`).
+        """
+        put_object_model = self._s3.meta.client.meta.service_model.operation_model('PutObject')
+        return 'IfNoneMatch' in put_object_model.input_shape.members
+
+    def write_object(self, key: str, body: bytes, if_none_match: bool = False) -> Optional[str]:
+        """
+        Write raw content into the bucket.
+
+        :param key: Key (name) of the saved object.
+        :param body: Content of the object.
+        :param if_none_match: Write the object only if there is no object under the key yet (a conditional PUT).
+            It requires `supports_conditional_writes`.
+
+        returns:
+            ETag of the written object, or None if the conditional write failed because the object exists
+        """
+        kwargs = {'IfNoneMatch': '*'} if if_none_match else {}
+        with self.metrics.stage('upload') as observation:
+            observation.add(objects=1, size=len(body))
+            try:
+                response = self._request(
+                    self._s3.meta.client.put_object, Bucket=self._bucket_name, Body=body, Key=key, **kwargs
+                )
+            except ClientError as error:
+                if error.response['ResponseMetadata']['HTTPStatusCode'] in (409, 412):
+                    return None
+                raise
+        # The ETag of the PUT response, the `e_tag` of a boto3 Object would cost another (HEAD) request
+        return response['ETag'].strip('"')
+
+    def write_df_to_s3(self, df: pd.DataFrame, key: str, file_format: str, cached: bool = False):
         """
         Write a data frame into a S3 bucket.
 
         :param df: A pandas Data Frame to be written.
         :param key: Key (name) of the saved file.
         :param file_format: format of the saved file. It has to be of the following: {'csv', 'parquet'}.
+        :param cached: Whether to store the written object in the cache of the connector, so the next cached read of
+            it costs only a conditional GET.
 
         :raises
         WrongFormatException, if the file_format is not supported
@@ -98,17 +329,96 @@ class S3BucketConnector:
         if df.empty:
             self._logger.info('Attempted to write an empty data frame to the S3. No file will be written!')
             return
-        if file_format == S3FileTypes.PARQUET.value:
-            out_buffer = BytesIO()
-            df.to_parquet(out_buffer, index=False)
-        elif file_format == S3FileTypes.CSV.value:
-            out_buffer = StringIO()
-            df.to_csv(out_buffer, index=False)
-        else:
+        if file_format not in (S3FileTypes.PARQUET.value, S3FileTypes.CSV.value):
             self._logger.info(
                 f"The file format {file_format} is not supported. It should be either 'csv' or 'parquet'"
             )
             raise WrongFormatException
 
-        self._bucket.put_object(Body=out_buffer.getvalue(), Key=key)
+        with self.metrics.stage('serialize') as observation:
+            if file_format == S3FileTypes.PARQUET.value:
+                out_buffer = BytesIO()
+                df.to_parquet(out_buffer, index=False)
+            else:
+                out_buffer = StringIO()
+                df.to_csv(out_buffer, index=False)
+            body = out_buffer.getvalue()
+            body = body.encode('utf-8') if isinstance(body, str) else body
+            observation.add(objects=1, size=len(body), rows_in=len(df))
+        with self.metrics.stage('upload') as observation:
+            response = self._request(self._s3.meta.client.put_object, Bucket=self._bucket_name, Body=body, Key=key)
+            observation.add(objects=1, size=len(body))
+        if cached and self.cache is not None:
+            self.cache.put(self._bucket_name, key, response['ETag'].strip('"'), body)
         self._logger.info(f'The data frame is written under the key={key}')
+
+
+class S3ConnectorFactory:
+    """
+    Class creating S3BucketConnectors which share a single boto3 session and client, and thus its connection pool.
+
+    A boto3 session and client are expensive to create, and every client has its own pool of connections, so the
+    connectors of the source and the target bucket share one tuned client.
+    """
+
+    def __init__(
+            self,
+            access_key: str,
+            secret_key: str,
+            client_config: S3ClientConfig = S3ClientConfig(),
+            concurrency_config: S3ConcurrencyConfig = None,
+            metrics: MetricsRegistry = None,
+            tracer: Tracer = None
+    ):
+        """
+        Constructor for S3ConnectorFactory
+
+        :param access_key: access key for accessing S3
+        :param secret_key: secret key for accessing S3
+        :param client_config: configuration of the shared client
+        :param concurrency_config: configuration of the adaptive limit of the requests in flight shared by the
+            connectors, by default the requests are not limited. With the limit, the retries of the client are
+            reduced, see S3ClientConfig.limited.
+        :param metrics: registry of the metrics shared by the connectors, by default a new one
+        :param tracer: tracer of the requests of the shared client and of the stages of the registry, by default
+            nothing is traced
+        """
+        self._access_key = access_key
+        self._secret_key = secret_key
+        self.client_config = client_config.limited() if concurrency_config is not None else client_config
+        self.session = boto3.Session(
+            aws_access_key_id=os.environ[access_key],
+            aws_secret_access_key=os.environ[secret_key]
+        )
+        self.s3_resource = self.session.resource(service_name='s3', config=self.client_config.to_botocore())
+        self.limiter = AdaptiveConcurrencyLimiter(concurrency_config) if concurrency_config is not None else None
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        # Every request of the shared client is counted, whichever connector sends it
+        self.accounting = S3RequestAccounting()
+        self.accounting.attach(self.s3_resource.meta.client)
+        if tracer is not None:
+            tracer.attach(self.s3_resource.meta.client)
+            self.metrics.tracer = tracer
+
+    def __repr__(self):
+        return f"S3ConnectorFactory(access_key='{self._access_key}', client_config={self.client_config!r})"
+
+    def connector(self, endpoint_url: str, bucket_name: str, cache: LocalObjectCache = None) -> S3BucketConnector:
+        """
+        Create a connector to a bucket using the shared client.
+
+        :param endpoint_url: endpoint url to S3
+        :param bucket_name: S3 bucket name
+        :param cache: local cache for objects read with `cached=True`
+        """
+        return S3BucketConnector(
+            access_key=self._access_key,
+            secret_key=self._secret_key,
+            endpoint_url=endpoint_url,
+            bucket_name=bucket_name,
+            cache=cache,
+            s3_resource=self.s3_resource,
+            limiter=self.limiter,
+            metrics=self.metrics,
+            accounting=self.accounting
+        )
@@ -0,0 +1,156 @@
+"""
+Accounting of the S3 requests and their bytes by operation, with an estimate of their cost.
+"""
+
+import logging
+import threading
+from typing import Dict, List, NamedTuple
+
+from xetra.common.s3_config import S3CostConfig
+
+# Operations billed as PUT, COPY, POST or LIST requests, the DELETE requests are free, all the others are billed as GET
+CLASS_A_OPERATIONS = frozenset({
+    'PutObject', 'CopyObject', 'PostObject', 'ListObjects', 'ListObjectsV2', 'ListObjectVersions', 'ListBuckets',
+    'ListMultipartUploads', 'ListParts', 'CreateMultipartUpload', 'UploadPart', 'UploadPartCopy',
+    'CompleteMultipartUpload', 'CreateBucket'
+})
+FREE_OPERATIONS = frozenset({'DeleteObject', 'DeleteObjects', 'AbortMultipartUpload'})
+
+
+def body_size(body) -> int:
+    """
+    Return the size in bytes of the body of a request, which is bytes, a string or a seekable file-like object.
+    """
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    try:
+        position = body.tell()
+        end = body.seek(0, 2)
+        body.seek(position)
+        return end - position
+    except (AttributeError, OSError):
+        return 0
+
+
+class OperationUsage(NamedTuple):
+    """
+    Class for the usage of a S3 operation during a run.
+
+    operation: name of the S3 API operation, e.g. GetObject
+    requests: number of the calls of the operation
+    errors: number of the calls answered with an error status (including 304 Not Modified)
+    bytes_in: bytes received from S3 (response bodies)
+    bytes_out: bytes sent to S3 (request bodies)
+    """
+    operation: str
+    requests: int
+    errors: int
+    bytes_in: int
+    bytes_out: int
+
+
+class S3RequestAccounting:
+    """
+    Counts the requests of the S3 clients it is attached to, by operation, with the bytes sent and received.
+    It hooks into the botocore events of the clients, so every call is counted, whichever code makes it.
+    """
+
+    def __init__(self):
+        self._logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._usage: Dict[str, list] = {}
+
+    def attach(self, client):
+        """
+        Count the requests of a botocore S3 client. Attaching the same client twice has no effect.
+
+        :param client: botocore S3 client, e.g. `s3_resource.meta.client`
+        """
+        events = client.meta.events
+        events.register('request-created.s3', self._on_request_created, unique_id=f'xetra-accounting-body-{id(self)}')
+        events.register('after-call.s3', self._on_after_call, unique_id=f'xetra-accounting-response-{id(self)}')
+
+    def _add(self, operation: str, requests: int = 0, errors: int = 0, bytes_in: int = 0, bytes_out: int = 0):
+        with self._lock:
+            usage = self._usage.setdefault(operation, [0, 0, 0, 0])
+            usage[0] += requests
+            usage[1] += errors
+            usage[2] += bytes_in
+            usage[3] += bytes_out
+
+    def _on_request_created(self, request, operation_name: str = None, **kwargs):
+        self._add(operation_name or 'Unknown', bytes_out=body_size(request.body))
+
+    def _on_after_call(self, http_response, parsed: dict, model, **kwargs):
+        if model.has_streaming_output:
+            # The body of e.g. GetObject is still unread, its size is the one announced by S3
+            bytes_in = parsed.get('ContentLength', 0) or 0
+        else:
+            bytes_in = len(getattr(http_response, 'content', None) or b'')
+        self._add(model.name, requests=1, errors=int(http_response.status_code >= 300), bytes_in=bytes_in)
+
+    def merge(self, usage: List[OperationUsage]):
+        """
+        Add the usage counted by another accounting, e.g. of a worker process.
+
+        :param usage: usage of the operations, see `usage`
+        """
+        for item in usage:
+            self._add(item.operation, item.requests, item.errors, item.bytes_in, item.bytes_out)
+
+    def usage(self) -> List[OperationUsage]:
+        """
+        Return the usage of every operation, sorted by the operation name.
+        """
+        with self._lock:
+            return [OperationUsage(operation, *counts) for operation, counts in sorted(self._usage.items())]
+
+    @staticmethod
+    def estimate_cost(usage: List[OperationUsage], config: S3CostConfig = S3CostConfig()) -> float:
+        """
+        Estimate the cost of the requests and of the transfer out of S3.
+
+        :param usage: usage of the operations, see `usage`
+        :param config: NamedTuple class with the prices
+        :return: estimated cost in the currency of the prices
+        """
+        class_a = sum(item.requests for item in usage if item.operation in CLASS_A_OPERATIONS)
+        class_b = sum(
+            item.requests for item in usage
+            if item.operation not in CLASS_A_OPERATIONS and item.operation not in FREE_OPERATIONS
+        )
+        bytes_in = sum(item.bytes_in for item in usage)
+        return (
+            class_a / 1000 * config.price_class_a
+            + class_b / 1000 * config.price_class_b
+            + bytes_in / 1024 ** 3 * config.price_transfer_gb
+        )
+
+    def report(self, config: S3CostConfig = S3CostConfig()) -> str:
+        """
+        Log the usage of every operation with the estimated cost of the run, and warn if the run exceeds the
+        thresholds of the configuration.
+
+        :param config: NamedTuple class with the prices and the thresholds
+        :return: the logged summary
+        """
+        usage = self.usage()
+        requests = sum(item.requests for item in usage)
+        cost = self.estimate_cost(usage, config)
+        lines = [f'S3 usage: {requests} requests, estimated cost {cost:.6f}']
+        lines.extend(
+            f'  {item.operation:<20} {item.requests:>8} requests {item.errors:>6} errors '
+            f'{item.bytes_in:>14} bytes in {item.bytes_out:>14} bytes out'
+            for item in usage
+        )
+        summary = '\n'.join(lines)
+        self._logger.info(summary)
+        if config.warn_requests is not None and requests > config.warn_requests:
+            self._logger.warning(f'The run made {requests} S3 requests, more than {config.warn_requests}')
+        if config.warn_cost is not None and cost > config.warn_cost:
+            self._logger.warning(f'The estimated S3 cost of the run {cost:.6f} is higher than {config.warn_cost}')
+        return summary
@@ -0,0 +1,98 @@
+"""
+Configuration of the S3 client. It does not import boto3, so the configuration can be read and validated cheaply.
+"""
+
+from typing import NamedTuple, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from botocore.config import Config
+
+# Attempts of a request by a client whose throttled requests are retried by the concurrency limiter
+LIMITED_MAX_ATTEMPTS = 2
+
+
+class S3ClientConfig(NamedTuple):
+    """
+    Class for the configuration of the S3 client (botocore Config).
+
+    max_pool_connections: size of the connection pool, it caps the number of concurrent requests
+    retry_mode: botocore retry mode, 'adaptive' adds client side rate limiting to the standard retries
+    max_attempts: maximal number of attempts of a request, including the first one
+    connect_timeout: timeout of establishing a connection, in seconds
+    read_timeout: timeout of reading from a connection, in seconds
+    tcp_keepalive: whether to keep the idle pooled connections alive with TCP keepalive
+    """
+    max_pool_connections: int = 50
+    retry_mode: str = 'adaptive'
+    max_attempts: int = 10
+    connect_timeout: float = 10
+    read_timeout: float = 60
+    tcp_keepalive: bool = True
+
+    def to_botocore(self) -> 'Config':
+        """
+        Convert the configuration to botocore Config.
+        """
+        # botocore is imported only when a client is created
+        from botocore.config import Config
+
+        return Config(
+            max_pool_connections=self.max_pool_connections,
+            retries={'mode': self.retry_mode, 'total_max_attempts': self.max_attempts},
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            tcp_keepalive=self.tcp_keepalive
+        )
+
+    def limited(self) -> 'S3ClientConfig':
+        """
+        Return the configuration of a client whose requests are sent under the adaptive concurrency limiter. The
+        limiter retries the throttled requests itself, so the client uses the standard retries without the client side
+        rate limiting and at most LIMITED_MAX_ATTEMPTS attempts. The attempts do not multiply with those of the
+        limiter, and a request throttled repeatedly reaches the limiter, which lowers its limit.
+        """
+        return self._replace(retry_mode='standard', max_attempts=min(self.max_attempts, LIMITED_MAX_ATTEMPTS))
+
+
+class S3ConcurrencyConfig(NamedTuple):
+    """
+    Class for the configuration of the adaptive concurrency of the S3 requests (AIMD).
+
+    initial_limit: number of requests in flight allowed at the start
+    min_limit: lower bound of the limit
+    max_limit: upper bound of the limit
+    increase_step: the limit grows by the step after `limit` consecutive requests without a congestion signal
+    decrease_factor: the limit is multiplied by the factor on a congestion signal
+    latency_target_seconds: a moving average of the request latency above the target is a congestion signal,
+        by default only throttling is
+    max_attempts: maximal number of attempts of a throttled request, including the first one
+    backoff_base_seconds: base of the exponential backoff between the attempts of a throttled request
+    backoff_max_seconds: upper bound of the backoff
+    """
+    initial_limit: int = 8
+    min_limit: int = 1
+    max_limit: int = 64
+    increase_step: int = 1
+    decrease_factor: float = 0.5
+    latency_target_seconds: Optional[float] = None
+    max_attempts: int = 8
+    backoff_base_seconds: float = 0.05
+    backoff_max_seconds: float = 5.0
+
+
+class S3CostConfig(NamedTuple):
+    """
+    Class for the prices used to estimate the cost of the S3 requests of a run, and the thresholds of the warnings.
+    The default prices are those of S3 Standard in eu-central-1 in USD.
+
+    price_class_a: price of 1000 PUT, COPY, POST and LIST requests
+    price_class_b: price of 1000 GET, HEAD and all the other requests (DELETE requests are free)
+    price_transfer_gb: price of 1 GB transferred out of S3, 0 within the region of the bucket
+    warn_requests: a run with more requests logs a warning, None turns it off
+    warn_cost: a run with a higher estimated cost logs a warning, None turns it off
+    """
+    price_class_a: float = 0.0054
+    price_class_b: float = 0.00043
+    price_transfer_gb: float = 0.0
+    warn_requests: Optional[int] = None
+    warn_cost: Optional[float] = None
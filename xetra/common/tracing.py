@@ -0,0 +1,392 @@
+"""
+Lightweight tracing of a run with nested spans: run -> stage -> S3 operation. The spans are exported as JSON lines and
+optionally to OpenTelemetry, so the latency of every single S3 request can be analysed, not only the aggregated metrics.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import math
+import os
+import secrets
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from xetra.common.s3_accounting import body_size
+
+
+class Span:
+    """
+    A timed operation of a trace, e.g. a run, a stage of the job or a S3 request.
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, attributes: dict = None):
+        """
+        Constructor for Span
+
+        :param name: name of the span, e.g. `run`, `download` or `s3.GetObject`
+        :param trace_id: id of the trace the span belongs to (32 hex digits)
+        :param parent_id: id of the parent span, None for the root span of a trace
+        :param attributes: attributes of the span, e.g. the key of an object
+        """
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.thread = threading.current_thread().name
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def __repr__(self):
+        return f"Span(name='{self.name}', span_id='{self.span_id}', parent_id='{self.parent_id}')"
+
+    def set_attribute(self, key: str, value):
+        """
+        Set an attribute of the span.
+        """
+        self.attributes[key] = value
+
+    def end(self, status: str = None):
+        """
+        End the span.
+
+        :param status: `ok` or `error`, by default the status is kept
+        """
+        self.duration = time.perf_counter() - self._started
+        self.end_time = self.start_time + self.duration
+        if status is not None:
+            self.status = status
+
+    def to_dict(self) -> dict:
+        """
+        Return the span as a JSON serializable dictionary.
+        """
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_time': self.start_time,
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'status': self.status,
+            'thread': self.thread,
+            'attributes': self.attributes
+        }
+
+
+class SpanExporter:
+    """
+    Base class of the exporters of the spans. `on_start` is called when a span starts, `on_end` when it ends.
+    """
+
+    def on_start(self, span: Span):
+        pass
+
+    def on_end(self, span: Span):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonLinesExporter(SpanExporter):
+    """
+    Appends every ended span as a JSON line to a file. Several processes (e.g. the workers of a backfill) can append to
+    the same file, every span is written with a single write.
+    """
+
+    def __init__(self, path: str):
+        """
+        Constructor for JsonLinesExporter
+
+        :param path: path of the file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', buffering=1)
+
+    def __repr__(self):
+        return f"JsonLinesExporter(path='{self.path}')"
+
+    def on_end(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + '\n'
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class OpenTelemetryExporter(SpanExporter):
+    """
+    Mirrors the spans to OpenTelemetry, with the same nesting and timing. It needs the `opentelemetry-api` package, and
+    the `opentelemetry-sdk` and `opentelemetry-exporter-otlp` packages if an OTLP endpoint is given. Without an endpoint
+    the globally configured tracer provider is used, e.g. by `opentelemetry-instrument`.
+    """
+
+    def __init__(self, service_name: str = 'xetra-etl', endpoint: str = None):
+        """
+        Constructor for OpenTelemetryExporter
+
+        :param service_name: name of the service the spans are reported by
+        :param endpoint: endpoint of an OTLP (gRPC) collector, e.g. http://localhost:4317
+        """
+        from opentelemetry import trace
+
+        self._trace = trace
+        self._provider = None
+        if endpoint is not None:
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+            self._provider = TracerProvider(resource=Resource.create({'service.name': service_name}))
+            self._provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+            self._tracer = self._provider.get_tracer(__name__)
+        else:
+            self._tracer = trace.get_tracer(__name__)
+        self._lock = threading.Lock()
+        self._spans = {}
+
+    def on_start(self, span: Span):
+        with self._lock:
+            parent = self._spans.get(span.parent_id)
+        context = self._trace.set_span_in_context(parent) if parent is not None else None
+        otel_span = self._tracer.start_span(span.name, context=context, start_time=int(span.start_time * 1e9))
+        with self._lock:
+            self._spans[span.span_id] = otel_span
+
+    def on_end(self, span: Span):
+        with self._lock:
+            otel_span = self._spans.pop(span.span_id, None)
+        if otel_span is None:
+            return
+        for key, value in span.attributes.items():
+            otel_span.set_attribute(key, value if isinstance(value, (bool, int, float, str)) else str(value))
+        if span.status == 'error':
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+        otel_span.end(end_time=int(span.end_time * 1e9))
+
+    def close(self):
+        if self._provider is not None:
+            self._provider.shutdown()
+
+
+class Tracer:
+    """
+    Creates the spans of a run and passes them to the exporters. The current span is tracked per thread (and per
+    asyncio task), a span started in a thread without a current span, e.g. in a worker of a thread pool, is a child of
+    the root span of the run.
+
+    The S3 requests of the clients the tracer is attached to are traced as `s3.<operation>` spans with the bucket, the
+    key (or prefix), the bytes, the HTTP status and the retries. A span of a GetObject ends with the response headers,
+    reading the body is part of the enclosing `download` stage. A request failing without a response, e.g. on a
+    connection error or a timeout, ends its span with the `error` status and the type of the exception.
+    """
+
+    def __init__(self, exporters: List[SpanExporter] = None):
+        """
+        Constructor for Tracer
+
+        :param exporters: exporters of the spans
+        """
+        self.exporters = list(exporters or [])
+        self._current: ContextVar[Optional[Span]] = ContextVar(f'xetra_span_{id(self)}', default=None)
+        self._root: Optional[Span] = None
+
+    def __repr__(self):
+        return f'Tracer(exporters={self.exporters!r})'
+
+    def current_span(self) -> Optional[Span]:
+        """
+        Return the current span of the thread, or the root span of the run.
+        """
+        return self._current.get() or self._root
+
+    def start_span(self, name: str, parent: Span = None, **attributes) -> Span:
+        """
+        Start a span without making it the current one, e.g. a S3 request.
+
+        :param name: name of the span
+        :param parent: parent span, by default the current span
+        :param attributes: attributes of the span
+        """
+        parent = parent or self.current_span()
+        if parent is None:
+            span = Span(name, secrets.token_hex(16), None, attributes)
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, attributes)
+        for exporter in self.exporters:
+            exporter.on_start(span)
+        return span
+
+    def end_span(self, span: Span, status: str = None):
+        """
+        End a span and export it.
+
+        :param span: the span
+        :param status: `ok` or `error`, by default the status of the span is kept
+        """
+        span.end(status)
+        for exporter in self.exporters:
+            exporter.on_end(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """
+        Trace a block as the current span. An exception ends the span with the `error` status.
+
+        :param name: name of the span
+        :param attributes: attributes of the span
+        """
+        span = self.start_span(name, **attributes)
+        is_root = self._root is None and span.parent_id is None
+        if is_root:
+            self._root = span
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as error:
+            span.status = 'error'
+            span.set_attribute('error', repr(error))
+            raise
+        finally:
+            self._current.reset(token)
+            if is_root:
+                self._root = None
+            self.end_span(span)
+
+    def attach(self, client):
+        """
+        Trace the requests of a botocore S3 client. Attaching the same client twice has no effect.
+
+        :param client: botocore S3 client, e.g. `s3_resource.meta.client`
+        """
+        events = client.meta.events
+        events.register('provide-client-params.s3', self._on_request, unique_id=f'xetra-tracing-params-{id(self)}')
+        events.register('request-created.s3', self._on_request_created, unique_id=f'xetra-tracing-body-{id(self)}')
+        events.register('after-call.s3', self._on_response, unique_id=f'xetra-tracing-response-{id(self)}')
+        events.register('after-call-error.s3', self._on_error, unique_id=f'xetra-tracing-error-{id(self)}')
+
+    def _on_request(self, params: dict, context: dict, model, **kwargs):
+        attributes = {'bucket': params.get('Bucket')}
+        if 'Key' in params:
+            attributes['key'] = params['Key']
+        elif 'Prefix' in params:
+            attributes['prefix'] = params['Prefix']
+        # The request context of botocore is passed to all the events of the call
+        context['xetra_span'] = self.start_span(f's3.{model.name}', **attributes)
+
+    def _on_request_created(self, request, **kwargs):
+        span = request.context.get('xetra_span')
+        if span is not None:
+            span.set_attribute('bytes_out', body_size(request.body))
+
+    def _on_response(self, http_response, parsed: dict, model, context: dict, **kwargs):
+        span = context.pop('xetra_span', None)
+        if span is None:
+            return
+        if model.has_streaming_output:
+            bytes_in = parsed.get('ContentLength', 0) or 0
+        else:
+            bytes_in = len(getattr(http_response, 'content', None) or b'')
+        span.set_attribute('bytes_in', bytes_in)
+        span.set_attribute('status_code', http_response.status_code)
+        span.set_attribute('retries', parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0))
+        if 'Error' in parsed:
+            span.set_attribute('error_code', parsed['Error'].get('Code'))
+        self.end_span(span, 'error' if http_response.status_code >= 400 else 'ok')
+
+    def _on_error(self, exception: Exception, context: dict, **kwargs):
+        span = context.pop('xetra_span', None)
+        if span is None:
+            return
+        span.set_attribute('error', type(exception).__name__)
+        self.end_span(span, 'error')
+
+    def close(self):
+        """
+        Flush and close the exporters.
+        """
+        for exporter in self.exporters:
+            exporter.close()
+
+
+class LatencySummary(NamedTuple):
+    """
+    Class for the latency distribution of a group of spans.
+
+    group: the operation, or the operation and the key prefix
+    count: number of spans
+    p50_ms: median latency
+    p90_ms: 90th percentile of the latency
+    p99_ms: 99th percentile of the latency
+    max_ms: maximal latency
+    slowest: key (or prefix) of the slowest span
+    """
+    group: str
+    count: int
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+    slowest: Optional[str]
+
+
+def read_spans(path: str) -> List[dict]:
+    """
+    Read the spans written by a JsonLinesExporter.
+
+    :param path: path of the file
+    """
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    # Nearest rank on sorted values
+    return values[max(0, math.ceil(percentile / 100 * len(values)) - 1)]
+
+
+def summarize_s3_latency(spans: Iterable[dict], prefix_depth: int = 0) -> List[LatencySummary]:
+    """
+    Summarize the latency of the S3 request spans per operation, or per operation and key prefix, slowest first.
+
+    :param spans: spans as written by a JsonLinesExporter, see `read_spans`
+    :param prefix_depth: number of the leading parts of the keys (split by `/`) grouped together, 0 groups the spans
+        by the operation only
+    :return: the summaries ordered by the 99th percentile, descending
+    """
+    groups: Dict[str, list] = {}
+    for span in spans:
+        if not span['name'].startswith('s3.') or span.get('duration_ms') is None:
+            continue
+        attributes = span.get('attributes') or {}
+        key = attributes.get('key') or attributes.get('prefix')
+        group = span['name'][3:]
+        if prefix_depth and key is not None:
+            group = f"{group} {'/'.join(key.split('/')[:prefix_depth])}"
+        groups.setdefault(group, []).append((span['duration_ms'], key))
+    summaries = []
+    for group, values in groups.items():
+        latencies = sorted(duration for duration, _ in values)
+        summaries.append(LatencySummary(
+            group=group,
+            count=len(latencies),
+            p50_ms=_percentile(latencies, 50),
+            p90_ms=_percentile(latencies, 90),
+            p99_ms=_percentile(latencies, 99),
+            max_ms=latencies[-1],
+            slowest=max(values, key=lambda value: value[0])[1]
+        ))
+    return sorted(summaries, key=lambda summary: summary.p99_ms, reverse=True)
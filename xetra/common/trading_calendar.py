@@ -0,0 +1,120 @@
+"""
+Trading calendar used for planning the dates to be processed.
+"""
+
+import csv
+from datetime import date
+from pathlib import Path
+from typing import Iterable, Union
+
+import numpy as np
+
+from xetra.common.custom_exceptions import WrongCalendarException
+
+XETRA_HOLIDAYS_FILE = Path(__file__).resolve().parent.parent / 'data' / 'xetra_holidays.csv'
+
+DateLike = Union[str, date, np.datetime64]
+
+
+class TradingCalendar:
+    """
+    Class for a trading calendar of an exchange.
+
+    A day is a trading day if it is a business day according to the weekmask and it is not a holiday. The calendar is
+    backed by numpy.busdaycalendar, so all the methods work on whole datetime64[D] arrays.
+    """
+
+    def __init__(self, holidays: Iterable[DateLike] = (), weekmask: str = '1111100'):
+        """
+        Constructor for TradingCalendar
+
+        :param holidays: dates on which the exchange is closed
+        :param weekmask: seven characters of '1' (trading) and '0' (non-trading), starting with Monday
+        """
+        self.holidays = np.array([np.datetime64(day, 'D') for day in holidays], dtype='datetime64[D]')
+        self.weekmask = weekmask
+        self._busdaycal = np.busdaycalendar(weekmask=weekmask, holidays=self.holidays)
+
+    def __repr__(self):
+        return f"TradingCalendar(holidays=<{len(self.holidays)} days>, weekmask='{self.weekmask}')"
+
+    @classmethod
+    def every_day(cls) -> 'TradingCalendar':
+        """
+        Return a calendar in which every calendar day is a trading day.
+        """
+        return cls(weekmask='1111111')
+
+    @classmethod
+    def xetra(
+            cls,
+            holidays_file: Union[str, Path] = None,
+            extra_holidays: Iterable[DateLike] = (),
+            removed_holidays: Iterable[DateLike] = (),
+            weekmask: str = '1111100'
+    ) -> 'TradingCalendar':
+        """
+        Return the Xetra trading calendar.
+
+        :param holidays_file: csv file with a `date` column, overriding the holidays bundled with the package
+        :param extra_holidays: additional non-trading days, e.g. unscheduled closures
+        :param removed_holidays: days of the holidays file on which the exchange is open
+        :param weekmask: seven characters of '1' (trading) and '0' (non-trading), starting with Monday
+        """
+        with open(holidays_file or XETRA_HOLIDAYS_FILE, newline='') as file_:
+            holidays = {np.datetime64(row['date'], 'D') for row in csv.DictReader(file_)}
+        holidays |= {np.datetime64(day, 'D') for day in extra_holidays}
+        holidays -= {np.datetime64(day, 'D') for day in removed_holidays}
+        return cls(holidays=sorted(holidays), weekmask=weekmask)
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'TradingCalendar':
+        """
+        Create a calendar from the `calendar` section of the configuration file.
+
+        :param config: dictionary with the key `name` ('xetra' or 'every_day') and, for 'xetra', optional keys
+            `holidays_file`, `extra_holidays`, `removed_holidays` and `weekmask`
+
+        :raises
+        WrongCalendarException, if the calendar name is not supported
+        """
+        name = config.get('name', 'xetra')
+        if name == 'every_day':
+            return cls.every_day()
+        if name == 'xetra':
+            return cls.xetra(
+                holidays_file=config.get('holidays_file'),
+                extra_holidays=config.get('extra_holidays') or (),
+                removed_holidays=config.get('removed_holidays') or (),
+                weekmask=config.get('weekmask', '1111100')
+            )
+        raise WrongCalendarException(f"Unknown trading calendar '{name}'. It should be either 'xetra' or 'every_day'")
+
+    def is_trading_day(self, dates: Union[DateLike, np.ndarray]) -> Union[bool, np.ndarray]:
+        """
+        Check which of the dates are trading days.
+        """
+        return np.is_busday(np.asarray(dates, dtype='datetime64[D]'), busdaycal=self._busdaycal)
+
+    def trading_days(self, start: DateLike, end: DateLike) -> np.ndarray:
+        """
+        Return all the trading days from `start` to `end` (both inclusive) as a datetime64[D] array.
+        """
+        days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1, dtype='datetime64[D]')
+        return days[self.is_trading_day(days)]
+
+    def previous_trading_day(self, dates: Union[DateLike, np.ndarray]) -> Union[np.datetime64, np.ndarray]:
+        """
+        Return the last trading day strictly before each of the dates.
+        """
+        return np.busday_offset(
+            np.asarray(dates, dtype='datetime64[D]'), -1, roll='forward', busdaycal=self._busdaycal
+        )
+
+    def next_trading_day(self, dates: Union[DateLike, np.ndarray]) -> Union[np.datetime64, np.ndarray]:
+        """
+        Return the first trading day strictly after each of the dates.
+        """
+        return np.busday_offset(
+            np.asarray(dates, dtype='datetime64[D]'), 1, roll='backward', busdaycal=self._busdaycal
+        )
@@ -0,0 +1,413 @@
+"""
+Work queues distributing shards of a job across several processes or hosts.
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import closing
+import json
+import logging
+import sqlite3
+import time
+from typing import List, NamedTuple, Optional
+
+from botocore.exceptions import ClientError
+
+from xetra.common.constants import WorkItemStatus
+from xetra.common.lease import S3Lease
+from xetra.common.s3 import S3BucketConnector
+
+
+class WorkItem(NamedTuple):
+    """
+    Class for an item of a work queue.
+
+    item_id: unique identifier of the item, items are claimed in the order of their identifiers
+    payload: JSON serializable description of the work
+    status: one of xetra.common.constants.WorkItemStatus values
+    attempts: number of times the item has been claimed
+    owner: identifier of the worker that claimed the item last, or None
+    claimed_at: time (seconds since the epoch) the item was claimed last, or None
+    completed_at: time (seconds since the epoch) the item was completed, or None
+    error: error of the last failed attempt, or None
+    result: JSON serializable result reported by the worker that completed the item, or None
+    """
+    item_id: str
+    payload: dict
+    status: str = WorkItemStatus.PENDING.value
+    attempts: int = 0
+    owner: Optional[str] = None
+    claimed_at: Optional[float] = None
+    completed_at: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[dict] = None
+
+
+class QueueProgress(NamedTuple):
+    """
+    Class for the progress of a work queue.
+
+    total: number of items
+    pending, claimed, done, failed: number of items in the given status
+    items_per_hour: throughput of the completed items since the first claim, or None if nothing is completed yet
+    eta_seconds: estimated time to finish the remaining items at the current throughput, or None
+    """
+    total: int
+    pending: int
+    claimed: int
+    done: int
+    failed: int
+    items_per_hour: Optional[float] = None
+    eta_seconds: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        """
+        True if no item is waiting or being processed.
+        """
+        return self.pending + self.claimed == 0
+
+
+class WorkQueue(ABC):
+    """
+    Base class of the work queues.
+
+    A worker claims an item, renews its claim with heartbeats while it works on it, and completes or fails it. A claim
+    which is not renewed within `lease_seconds` expires, so the item of a crashed worker is claimed again by another
+    worker. An item is retried until it has been claimed `max_attempts` times, then it is marked as failed.
+    """
+
+    def __init__(self, lease_seconds: float = 300, max_attempts: int = 3):
+        """
+        Constructor for WorkQueue
+
+        :param lease_seconds: time after which a claim expires if it is not renewed by a heartbeat
+        :param max_attempts: maximal number of claims of a single item
+        """
+        self._logger = logging.getLogger(__name__)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def put(self, item_id: str, payload: dict) -> bool:
+        """
+        Add an item to the queue.
+
+        :param item_id: unique identifier of the item
+        :param payload: JSON serializable description of the work
+        :return: True if the item is added, False if an item with the identifier already exists
+        """
+
+    @abstractmethod
+    def claim(self, owner: str) -> Optional[WorkItem]:
+        """
+        Claim the first pending item, or an item with an expired claim.
+
+        :param owner: identifier of the worker
+        :return: the claimed item, or None if there is no item to be claimed
+        """
+
+    @abstractmethod
+    def heartbeat(self, item: WorkItem, owner: str) -> bool:
+        """
+        Renew the claim of an item for another `lease_seconds`.
+
+        :return: True if the item is still claimed by the owner, False if the claim has been taken over
+        """
+
+    @abstractmethod
+    def complete(self, item: WorkItem, owner: str, result: dict = None) -> bool:
+        """
+        Mark a claimed item as done.
+
+        :param result: JSON serializable result of the work, e.g. statistics
+        :return: True if the item is marked as done, False if the claim has been taken over and the item is left as is
+        """
+
+    @abstractmethod
+    def fail(self, item: WorkItem, owner: str, error: str) -> bool:
+        """
+        Release a claimed item after a failed attempt. It is retried, unless it has been claimed `max_attempts` times.
+
+        :param error: description of the error
+        :return: True if the item is released, False if the claim has been taken over and the item is left as is
+        """
+
+    @abstractmethod
+    def items(self) -> List[WorkItem]:
+        """
+        Return all the items of the queue in the order of their identifiers.
+        """
+
+    def progress(self) -> QueueProgress:
+        """
+        Compute the progress of the queue from the statuses and timestamps of its items.
+        """
+        items = self.items()
+        counts = {status.value: 0 for status in WorkItemStatus}
+        for item in items:
+            counts[item.status] += 1
+
+        items_per_hour, eta_seconds = None, None
+        claimed_at = [item.claimed_at for item in items if item.claimed_at is not None]
+        completed_at = [item.completed_at for item in items if item.completed_at is not None]
+        if completed_at and max(completed_at) > min(claimed_at):
+            items_per_hour = len(completed_at) / (max(completed_at) - min(claimed_at)) * 3600
+            eta_seconds = (counts[WorkItemStatus.PENDING.value] + counts[WorkItemStatus.CLAIMED.value]) \
+                / items_per_hour * 3600
+        return QueueProgress(
+            total=len(items),
+            pending=counts[WorkItemStatus.PENDING.value],
+            claimed=counts[WorkItemStatus.CLAIMED.value],
+            done=counts[WorkItemStatus.DONE.value],
+            failed=counts[WorkItemStatus.FAILED.value],
+            items_per_hour=items_per_hour,
+            eta_seconds=eta_seconds
+        )
+
+    def _release_status(self, item: WorkItem) -> str:
+        return WorkItemStatus.FAILED.value if item.attempts >= self.max_attempts else WorkItemStatus.PENDING.value
+
+
+class S3WorkQueue(WorkQueue):
+    """
+    Work queue stored under a prefix of an S3 bucket, shared by workers on any number of hosts.
+
+    Every item is a JSON object `<prefix>items/<item_id>.json`. An item is claimed by acquiring the S3Lease
+    `<prefix>claims/<item_id>.lock`, heartbeats renew the lease, so an expired lease of a crashed worker is taken over
+    by the next claim. A claim reads all the items, which is fine for the tens or hundreds of shards of a backfill.
+    """
+
+    def __init__(
+            self,
+            s3_bucket: S3BucketConnector,
+            prefix: str,
+            lease_seconds: float = 300,
+            max_attempts: int = 3,
+            settle_seconds: float = 0.2
+    ):
+        """
+        Constructor for S3WorkQueue
+
+        :param s3_bucket: connection to the S3 bucket storing the queue
+        :param prefix: key prefix of the queue
+        :param lease_seconds: time after which a claim expires if it is not renewed by a heartbeat
+        :param max_attempts: maximal number of claims of a single item
+        :param settle_seconds: settle time of the claim leases, see S3Lease
+        """
+        super().__init__(lease_seconds=lease_seconds, max_attempts=max_attempts)
+        self.s3_bucket = s3_bucket
+        self.prefix = prefix
+        self.settle_seconds = settle_seconds
+
+    def __repr__(self):
+        return f"S3WorkQueue(prefix='{self.prefix}', s3_bucket={self.s3_bucket!r})"
+
+    def _item_key(self, item_id: str) -> str:
+        return f'{self.prefix}items/{item_id}.json'
+
+    def _lease(self, item_id: str, owner: str) -> S3Lease:
+        return S3Lease(
+            self.s3_bucket, f'{self.prefix}claims/{item_id}.lock', ttl_seconds=self.lease_seconds, owner=owner,
+            settle_seconds=self.settle_seconds
+        )
+
+    def _read(self, item_id: str) -> Optional[WorkItem]:
+        try:
+            return WorkItem(**json.loads(self.s3_bucket.read_object(self._item_key(item_id))))
+        except ClientError as error:
+            if error.response['ResponseMetadata']['HTTPStatusCode'] == 404:
+                return None
+            raise
+
+    def _write(self, item: WorkItem):
+        self.s3_bucket.write_object(self._item_key(item.item_id), json.dumps(item._asdict()).encode('utf-8'))
+
+    def put(self, item_id: str, payload: dict) -> bool:
+        if self._read(item_id) is not None:
+            return False
+        self._write(WorkItem(item_id=item_id, payload=payload))
+        return True
+
+    def items(self) -> List[WorkItem]:
+        item_ids = sorted(
+            obj.key[len(self.prefix) + len('items/'):-len('.json')]
+            for obj in self.s3_bucket.list_objects_in_prefix(f'{self.prefix}items/')
+        )
+        return [item for item in map(self._read, item_ids) if item is not None]
+
+    def claim(self, owner: str) -> Optional[WorkItem]:
+        open_statuses = (WorkItemStatus.PENDING.value, WorkItemStatus.CLAIMED.value)
+        for item in self.items():
+            lease = self._lease(item.item_id, owner)
+            if item.status not in open_statuses or not lease.acquire():
+                continue
+            try:
+                # The item could have been completed by its previous owner between the listing and the claim
+                item = self._read(item.item_id)
+                if item.status not in open_statuses:
+                    lease.release()
+                    continue
+                if item.status == WorkItemStatus.CLAIMED.value and item.attempts >= self.max_attempts:
+                    self._logger.info(f'The claim of the item {item.item_id} has expired {item.attempts} times.')
+                    self._write(item._replace(status=WorkItemStatus.FAILED.value, error='The claim has expired'))
+                    lease.release()
+                    continue
+
+                item = item._replace(
+                    status=WorkItemStatus.CLAIMED.value, attempts=item.attempts + 1, owner=owner, claimed_at=time.time()
+                )
+                self._write(item)
+            except Exception:
+                # The item must not stay locked until the lease expires
+                lease.release()
+                raise
+            return item
+        return None
+
+    def heartbeat(self, item: WorkItem, owner: str) -> bool:
+        return self._lease(item.item_id, owner).renew()
+
+    def _claimed_item(self, item: WorkItem, lease: S3Lease) -> Optional[WorkItem]:
+        """
+        Return the current version of an item, if it is still claimed by the owner of the lease, otherwise None.
+        The lease is renewed first, so the claim cannot expire while the item is being written.
+        """
+        if not lease.renew():
+            return None
+        current = self._read(item.item_id)
+        if current is None or current.status != WorkItemStatus.CLAIMED.value or current.owner != lease.owner \
+                or current.attempts != item.attempts:
+            return None
+        return current
+
+    def complete(self, item: WorkItem, owner: str, result: dict = None) -> bool:
+        lease = self._lease(item.item_id, owner)
+        current = self._claimed_item(item, lease)
+        if current is None:
+            self._logger.warning(f'The claim of the item {item.item_id} has been lost, it is not marked as done.')
+            return False
+        self._write(current._replace(
+            status=WorkItemStatus.DONE.value, completed_at=time.time(), error=None, result=result
+        ))
+        lease.release()
+        return True
+
+    def fail(self, item: WorkItem, owner: str, error: str) -> bool:
+        lease = self._lease(item.item_id, owner)
+        current = self._claimed_item(item, lease)
+        if current is None:
+            self._logger.warning(f'The claim of the item {item.item_id} has been lost, it is not released.')
+            return False
+        self._write(current._replace(status=self._release_status(current), error=error))
+        lease.release()
+        return True
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    Work queue stored in a local SQLite database. It is shared by the processes of a single host, and it is a stand-in
+    for the S3WorkQueue in tests and local runs.
+    """
+
+    _columns = list(WorkItem._fields)
+
+    def __init__(self, path: str, lease_seconds: float = 300, max_attempts: int = 3):
+        """
+        Constructor for SQLiteWorkQueue
+
+        :param path: path of the database file
+        :param lease_seconds: time after which a claim expires if it is not renewed by a heartbeat
+        :param max_attempts: maximal number of claims of a single item
+        """
+        super().__init__(lease_seconds=lease_seconds, max_attempts=max_attempts)
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS items (item_id TEXT PRIMARY KEY, payload TEXT, status TEXT, '
+                'attempts INTEGER, owner TEXT, claimed_at REAL, completed_at REAL, error TEXT, result TEXT, '
+                'expires_at REAL)'
+            )
+
+    def __repr__(self):
+        return f"SQLiteWorkQueue(path='{self.path}')"
+
+    def _connect(self) -> closing:
+        # Statements are autocommitted, a claim is a BEGIN IMMEDIATE transaction, so concurrent claims serialize
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    @classmethod
+    def _to_item(cls, row: tuple) -> WorkItem:
+        values = dict(zip(cls._columns, row))
+        values['payload'] = json.loads(values['payload'])
+        values['result'] = json.loads(values['result']) if values['result'] is not None else None
+        return WorkItem(**values)
+
+    def put(self, item_id: str, payload: dict) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO items (item_id, payload, status, attempts) VALUES (?, ?, ?, 0)',
+                (item_id, json.dumps(payload), WorkItemStatus.PENDING.value)
+            )
+            return cursor.rowcount == 1
+
+    def items(self) -> List[WorkItem]:
+        with self._connect() as conn:
+            rows = conn.execute(f'SELECT {", ".join(self._columns)} FROM items ORDER BY item_id').fetchall()
+        return [self._to_item(row) for row in rows]
+
+    def claim(self, owner: str) -> Optional[WorkItem]:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'UPDATE items SET status = ?, error = ? WHERE status = ? AND expires_at < ? AND attempts >= ?',
+                (WorkItemStatus.FAILED.value, 'The claim has expired', WorkItemStatus.CLAIMED.value, now,
+                 self.max_attempts)
+            )
+            row = conn.execute(
+                'SELECT item_id FROM items WHERE status = ? OR (status = ? AND expires_at < ?) ORDER BY item_id '
+                'LIMIT 1',
+                (WorkItemStatus.PENDING.value, WorkItemStatus.CLAIMED.value, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    'UPDATE items SET status = ?, attempts = attempts + 1, owner = ?, claimed_at = ?, expires_at = ? '
+                    'WHERE item_id = ?',
+                    (WorkItemStatus.CLAIMED.value, owner, now, now + self.lease_seconds, row[0])
+                )
+                row = conn.execute(
+                    f'SELECT {", ".join(self._columns)} FROM items WHERE item_id = ?', (row[0],)
+                ).fetchone()
+            conn.execute('COMMIT')
+        return self._to_item(row) if row is not None else None
+
+    def heartbeat(self, item: WorkItem, owner: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE items SET expires_at = ? WHERE item_id = ? AND owner = ? AND status = ?',
+                (time.time() + self.lease_seconds, item.item_id, owner, WorkItemStatus.CLAIMED.value)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, item: WorkItem, owner: str, result: dict = None) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE items SET status = ?, completed_at = ?, error = NULL, result = ? '
+                'WHERE item_id = ? AND owner = ? AND status = ? AND attempts = ?',
+                (WorkItemStatus.DONE.value, time.time(), json.dumps(result), item.item_id, owner,
+                 WorkItemStatus.CLAIMED.value, item.attempts)
+            )
+        if cursor.rowcount != 1:
+            self._logger.warning(f'The claim of the item {item.item_id} has been lost, it is not marked as done.')
+        return cursor.rowcount == 1
+
+    def fail(self, item: WorkItem, owner: str, error: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE items SET status = ?, error = ? '
+                'WHERE item_id = ? AND owner = ? AND status = ? AND attempts = ?',
+                (self._release_status(item), error, item.item_id, owner, WorkItemStatus.CLAIMED.value, item.attempts)
+            )
+        if cursor.rowcount != 1:
+            self._logger.warning(f'The claim of the item {item.item_id} has been lost, it is not released.')
+        return cursor.rowcount == 1
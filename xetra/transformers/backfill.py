@@ -0,0 +1,315 @@
+"""
+Backfill of a date range split into shards processed in parallel.
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+import logging
+import socket
+import threading
+import time
+from typing import Dict, List, NamedTuple
+import uuid
+
+import numpy as np
+
+from xetra.common.meta_process import MetaProcess
+from xetra.common.metrics import StageMetrics
+from xetra.common.s3 import S3BucketConnector, S3ObjectInfo
+from xetra.common.s3_accounting import OperationUsage
+from xetra.common.trading_calendar import TradingCalendar
+from xetra.common.work_queue import QueueProgress, WorkItem, WorkQueue
+from xetra.transformers.job import (
+    create_calendar, create_checkpoint, create_s3_connectors, create_xetra_etl, traced_run
+)
+
+
+class BackfillShard(NamedTuple):
+    """
+    Class for a contiguous range of trading days processed by a single worker.
+
+    start: first date of the shard
+    end: last date of the shard (inclusive)
+    """
+    start: str
+    end: str
+
+
+class ShardResult(NamedTuple):
+    """
+    Class for the result of a processed shard, which is recorded in the meta files by the coordinator.
+
+    shard: the processed shard
+    dates: processed dates, to be recorded in the meta file
+    objects: processed source objects per date, to be recorded in the object meta file
+    stages: metrics of the stages of the shard, merged into the metrics of the backfill
+    s3_usage: S3 requests and bytes of the shard per operation, merged into the S3 usage of the backfill
+    """
+    shard: BackfillShard
+    dates: List[str]
+    objects: Dict[str, List[S3ObjectInfo]]
+    stages: List[StageMetrics]
+    s3_usage: List[OperationUsage]
+
+
+def split_date_range(start: str, end: str, shards: int, calendar: TradingCalendar) -> List[BackfillShard]:
+    """
+    Split the trading days of a date range into contiguous shards of (almost) equal length.
+
+    :param start: first date of the range
+    :param end: last date of the range (inclusive)
+    :param shards: maximal number of shards
+    :param calendar: trading calendar, only its trading days are split
+    :return: list of non-empty shards in the order of dates
+    """
+    days = calendar.trading_days(start, end)
+    return [
+        BackfillShard(start=str(chunk[0]), end=str(chunk[-1]))
+        for chunk in np.array_split(days, min(shards, len(days)) or 1)
+        if len(chunk)
+    ]
+
+
+def run_shard(config: dict, shard: BackfillShard, update_meta: bool = False) -> ShardResult:
+    """
+    Process a single shard. It is run in a worker process, so it creates its own connectors.
+
+    The worker extracts the previous trading day of the shard as well, so the change of the first date of the shard is
+    computed the same way as in a single run. It writes its report with a suffix naming the shard and, by default,
+    leaves the meta files to the coordinator. The shard is traced as a run of its own, and its metrics and S3 usage are
+    returned to be merged by the caller, see `merge_shard_metrics`.
+
+    :param config: the whole configuration
+    :param shard: shard to be processed
+    :param update_meta: if True, the worker records the processed dates in the meta files itself
+    """
+    s3_bucket_src, s3_bucket_trg = create_s3_connectors(config)
+    xetra_etl = create_xetra_etl(
+        config,
+        s3_bucket_src=s3_bucket_src,
+        s3_bucket_trg=s3_bucket_trg,
+        date_range=(shard.start, shard.end),
+        update_meta=update_meta,
+        late_lookback_days=0,
+        report_key_suffix=f'_backfill_{shard.start}_{shard.end}',
+        # The shards are processed in parallel and out of order, the rolling windows need the dates in order
+        rolling_report=None
+    )
+    with traced_run(s3_bucket_src, command='backfill-shard', shard=f'{shard.start}_{shard.end}'):
+        xetra_etl.etl_report1()
+    return ShardResult(
+        shard=shard,
+        dates=xetra_etl.meta_update_list,
+        objects=xetra_etl.processed_objects,
+        stages=s3_bucket_src.metrics.stages(),
+        s3_usage=s3_bucket_src.accounting.usage()
+    )
+
+
+def merge_shard_metrics(s3_bucket: S3BucketConnector, result: ShardResult):
+    """
+    Merge the metrics and the S3 usage of a shard processed by its own connectors (in a worker process) into the
+    registry and the accounting of a connector, so they are written once for the whole backfill by `write_metrics`.
+
+    :param s3_bucket: connector whose registry and accounting collect the metrics of the backfill
+    :param result: result of the processed shard
+    """
+    s3_bucket.metrics.merge(result.stages)
+    s3_bucket.accounting.merge(result.s3_usage)
+
+
+class XetraBackfill:
+    """
+    Coordinator of a backfill: splits the date range into shards, runs one shard per worker process and records the
+    processed dates of all the shards in the meta files at the end. The metrics and the S3 usage of the shards are
+    collected by the connectors of the coordinator.
+    """
+
+    def __init__(self, config: dict, start: str, end: str, workers: int):
+        """
+        Constructor for XetraBackfill
+
+        :param config: the whole configuration
+        :param start: first date of the backfill
+        :param end: last date of the backfill (inclusive)
+        :param workers: number of worker processes (and shards)
+        """
+        self._logger = logging.getLogger(__name__)
+        self.config = config
+        self.workers = workers
+        self.shards = split_date_range(start, end, workers, create_calendar(config))
+        self.s3_bucket_src, self.s3_bucket_trg = create_s3_connectors(config)
+
+    def run(self, executor: Executor = None) -> List[ShardResult]:
+        """
+        Run the backfill.
+
+        :param executor: executor running the shards, by default a process pool with `workers` processes
+        :return: results of the shards in the order of dates
+
+        :raises
+        the first exception raised by a worker, after the dates of the successful shards are recorded
+        """
+        self._logger.info(f'Backfill of {len(self.shards)} shards has started...')
+        executor = executor if executor is not None else ProcessPoolExecutor(max_workers=self.workers)
+        with executor:
+            futures = [executor.submit(run_shard, self.config, shard) for shard in self.shards]
+            results, errors = [], []
+            for shard, future in zip(self.shards, futures):
+                try:
+                    result = future.result()
+                except Exception as error:
+                    self._logger.error(f'Backfill of the shard {shard} has failed: {error!r}')
+                    errors.append(error)
+                    continue
+                merge_shard_metrics(self.s3_bucket_src, result)
+                results.append(result)
+
+        self._merge_meta(results)
+        if errors:
+            raise errors[0]
+        self._logger.info('Backfill has finished.')
+        return results
+
+    def _merge_meta(self, results: List[ShardResult]):
+        """
+        Record the dates and objects processed by all the shards with a single update of each meta file.
+        """
+        dates = [date for result in results for date in result.dates]
+        objects = {date: objs for result in results for date, objs in result.objects.items()}
+        if not dates:
+            return
+
+        meta_key = self.config['meta']['meta_key']
+        MetaProcess.update_meta_file(self.s3_bucket_trg, meta_key, dates)
+        if objects:
+            MetaProcess.update_object_meta_file(self.s3_bucket_trg, meta_key, objects)
+        self._logger.info(f'Recorded {len(dates)} backfilled dates in the meta file.')
+
+        # The recorded dates do not need their checkpoints anymore (the workers keep them until now)
+        checkpoint = create_checkpoint(self.config, self.s3_bucket_trg)
+        if checkpoint is not None:
+            checkpoint.clear(dates)
+
+
+def submit_backfill(queue: WorkQueue, start: str, end: str, shards: int, calendar: TradingCalendar) -> List[str]:
+    """
+    Split a date range into shards and add them to a work queue, from which workers on any host claim them.
+
+    :param queue: work queue of the backfill
+    :param start: first date of the backfill
+    :param end: last date of the backfill (inclusive)
+    :param shards: maximal number of shards
+    :param calendar: trading calendar, only its trading days are split
+    :return: identifiers of the added items. Shards already in the queue are not added again.
+    """
+    item_ids = []
+    for shard in split_date_range(start, end, shards, calendar):
+        item_id = f'{shard.start}_{shard.end}'
+        if queue.put(item_id, shard._asdict()):
+            item_ids.append(item_id)
+    return item_ids
+
+
+class _Heartbeat:
+    """
+    Context manager renewing the claim of a work item in a background thread.
+    """
+
+    def __init__(self, queue: WorkQueue, item: WorkItem, owner: str, interval_seconds: float):
+        self._logger = logging.getLogger(__name__)
+        self.queue = queue
+        self.item = item
+        self.owner = owner
+        self.interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval_seconds):
+            if not self.queue.heartbeat(self.item, self.owner):
+                self._logger.warning(f'The claim of the item {self.item.item_id} has been taken over.')
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stopped.set()
+        self._thread.join()
+
+
+def run_queue_worker(
+        config: dict,
+        queue: WorkQueue,
+        owner: str = None,
+        max_items: int = None,
+        s3_bucket: S3BucketConnector = None
+) -> int:
+    """
+    Claim shards from a work queue and process them until the queue has no shard to be claimed.
+
+    The worker records the processed dates in the meta files itself, the meta log is safe for concurrent writers.
+    A failed shard is released to the queue and retried by any worker.
+
+    :param config: the whole configuration
+    :param queue: work queue of the backfill
+    :param owner: identifier of the worker, by default unique for every call
+    :param max_items: maximal number of shards to be processed, by default unlimited
+    :param s3_bucket: connector whose registry and accounting collect the metrics and the S3 usage of the processed
+        shards, see `merge_shard_metrics`. By default, they are not collected.
+    :return: number of completed shards
+    """
+    logger = logging.getLogger(__name__)
+    owner = owner or f'{socket.gethostname()}-{uuid.uuid4().hex[:8]}'
+    completed = 0
+    while max_items is None or completed < max_items:
+        item = queue.claim(owner)
+        if item is None:
+            break
+        shard = BackfillShard(**item.payload)
+        logger.info(f'Worker {owner} has claimed the shard {shard} (attempt {item.attempts}).')
+        started = time.time()
+        try:
+            with _Heartbeat(queue, item, owner, interval_seconds=queue.lease_seconds / 3):
+                result = run_shard(config, shard, update_meta=True)
+        except Exception as error:
+            logger.error(f'Backfill of the shard {shard} has failed: {error!r}')
+            queue.fail(item, owner, repr(error))
+            continue
+        if s3_bucket is not None:
+            merge_shard_metrics(s3_bucket, result)
+        # A shard whose claim was taken over is recorded by the worker which has taken it over
+        if queue.complete(item, owner, {'dates': len(result.dates), 'seconds': round(time.time() - started, 3)}):
+            completed += 1
+    logger.info(f'Worker {owner} has completed {completed} shards.')
+    return completed
+
+
+def log_progress(queue: WorkQueue) -> QueueProgress:
+    """
+    Log the progress of a work queue.
+
+    :return: the logged progress
+    """
+    progress = queue.progress()
+    throughput = f'{progress.items_per_hour:.1f} shards/hour' if progress.items_per_hour is not None else 'n/a'
+    eta = f'{progress.eta_seconds:.0f} s' if progress.eta_seconds is not None else 'n/a'
+    logging.getLogger(__name__).info(
+        f'Backfill progress: {progress.done}/{progress.total} done, {progress.claimed} claimed, '
+        f'{progress.pending} pending, {progress.failed} failed; throughput {throughput}, ETA {eta}'
+    )
+    return progress
+
+
+def watch_backfill(queue: WorkQueue, interval_seconds: float = 30) -> QueueProgress:
+    """
+    Log the progress of a work queue periodically until all its shards are done or failed.
+
+    :return: the final progress
+    """
+    progress = log_progress(queue)
+    while not progress.finished:
+        time.sleep(interval_seconds)
+        progress = log_progress(queue)
+    return progress
@@ -0,0 +1,243 @@
+"""
+Configuration classes of the Xetra jobs and the validation of the YAML configuration.
+
+The module imports neither pandas nor boto3, so the CLI can parse and validate a configuration without loading them.
+"""
+
+from typing import List, NamedTuple, Optional
+
+from xetra.common.s3_config import S3ClientConfig, S3ConcurrencyConfig, S3CostConfig
+
+
+class XetraSourceConfig(NamedTuple):
+    """
+    Class for source configuration data.
+
+    src_first_extract_date: determines the date for extracting the source
+    src_columns: source column names
+    src_col_date: column name for date in source
+    src_col_isin: column name for ISIN in source
+    src_col_time: column name for time in source
+    src_col_start_price: column name for starting price in source
+    src_col_end_price: column name for ending price in source
+    src_col_min_price: column name for minimum price in source
+    src_col_max_price: column name for maximum price in source
+    src_col_traded_vol: column name for traded volume in source
+    """
+    first_extract_date: str
+    columns: list
+    col_date: str
+    col_isin: str
+    col_time: str
+    col_start_price: str
+    col_end_price: str
+    col_min_price: str
+    col_max_price: str
+    col_traded_vol: str
+
+
+class XetraTargetConfig(NamedTuple):
+    """
+    Class for target configuration data.
+
+    col_isin: column name for ISIN in target
+    col_date:  column name for ISIN in target
+    col_opening_price:  column name for opening price in target
+    col_closing_price:  column name for closing price in target
+    col_min_price:  column name for minimum price in target
+    col_max_price:  column name for maximum price in target
+    col_daily_traded_volume:  column name for daily traded volume in target
+    col_change:  column name for change to previous day's closing price in target
+    key: basic key of target file
+    key_date_format: date format of target file key
+    format: file format of the target file
+    """
+    col_isin: str
+    col_date: str
+    col_opening_price: str
+    col_closing_price: str
+    col_min_price: str
+    col_max_price: str
+    col_daily_traded_volume: str
+    col_change: str
+    key: str
+    key_date_format: str
+    format: str
+
+
+class XetraStreamConfig(NamedTuple):
+    """
+    Class for streaming configuration data.
+
+    poll_seconds: time between two polls of the source prefix
+    flush_seconds: minimal time between two writes of the intraday report, it is written only when new data arrived
+    state_prefix: key prefix in the target bucket, under which the running state is snapshotted
+    intraday_key: basic key of the intraday report, the date and the format are appended
+    """
+    poll_seconds: float = 60
+    flush_seconds: float = 300
+    state_prefix: str = 'stream/report1/'
+    intraday_key: str = 'report1_intraday/xetra_intraday_report1_'
+
+
+class PlannerConfig(NamedTuple):
+    """
+    Class for planner configuration data.
+
+    csv_bytes_per_row: average size of a source csv row, used to estimate the number of rows from the object sizes
+    memory_bytes_per_row: average memory of a parsed source row in a pandas DataFrame
+    memory_factor: ratio of the peak memory to the memory of the parsed data, for the copies made by the transformations
+    memory_limit_mb: memory available to the job. By default, a half of the physical memory of the host.
+    """
+    csv_bytes_per_row: float = 110
+    memory_bytes_per_row: float = 700
+    memory_factor: float = 2.0
+    memory_limit_mb: Optional[float] = None
+
+
+class PipelineConfig(NamedTuple):
+    """
+    Class for pipeline configuration data.
+
+    download_workers: number of threads downloading the source objects
+    parse_workers: number of threads parsing and pre-aggregating the downloaded objects
+    queue_size: capacity of every queue between two stages. A full queue blocks the stage in front of it, so at most
+        about `queue_size` items per stage are held in memory.
+    """
+    download_workers: int = 8
+    parse_workers: int = 2
+    queue_size: int = 16
+
+
+class MetricsConfig(NamedTuple):
+    """
+    Class for the configuration of the metrics written at the end of the job.
+
+    json_path: path of the JSON file with the metrics, None turns it off
+    textfile_path: path of the Prometheus textfile (`*.prom` in the directory of the node_exporter textfile
+        collector), None turns it off
+    """
+    json_path: Optional[str] = None
+    textfile_path: Optional[str] = None
+
+
+class TracingConfig(NamedTuple):
+    """
+    Class for the configuration of the tracing of the runs (spans of the run, the stages and the S3 requests).
+
+    jsonl_path: path of the JSON-lines file the spans are appended to, None turns it off
+    opentelemetry: whether the spans are exported to OpenTelemetry as well (needs opentelemetry-api)
+    otlp_endpoint: endpoint of an OTLP collector the spans are sent to (needs opentelemetry-sdk and
+        opentelemetry-exporter-otlp), by default the globally configured tracer provider is used
+    service_name: name of the service in OpenTelemetry
+    """
+    jsonl_path: Optional[str] = None
+    opentelemetry: bool = False
+    otlp_endpoint: Optional[str] = None
+    service_name: str = 'xetra-etl'
+
+
+class IsinDictionaryConfig(NamedTuple):
+    """
+    Class for the configuration of the ISIN dictionary mapping the ISINs to int32 codes.
+
+    key: key of the dictionary in the target bucket, None turns the dictionary off
+    encode_output: whether the reports are written with the codes instead of the ISINs. The dictionary is then written
+        next to every report as a side file.
+    """
+    key: Optional[str] = None
+    encode_output: bool = False
+
+
+class RollingWindowConfig(NamedTuple):
+    """
+    Class for the configuration of the rolling-window report (moving averages and rolling standard deviations of the
+    closing prices per ISIN).
+
+    state_key: key of the state of the rolling windows in the target bucket, None turns the report off
+    key: key prefix of the rolling-window reports in the target bucket
+    windows: lengths of the windows in trading days
+    """
+    state_key: Optional[str] = None
+    key: str = 'rolling/xetra_rolling_report_'
+    windows: tuple = (20, 50, 200)
+
+
+class IntradayConfig(NamedTuple):
+    """
+    Class for the configuration of the intraday report (OHLCV bars per time bucket and the VWAP per ISIN and day).
+
+    key: key prefix of the intraday reports in the target bucket, None turns the report off
+    bucket_minutes: length of the time buckets in minutes
+    """
+    key: Optional[str] = None
+    bucket_minutes: int = 60
+
+
+# Sections of the configuration read into NamedTuple classes: (class, whether the section is required)
+_SECTION_CLASSES = {
+    'source': (XetraSourceConfig, True),
+    'target': (XetraTargetConfig, True),
+    'stream': (XetraStreamConfig, False),
+    'planner': (PlannerConfig, False),
+    'pipeline': (PipelineConfig, False),
+    'metrics': (MetricsConfig, False),
+    'tracing': (TracingConfig, False),
+    'isin_dictionary': (IsinDictionaryConfig, False),
+    'rolling': (RollingWindowConfig, False),
+    'intraday': (IntradayConfig, False)
+}
+_REQUIRED_KEYS = {
+    's3': ['access_key', 'secret_key', 'src_endpoint_url', 'src_bucket', 'trg_endpoint_url', 'trg_bucket'],
+    'meta': ['meta_key'],
+    'logging': ['version']
+}
+# Sections choosing an implementation: (key, supported values, default value)
+_BACKENDS = {
+    'checkpoint': ('backend', ['s3', 'local'], None),
+    'queue': ('backend', ['s3', 'sqlite'], None),
+    'calendar': ('name', ['xetra', 'every_day'], 'xetra')
+}
+
+
+def _check_fields(section: str, values: dict, cls, required: bool) -> List[str]:
+    fields_required = [field for field in cls._fields if field not in cls._field_defaults]
+    errors = [f'{section}: unknown key {key}' for key in values if key not in cls._fields]
+    if required:
+        errors += [f'{section}: missing key {key}' for key in fields_required if key not in values]
+    return errors
+
+
+def validate_config(config: dict) -> List[str]:
+    """
+    Validate the YAML configuration of the Xetra jobs without connecting anywhere.
+
+    :param config: the whole configuration
+    :return: list of the errors found, empty if the configuration is valid
+    """
+    if not isinstance(config, dict):
+        return ['the configuration is not a mapping']
+    errors = []
+    for section, keys in _REQUIRED_KEYS.items():
+        if not isinstance(config.get(section), dict):
+            errors.append(f'missing section {section}')
+            continue
+        errors += [f'{section}: missing key {key}' for key in keys if key not in config[section]]
+    s3_config = config.get('s3') if isinstance(config.get('s3'), dict) else {}
+    for section, cls in (('client', S3ClientConfig), ('concurrency', S3ConcurrencyConfig), ('cost', S3CostConfig)):
+        if s3_config.get(section) is not None:
+            errors += _check_fields(f's3.{section}', s3_config[section], cls, False)
+
+    for section, (cls, required) in _SECTION_CLASSES.items():
+        values = config.get(section)
+        if values is None:
+            if required:
+                errors.append(f'missing section {section}')
+            continue
+        errors += _check_fields(section, values, cls, True)
+
+    for section, (key, allowed, default) in _BACKENDS.items():
+        values = config.get(section)
+        if values and values.get(key, default) not in allowed:
+            errors.append(f'{section}: {key} must be one of {allowed}')
+    return errors
@@ -0,0 +1,284 @@
+"""
+Creating the Xetra ETL components from the YAML configuration.
+"""
+
+from contextlib import contextmanager
+import time
+from typing import Iterator, Optional, Tuple
+
+from xetra.common.checkpoint import CheckpointStore
+from xetra.common.custom_exceptions import WrongWorkQueueException
+from xetra.common.isin_dictionary import IsinDictionary
+from xetra.common.metrics import MetricsRegistry
+from xetra.common.object_cache import LocalObjectCache
+from xetra.common.s3 import S3BucketConnector, S3ClientConfig, S3ConcurrencyConfig, S3ConnectorFactory
+from xetra.common.s3_config import S3CostConfig
+from xetra.common.tracing import JsonLinesExporter, OpenTelemetryExporter, Tracer
+from xetra.common.trading_calendar import TradingCalendar
+from xetra.common.work_queue import S3WorkQueue, SQLiteWorkQueue, WorkQueue
+from xetra.transformers.config import (
+    IntradayConfig, IsinDictionaryConfig, MetricsConfig, RollingWindowConfig, TracingConfig
+)
+from xetra.transformers.pipeline import PipelineConfig
+from xetra.transformers.planner import ExecutionPlanner, PlannerConfig
+from xetra.transformers.rolling import RollingWindowReport
+from xetra.transformers.streaming import XetraStreamConfig, XetraStreamingETL
+from xetra.transformers.xetra_transformer import XetraETL, XetraSourceConfig, XetraTargetConfig
+
+
+def create_tracer(config: dict) -> Optional[Tracer]:
+    """
+    Create the tracer from the `tracing` section of the configuration, which is optional.
+
+    :param config: the whole configuration
+    :return: the tracer, or None if no exporter is configured
+    """
+    tracing_config = TracingConfig(**(config.get('tracing') or {}))
+    exporters = []
+    if tracing_config.jsonl_path:
+        exporters.append(JsonLinesExporter(tracing_config.jsonl_path))
+    if tracing_config.opentelemetry:
+        exporters.append(OpenTelemetryExporter(tracing_config.service_name, tracing_config.otlp_endpoint))
+    return Tracer(exporters) if exporters else None
+
+
+@contextmanager
+def traced_run(s3_bucket: S3BucketConnector, **attributes) -> Iterator[None]:
+    """
+    Trace a run as the root span of its trace, if the tracing is configured, and close the tracer afterwards.
+
+    :param s3_bucket: connector whose registry holds the tracer, see `create_s3_connectors`
+    :param attributes: attributes of the run span, e.g. the id of the run
+    """
+    tracer = s3_bucket.metrics.tracer
+    if tracer is None:
+        yield
+        return
+    try:
+        with tracer.span('run', **attributes):
+            yield
+    finally:
+        tracer.close()
+
+
+def create_s3_connectors(config: dict) -> Tuple[S3BucketConnector, S3BucketConnector]:
+    """
+    Create the source and target bucket connectors from the `s3` section of the configuration.
+
+    :param config: the whole configuration
+    :return: source and target S3BucketConnector
+    """
+    s3_config = config['s3']
+
+    # Small control objects (the meta file) are cached locally and re-read with conditional GETs
+    cache = LocalObjectCache(s3_config['cache_dir']) if s3_config.get('cache_dir') else None
+
+    # Both connectors share one session and one tuned client with its connection pool
+    factory = S3ConnectorFactory(
+        access_key=s3_config['access_key'],
+        secret_key=s3_config['secret_key'],
+        client_config=S3ClientConfig(**s3_config.get('client', {})),
+        concurrency_config=(
+            S3ConcurrencyConfig(**s3_config['concurrency']) if s3_config.get('concurrency') is not None else None
+        ),
+        tracer=create_tracer(config)
+    )
+    s3_bucket_src = factory.connector(endpoint_url=s3_config['src_endpoint_url'], bucket_name=s3_config['src_bucket'])
+    s3_bucket_trg = factory.connector(
+        endpoint_url=s3_config['trg_endpoint_url'], bucket_name=s3_config['trg_bucket'], cache=cache
+    )
+    return s3_bucket_src, s3_bucket_trg
+
+
+def create_calendar(config: dict) -> TradingCalendar:
+    """
+    Create the trading calendar from the `calendar` section of the configuration.
+    Without the section every calendar day is a trading day.
+    """
+    calendar_config = config.get('calendar')
+    return TradingCalendar.from_config(calendar_config) if calendar_config else TradingCalendar.every_day()
+
+
+def create_checkpoint(config: dict, s3_bucket_trg: S3BucketConnector) -> Optional[CheckpointStore]:
+    """
+    Create the checkpoint store from the `checkpoint` section of the configuration, or return None without it.
+    Checkpoints are stored either locally or in the target bucket.
+    """
+    checkpoint_config = config.get('checkpoint')
+    if not checkpoint_config:
+        return None
+    return CheckpointStore(
+        prefix=checkpoint_config['prefix'],
+        s3_bucket=s3_bucket_trg if checkpoint_config['backend'] == 's3' else None
+    )
+
+
+def create_isin_dictionary(config: dict, s3_bucket_trg: S3BucketConnector) -> Optional[IsinDictionary]:
+    """
+    Create the ISIN dictionary from the `isin_dictionary` section of the configuration, or return None without its key.
+    The dictionary is stored in the target bucket.
+    """
+    dictionary_config = IsinDictionaryConfig(**(config.get('isin_dictionary') or {}))
+    if not dictionary_config.key:
+        return None
+    return IsinDictionary(s3_bucket_trg, dictionary_config.key)
+
+
+def create_rolling_report(config: dict, s3_bucket_trg: S3BucketConnector) -> Optional[RollingWindowReport]:
+    """
+    Create the rolling-window report from the `rolling` section of the configuration, or return None without its
+    state key. The state and the reports are stored in the target bucket.
+    """
+    rolling_config = RollingWindowConfig(**(config.get('rolling') or {}))
+    if not rolling_config.state_key:
+        return None
+    return RollingWindowReport(
+        s3_bucket_trg,
+        state_key=rolling_config.state_key,
+        key=rolling_config.key,
+        windows=rolling_config.windows,
+        col_isin=config['source']['col_isin'],
+        col_date=config['source']['col_date'],
+        col_closing_price=config['target']['col_closing_price']
+    )
+
+
+def create_work_queue(config: dict, s3_bucket_trg: S3BucketConnector) -> WorkQueue:
+    """
+    Create the work queue of distributed backfills from the `queue` section of the configuration.
+
+    :param config: the whole configuration
+    :param s3_bucket_trg: connection to the target bucket, which stores the S3 queue
+    :return: S3WorkQueue (backend 's3') or SQLiteWorkQueue (backend 'sqlite')
+
+    :raises
+    WrongWorkQueueException, if the section is missing or its backend is not supported
+    """
+    queue_config = config.get('queue')
+    if not queue_config:
+        raise WrongWorkQueueException('The configuration has no queue section')
+    options = {
+        'lease_seconds': queue_config.get('lease_seconds', 300),
+        'max_attempts': queue_config.get('max_attempts', 3)
+    }
+    if queue_config['backend'] == 's3':
+        return S3WorkQueue(s3_bucket_trg, prefix=queue_config['prefix'], **options)
+    if queue_config['backend'] == 'sqlite':
+        return SQLiteWorkQueue(queue_config['path'], **options)
+    raise WrongWorkQueueException(f"The work queue backend {queue_config['backend']} is not supported")
+
+
+def create_xetra_etl(
+        config: dict,
+        s3_bucket_src: S3BucketConnector = None,
+        s3_bucket_trg: S3BucketConnector = None,
+        **kwargs
+) -> XetraETL:
+    """
+    Create the XetraETL instance from the configuration.
+
+    :param config: the whole configuration
+    :param s3_bucket_src: connection to the source bucket, by default it is created from the configuration
+    :param s3_bucket_trg: connection to the target bucket, by default it is created from the configuration
+    :param kwargs: additional keyword arguments of XetraETL, e.g. `date_range`
+    """
+    if s3_bucket_src is None or s3_bucket_trg is None:
+        s3_bucket_src, s3_bucket_trg = create_s3_connectors(config)
+
+    # Read source configuration
+    source_config = XetraSourceConfig(**config['source'])
+
+    # Read target configuration
+    target_config = XetraTargetConfig(**config['target'])
+
+    # Read meta file configuration
+    meta_config = config['meta']
+
+    kwargs.setdefault('late_lookback_days', meta_config.get('late_lookback_days', 0))
+    kwargs.setdefault('fetch_workers', config['s3'].get('fetch_workers', 1))
+    kwargs.setdefault('pipeline_config', PipelineConfig(**config.get('pipeline', {})))
+    kwargs.setdefault('isin_dictionary', create_isin_dictionary(config, s3_bucket_trg))
+    kwargs.setdefault('encode_output', IsinDictionaryConfig(**(config.get('isin_dictionary') or {})).encode_output)
+    kwargs.setdefault('rolling_report', create_rolling_report(config, s3_bucket_trg))
+    kwargs.setdefault('intraday_config', IntradayConfig(**(config.get('intraday') or {})))
+    return XetraETL(
+        s3_bucket_src=s3_bucket_src,
+        s3_bucket_trg=s3_bucket_trg,
+        meta_key=meta_config['meta_key'],
+        src_args=source_config,
+        trg_args=target_config,
+        checkpoint=create_checkpoint(config, s3_bucket_trg),
+        calendar=create_calendar(config),
+        **kwargs
+    )
+
+
+def create_streaming_etl(config: dict) -> XetraStreamingETL:
+    """
+    Create the XetraStreamingETL instance from the configuration. The `stream` section is optional.
+
+    :param config: the whole configuration
+    """
+    s3_bucket_src, s3_bucket_trg = create_s3_connectors(config)
+    return XetraStreamingETL(
+        s3_bucket_src=s3_bucket_src,
+        s3_bucket_trg=s3_bucket_trg,
+        meta_key=config['meta']['meta_key'],
+        src_args=XetraSourceConfig(**config['source']),
+        trg_args=XetraTargetConfig(**config['target']),
+        stream_args=XetraStreamConfig(**config.get('stream', {})),
+        calendar=create_calendar(config)
+    )
+
+
+def create_planner(config: dict, s3_bucket_src: S3BucketConnector) -> ExecutionPlanner:
+    """
+    Create the execution planner from the `planner` section of the configuration, which is optional.
+
+    :param config: the whole configuration
+    :param s3_bucket_src: connection to the source bucket
+    """
+    return ExecutionPlanner(
+        s3_bucket_src,
+        config=PlannerConfig(**config.get('planner', {})),
+        pipeline_config=PipelineConfig(**config.get('pipeline', {}))
+    )
+
+
+def write_metrics(config: dict, s3_bucket: S3BucketConnector):
+    """
+    Write the metrics of a finished job as configured in the `metrics` section, which is optional. Besides the stage
+    metrics, the statistics of the S3 concurrency limiter, the S3 requests and bytes per operation with their estimated
+    cost, and the time of the run are written as gauges. The S3 usage is logged, with a warning if it exceeds the
+    thresholds of the `s3.cost` section.
+
+    :param config: the whole configuration
+    :param s3_bucket: connector whose registry (shared by the job and its connectors), limiter and accounting are
+        written
+    """
+    metrics: MetricsRegistry = s3_bucket.metrics
+    metrics_config = MetricsConfig(**(config.get('metrics') or {}))
+    if s3_bucket.limiter is not None:
+        stats = s3_bucket.limiter.stats()
+        metrics.set_gauge('s3_concurrency_limit', stats.limit, 'Limit of the S3 requests in flight at the end.')
+        metrics.set_gauge('s3_max_in_flight', stats.max_in_flight, 'Maximal number of S3 requests in flight.')
+        metrics.set_gauge('s3_throttled_requests', stats.throttled, 'Number of S3 requests rejected by throttling.')
+        metrics.set_gauge('s3_backoff_seconds', stats.backoff_seconds, 'Time the throttled S3 requests backed off.')
+    cost_config = S3CostConfig(**(config['s3'].get('cost') or {}))
+    s3_bucket.accounting.report(cost_config)
+    usage = s3_bucket.accounting.usage()
+    for item in usage:
+        labels = {'operation': item.operation}
+        metrics.set_gauge('s3_requests', item.requests, 'Number of the S3 requests of the run.', labels)
+        metrics.set_gauge('s3_request_errors', item.errors, 'Number of the S3 requests answered with an error.', labels)
+        metrics.set_gauge('s3_bytes_in', item.bytes_in, 'Bytes received from S3 during the run.', labels)
+        metrics.set_gauge('s3_bytes_out', item.bytes_out, 'Bytes sent to S3 during the run.', labels)
+    metrics.set_gauge(
+        's3_estimated_cost', s3_bucket.accounting.estimate_cost(usage, cost_config),
+        'Estimated cost of the S3 requests and transfer of the run.'
+    )
+    metrics.set_gauge('last_success_timestamp_seconds', time.time(), 'Time of the last successful run.')
+    if metrics_config.json_path:
+        metrics.write_json(metrics_config.json_path)
+    if metrics_config.textfile_path:
+        metrics.write_prometheus(metrics_config.textfile_path)
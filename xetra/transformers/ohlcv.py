@@ -0,0 +1,127 @@
+"""
+Partial open/high/low/close/volume aggregates, which can be computed per chunk of source data and combined later.
+"""
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from xetra.transformers.config import XetraSourceConfig, XetraTargetConfig
+
+FIRST_TIME_COL = 'first_time'
+LAST_TIME_COL = 'last_time'
+TRADED_VOLUME_COL = 'traded_volume'
+VWAP_COL = 'vwap_eur'
+DAILY_VWAP_COL = 'daily_vwap_eur'
+
+
+def aggregate_ohlcv(
+        df: pd.DataFrame, keys: List[str], src_args: XetraSourceConfig, trg_args: XetraTargetConfig
+) -> pd.DataFrame:
+    """
+    Aggregate a chunk of source data per keys into partial aggregates. Besides the report columns, the partial
+    aggregates hold the times of the first and the last record, so they can be combined with other chunks.
+
+    :param df: pandas DataFrame with source data
+    :param keys: source columns to aggregate by, e.g. ISIN or ISIN and date
+    :param src_args: NamedTuple class with source configuration data
+    :param trg_args: NamedTuple class with target configuration data
+    :returns:
+        df: pandas DataFrame with the partial aggregates
+    """
+    df = df.loc[:, src_args.columns].dropna()
+    df = df.sort_values(by=src_args.col_time, kind='stable')
+    grouped = df.groupby(keys)
+    return pd.DataFrame({
+        FIRST_TIME_COL: grouped[src_args.col_time].first(),
+        trg_args.col_opening_price: grouped[src_args.col_start_price].first(),
+        LAST_TIME_COL: grouped[src_args.col_time].last(),
+        trg_args.col_closing_price: grouped[src_args.col_end_price].last(),
+        trg_args.col_min_price: grouped[src_args.col_min_price].min(),
+        trg_args.col_max_price: grouped[src_args.col_max_price].max(),
+        trg_args.col_daily_traded_volume: grouped[src_args.col_traded_vol].sum()
+    }).reset_index()
+
+
+def combine_ohlcv(df: pd.DataFrame, keys: List[str], trg_args: XetraTargetConfig) -> pd.DataFrame:
+    """
+    Combine partial aggregates of several chunks. The opening price is taken from the partial aggregate with the
+    earliest record, the closing price from the one with the latest record.
+
+    :param df: pandas DataFrame with concatenated partial aggregates
+    :param keys: columns to aggregate by, the same as used by aggregate_ohlcv
+    :param trg_args: NamedTuple class with target configuration data
+    :returns:
+        df: pandas DataFrame with the combined partial aggregates
+    """
+    grouped_first = df.sort_values(by=FIRST_TIME_COL, kind='stable').groupby(keys)
+    grouped_last = df.sort_values(by=LAST_TIME_COL, kind='stable').groupby(keys)
+    grouped = df.groupby(keys)
+    return pd.DataFrame({
+        FIRST_TIME_COL: grouped_first[FIRST_TIME_COL].first(),
+        trg_args.col_opening_price: grouped_first[trg_args.col_opening_price].first(),
+        LAST_TIME_COL: grouped_last[LAST_TIME_COL].last(),
+        trg_args.col_closing_price: grouped_last[trg_args.col_closing_price].last(),
+        trg_args.col_min_price: grouped[trg_args.col_min_price].min(),
+        trg_args.col_max_price: grouped[trg_args.col_max_price].max(),
+        trg_args.col_daily_traded_volume: grouped[trg_args.col_daily_traded_volume].sum()
+    }).reset_index()
+
+
+def time_buckets(times: pd.Series, bucket_minutes: int) -> np.ndarray:
+    """
+    Assign times of the day to buckets. Only the distinct times (at most one per minute of the day) are parsed, every
+    row gets the label of its bucket by its position among them.
+
+    :param times: times of the day as 'HH:MM' strings
+    :param bucket_minutes: length of the buckets in minutes, e.g. 60 for hourly buckets
+    :return: numpy array with the start of the bucket of every time as 'HH:MM' strings
+    """
+    codes, distinct = pd.factorize(times)
+    parsed = pd.to_datetime(distinct, format='%H:%M')
+    starts = (parsed.hour * 60 + parsed.minute) // bucket_minutes * bucket_minutes
+    labels = np.array([f'{start // 60:02d}:{start % 60:02d}' for start in starts], dtype=object)
+    return labels[codes]
+
+
+def aggregate_intraday(
+        df: pd.DataFrame, src_args: XetraSourceConfig, trg_args: XetraTargetConfig, bucket_minutes: int = 60
+) -> pd.DataFrame:
+    """
+    Aggregate source data into open/high/low/close/volume bars per ISIN, date and time bucket, with the volume weighted
+    average price (VWAP) of the bucket and of the whole day. The VWAP is approximated from the minute records by their
+    typical price (minimum + maximum + end price) / 3.
+
+    :param df: pandas DataFrame with source data
+    :param src_args: NamedTuple class with source configuration data
+    :param trg_args: NamedTuple class with target configuration data
+    :param bucket_minutes: length of the time buckets in minutes
+    :returns:
+        df: pandas DataFrame with a row per ISIN, date and bucket (labelled by its start in the time column), sorted by
+            them and rounded to 2 decimals
+    """
+    keys = [src_args.col_isin, src_args.col_date, src_args.col_time]
+    df = df.loc[:, src_args.columns].dropna()
+    df = df.sort_values(by=src_args.col_time, kind='stable')
+    turnover = (
+        (df[src_args.col_min_price] + df[src_args.col_max_price] + df[src_args.col_end_price]) / 3
+        * df[src_args.col_traded_vol]
+    )
+    grouped = df.assign(
+        **{src_args.col_time: time_buckets(df[src_args.col_time], bucket_minutes), VWAP_COL: turnover}
+    ).groupby(keys)
+    df = pd.DataFrame({
+        trg_args.col_opening_price: grouped[src_args.col_start_price].first(),
+        trg_args.col_closing_price: grouped[src_args.col_end_price].last(),
+        trg_args.col_min_price: grouped[src_args.col_min_price].min(),
+        trg_args.col_max_price: grouped[src_args.col_max_price].max(),
+        TRADED_VOLUME_COL: grouped[src_args.col_traded_vol].sum(),
+        VWAP_COL: grouped[VWAP_COL].sum()
+    }).reset_index()
+
+    # The turnover and the volume of the buckets sum up to the ones of the day
+    daily = df.groupby([src_args.col_isin, src_args.col_date])
+    df[DAILY_VWAP_COL] = daily[VWAP_COL].transform('sum') / daily[TRADED_VOLUME_COL].transform('sum')
+    df[VWAP_COL] = df[VWAP_COL] / df[TRADED_VOLUME_COL]
+    return df.round(decimals=2)
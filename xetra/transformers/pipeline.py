@@ -0,0 +1,263 @@
+"""
+Pipelined extraction of report 1: listing, downloading, parsing and aggregating run concurrently as stages connected
+by bounded queues.
+"""
+
+from io import StringIO
+import logging
+from queue import Queue
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import pandas as pd
+
+from xetra.common.isin_dictionary import IsinDictionary
+from xetra.common.metrics import MetricsRegistry
+from xetra.common.s3 import S3BucketConnector, S3ObjectInfo
+from xetra.transformers.config import PipelineConfig, XetraSourceConfig, XetraTargetConfig
+from xetra.transformers.ohlcv import FIRST_TIME_COL, LAST_TIME_COL, aggregate_ohlcv, combine_ohlcv
+
+# Marks the end of the items of a queue, every worker of the next stage receives one
+_END = object()
+
+
+class StageStats(NamedTuple):
+    """
+    Class for the statistics of a pipeline stage.
+
+    name: name of the stage
+    workers: number of worker threads of the stage
+    items: number of items processed by the stage
+    busy_seconds: time the workers spent processing items, summed over the workers
+    blocked_seconds: time the workers spent waiting for a free slot in the full output queue (backpressure)
+    utilization: busy_seconds / (workers * wall time of the pipeline)
+    """
+    name: str
+    workers: int
+    items: int
+    busy_seconds: float
+    blocked_seconds: float
+    utilization: float
+
+
+class _Stage:
+    """
+    Worker threads applying a function to the items of an input queue and putting the results to an output queue.
+    The function returns a list of results, so a stage can drop an item or emit several results.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            func: Callable[[object], list],
+            workers: int,
+            input_queue: Queue,
+            output_queue: Optional[Queue],
+            pipeline: 'ReportPipeline'
+    ):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.pipeline = pipeline
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.next_workers = 0
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f'{name}-{i}', daemon=True) for i in range(workers)
+        ]
+
+    def start(self, next_workers: int):
+        self.next_workers = next_workers
+        for thread in self._threads:
+            thread.start()
+        threading.Thread(target=self._close, daemon=True).start()
+
+    def _work(self):
+        while True:
+            item = self.input_queue.get()
+            if item is _END:
+                return
+            if self.pipeline.failed.is_set():
+                # Keep consuming, so the stages in front of the failed one are not blocked forever
+                continue
+            started = time.perf_counter()
+            try:
+                results = self.func(item)
+            except Exception as error:
+                self.pipeline.fail(self.name, error)
+                continue
+            busy = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for result in results:
+                self.output_queue.put(result)
+            blocked = time.perf_counter() - started
+            with self._lock:
+                self.items += 1
+                self.busy_seconds += busy
+                self.blocked_seconds += blocked
+
+    def _close(self):
+        for thread in self._threads:
+            thread.join()
+        if self.output_queue is not None:
+            for _ in range(self.next_workers):
+                self.output_queue.put(_END)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self, wall_seconds: float) -> StageStats:
+        return StageStats(
+            name=self.name,
+            workers=self.workers,
+            items=self.items,
+            busy_seconds=round(self.busy_seconds, 6),
+            blocked_seconds=round(self.blocked_seconds, 6),
+            utilization=round(self.busy_seconds / (self.workers * wall_seconds), 4) if wall_seconds > 0 else 0.0
+        )
+
+
+class ReportPipeline:
+    """
+    Extracts the daily aggregates of report 1 with a staged pipeline:
+
+    list -> download -> parse -> aggregate -> collect
+
+    The lister lists the source prefix of every date, downloader threads fetch the objects, parser threads parse them
+    and aggregate every object into partial aggregates per ISIN and date, the aggregator combines the partial
+    aggregates of a date as soon as all its objects are parsed, and the collector gathers the finished dates. The
+    stages are connected by bounded queues, so the network and the CPU are busy at the same time while only a bounded
+    number of objects is held in memory.
+    """
+
+    def __init__(
+            self,
+            s3_bucket_src: S3BucketConnector,
+            src_args: XetraSourceConfig,
+            trg_args: XetraTargetConfig,
+            config: PipelineConfig = PipelineConfig(),
+            metrics: MetricsRegistry = None,
+            isin_dictionary: IsinDictionary = None,
+            listing: Dict[str, List[S3ObjectInfo]] = None
+    ):
+        """
+        Constructor for ReportPipeline
+
+        :param s3_bucket_src: connection to the source S3 bucket
+        :param src_args: NamedTuple class with source configuration data
+        :param trg_args: NamedTuple class with target configuration data
+        :param config: NamedTuple class with pipeline configuration data
+        :param metrics: registry of the metrics of the parse and aggregate stages, by default the registry of the
+            source connector
+        :param isin_dictionary: dictionary of the ISIN codes. If given, the ISINs are encoded right after parsing.
+        :param listing: already listed source objects per date, the lister lists only the other dates
+        """
+        self._logger = logging.getLogger(__name__)
+        self.s3_bucket_src = s3_bucket_src
+        self.src_args = src_args
+        self.trg_args = trg_args
+        self.config = config
+        self.metrics = metrics if metrics is not None else s3_bucket_src.metrics
+        self.isin_dictionary = isin_dictionary
+        self.keys = [src_args.col_isin, src_args.col_date]
+        self.failed = threading.Event()
+        self.objects: Dict[str, List[S3ObjectInfo]] = {}
+        self.stats: List[StageStats] = []
+        self._errors = []
+        self._partials: Dict[str, list] = {}
+        self._listing = dict(listing) if listing is not None else {}
+
+    def fail(self, stage: str, error: Exception):
+        """
+        Record an error of a stage. The remaining items are drained and the error is raised by `run`.
+        """
+        self._logger.error(f'The {stage} stage of the pipeline has failed: {error!r}')
+        self._errors.append(error)
+        self.failed.set()
+
+    def _list(self, date: str) -> list:
+        objects = self._listing.pop(date, None)
+        if objects is None:
+            objects = self.s3_bucket_src.list_objects_in_prefix(prefix=date)
+        if objects:
+            self.objects[date] = objects
+        return [(date, len(objects), obj) for obj in objects]
+
+    def _download(self, item: tuple) -> list:
+        date, count, obj = item
+        return [(date, count, self.s3_bucket_src.read_object(obj.key))]
+
+    def _parse(self, item: tuple) -> list:
+        date, count, body = item
+        with self.metrics.stage('parse') as observation:
+            df = pd.read_csv(StringIO(body.decode('utf-8')))
+            if self.isin_dictionary is not None:
+                df = self.isin_dictionary.encode_column(df, self.src_args.col_isin)
+            observation.add(objects=1, size=len(body), rows_out=len(df))
+        with self.metrics.stage('aggregate') as observation:
+            df_partial = aggregate_ohlcv(df, self.keys, self.src_args, self.trg_args)
+            observation.add(objects=1, rows_in=len(df), rows_out=len(df_partial))
+        return [(date, count, df_partial)]
+
+    def _aggregate(self, item: tuple) -> list:
+        date, count, df_partial = item
+        partials = self._partials.setdefault(date, [])
+        partials.append(df_partial)
+        if len(partials) < count:
+            return []
+        del self._partials[date]
+        df_date = combine_ohlcv(pd.concat(partials, ignore_index=True), self.keys, self.trg_args)
+        return [df_date.drop(columns=[FIRST_TIME_COL, LAST_TIME_COL])]
+
+    def run(self, dates: List[str]) -> pd.DataFrame:
+        """
+        Run the pipeline.
+
+        :param dates: source dates to be extracted
+        :returns:
+            df: pandas DataFrame with the daily aggregates of all the dates, sorted by ISIN and date
+
+        :raises
+        the first exception raised by any stage
+        """
+        queue_size = self.config.queue_size
+        date_queue = Queue()
+        object_queue, body_queue, partial_queue, day_queue = (Queue(maxsize=queue_size) for _ in range(4))
+        collected = []
+
+        stages = [
+            _Stage('list', self._list, 1, date_queue, object_queue, self),
+            _Stage('download', self._download, self.config.download_workers, object_queue, body_queue, self),
+            _Stage('parse', self._parse, self.config.parse_workers, body_queue, partial_queue, self),
+            # A single aggregator owns the partial aggregates of the unfinished dates
+            _Stage('aggregate', self._aggregate, 1, partial_queue, day_queue, self),
+            _Stage('collect', lambda df: collected.append(df) or [], 1, day_queue, None, self)
+        ]
+
+        started = time.perf_counter()
+        for stage, next_stage in zip(stages, stages[1:] + [None]):
+            stage.start(next_stage.workers if next_stage is not None else 0)
+        for date in dates:
+            date_queue.put(date)
+        date_queue.put(_END)
+        for stage in stages:
+            stage.join()
+        wall_seconds = time.perf_counter() - started
+
+        self.stats = [stage.stats(wall_seconds) for stage in stages]
+        self._logger.info(f'Pipeline has finished in {wall_seconds:.3f} s. Stage utilization: ' + ', '.join(
+            f'{stats.name} {stats.utilization:.0%} ({stats.items} items, {stats.blocked_seconds:.3f} s blocked)'
+            for stats in self.stats
+        ))
+        if self._errors:
+            raise self._errors[0]
+        if not collected:
+            return pd.DataFrame()
+        return pd.concat(collected, ignore_index=True).sort_values(by=self.keys).reset_index(drop=True)
@@ -0,0 +1,163 @@
+"""
+Planning the execution of the report 1 job from the size of its source data.
+"""
+
+import logging
+import os
+from typing import Dict, List, NamedTuple, Optional
+
+from xetra.common.constants import ExecutionModes
+from xetra.common.s3 import S3BucketConnector, S3ObjectInfo
+from xetra.transformers.config import PipelineConfig, PlannerConfig
+
+
+class ExecutionPlan(NamedTuple):
+    """
+    Class for the execution plan of a job.
+
+    dates: the planned source dates
+    objects: number of source objects, i.e. GET requests
+    total_bytes: size of all the source objects
+    estimated_rows: estimated number of source rows
+    max_date_bytes: size of the source objects of the largest date
+    max_object_bytes: size of the largest source object
+    peak_memory: estimated peak memory in bytes per execution mode
+    memory_limit: memory available to the job in bytes
+    mode: the chosen execution mode, one of xetra.common.constants.ExecutionModes values
+    listing: the listed source objects per date, to be reused by the extraction (XetraETL.use_listing)
+    """
+    dates: List[str]
+    objects: int
+    total_bytes: int
+    estimated_rows: int
+    max_date_bytes: int
+    max_object_bytes: int
+    peak_memory: Dict[str, int]
+    memory_limit: int
+    mode: str
+    listing: Dict[str, List[S3ObjectInfo]]
+
+    def format(self) -> str:
+        """
+        Format the plan as a human readable text.
+        """
+        mb = 1024 ** 2
+        dates = f'{self.dates[0]} .. {self.dates[-1]}' if self.dates else '-'
+        lines = [
+            f'Dates:            {len(self.dates)} ({dates})',
+            f'Requests:         {len(self.dates)} LIST, {self.objects} GET',
+            f'Source data:      {self.total_bytes / mb:.1f} MB, ~{self.estimated_rows} rows',
+            f'Largest date:     {self.max_date_bytes / mb:.1f} MB',
+            f'Largest object:   {self.max_object_bytes / mb:.1f} MB',
+            f'Memory limit:     {self.memory_limit / mb:.0f} MB',
+            'Peak memory:'
+        ]
+        for mode, peak in self.peak_memory.items():
+            marker = ' <- chosen' if mode == self.mode else ''
+            lines.append(f'  {mode:<15} {peak / mb:.1f} MB{marker}')
+        if self.peak_memory[self.mode] > self.memory_limit:
+            lines.append('Warning: even the chosen mode is expected to exceed the memory limit.')
+        return '\n'.join(lines)
+
+
+def physical_memory() -> Optional[int]:
+    """
+    Return the physical memory of the host in bytes, or None if it cannot be determined.
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class ExecutionPlanner:
+    """
+    Lists the source objects of the planned dates, estimates the number of rows and the peak memory of every execution
+    mode, and chooses the fastest mode which fits into the memory limit:
+
+    in_memory: all the source data is parsed before it is transformed
+    pipelined: the source objects are downloaded, parsed and aggregated concurrently, only the objects in the queues
+        and in the workers of the pipeline are held in memory
+    streaming: every date is aggregated right after it is parsed, so only the largest date has to fit
+    out_of_core: every source object is aggregated right after it is parsed, so only the largest object has to fit
+    """
+
+    def __init__(
+            self,
+            s3_bucket_src: S3BucketConnector,
+            config: PlannerConfig = PlannerConfig(),
+            pipeline_config: PipelineConfig = PipelineConfig()
+    ):
+        """
+        Constructor for ExecutionPlanner
+
+        :param s3_bucket_src: connection to the source S3 bucket
+        :param config: NamedTuple class with planner configuration data
+        :param pipeline_config: NamedTuple class with the configuration of the pipelined mode
+        """
+        self._logger = logging.getLogger(__name__)
+        self.s3_bucket_src = s3_bucket_src
+        self.config = config
+        self.pipeline_config = pipeline_config
+
+    @property
+    def memory_limit(self) -> int:
+        """
+        Memory available to the job in bytes.
+        """
+        if self.config.memory_limit_mb is not None:
+            return int(self.config.memory_limit_mb * 1024 ** 2)
+        memory = physical_memory()
+        return memory // 2 if memory is not None else 4 * 1024 ** 3
+
+    def _peak_memory(self, source_bytes: int) -> int:
+        rows = source_bytes / self.config.csv_bytes_per_row
+        return int(rows * self.config.memory_bytes_per_row * self.config.memory_factor)
+
+    def plan(self, dates: List[str]) -> ExecutionPlan:
+        """
+        Plan the execution of the job for the given source dates.
+
+        :param dates: source dates to be extracted, e.g. XetraETL.extract_date_list
+        :return: the execution plan
+        """
+        listing = {date: self.s3_bucket_src.list_objects_in_prefix(prefix=date) for date in dates}
+        date_bytes, object_bytes = [], []
+        for objects in listing.values():
+            sizes = [obj.size for obj in objects]
+            date_bytes.append(sum(sizes))
+            object_bytes.extend(sizes)
+
+        total_bytes = sum(date_bytes)
+        max_object = max(object_bytes, default=0)
+        # Raw bodies wait in the queue and in the downloaders, parsed objects are held by the parsers only
+        pipelined = (
+            (self.pipeline_config.queue_size + self.pipeline_config.download_workers) * max_object
+            + self.pipeline_config.parse_workers * self._peak_memory(max_object)
+        )
+        peak_memory = {
+            ExecutionModes.IN_MEMORY.value: self._peak_memory(total_bytes),
+            ExecutionModes.PIPELINED.value: pipelined,
+            ExecutionModes.STREAMING.value: self._peak_memory(max(date_bytes, default=0)),
+            ExecutionModes.OUT_OF_CORE.value: self._peak_memory(max_object)
+        }
+        memory_limit = self.memory_limit
+        mode = next(
+            (mode for mode, peak in peak_memory.items() if peak <= memory_limit), ExecutionModes.OUT_OF_CORE.value
+        )
+        plan = ExecutionPlan(
+            dates=list(dates),
+            objects=len(object_bytes),
+            total_bytes=total_bytes,
+            estimated_rows=int(total_bytes / self.config.csv_bytes_per_row),
+            max_date_bytes=max(date_bytes, default=0),
+            max_object_bytes=max_object,
+            peak_memory=peak_memory,
+            memory_limit=memory_limit,
+            mode=mode,
+            listing=listing
+        )
+        self._logger.info(
+            f'Planned {plan.objects} objects ({total_bytes} bytes) of {len(dates)} dates, the execution mode is {mode}'
+        )
+        return plan
@@ -0,0 +1,264 @@
+"""
+Rolling-window analytics of the daily closing prices, maintained incrementally between runs.
+"""
+
+from io import BytesIO
+import logging
+import os
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from xetra.common.custom_exceptions import RollingStateConflictException, WrongRollingStateException
+from xetra.common.lease import S3Lease
+from xetra.common.s3 import S3BucketConnector
+
+
+class RollingWindowReport:
+    """
+    Class for a report of the moving averages and the rolling standard deviations of the closing prices per ISIN.
+
+    Instead of re-reading the history, the state holds per ISIN a ring buffer of its last closing prices (as many as
+    the longest window), the number of closing prices seen so far and the date of the last one. A run pushes the
+    closing prices of the new dates into the buffers and computes the windows from the buffers only, so its cost grows
+    with the number of new dates, not with the history. The windows are computed over the last N closing prices of an
+    ISIN, i.e. over the trading days the ISIN was traded on, and they are empty until N closing prices are available.
+
+    The state is stored as a single npz object. It is written under a lease (<state_key without extension>.lock) and
+    only if it has not been replaced since it was read, so two concurrent runs cannot lose each other's updates: the
+    run saving second finds the state replaced, and `commit` reads it again and pushes its closing prices into it once
+    more before writing it. Closing prices are pushed in the order of the dates: a date which is not newer than the
+    last date of an ISIN is skipped, so re-running a date does not change the state, and late corrections of already
+    pushed dates are not reflected.
+    """
+
+    def __init__(
+            self,
+            s3_bucket: S3BucketConnector,
+            state_key: str,
+            key: str,
+            windows: Sequence[int] = (20, 50, 200),
+            col_isin: str = 'ISIN',
+            col_date: str = 'Date',
+            col_closing_price: str = 'closing_price_eur',
+            lease_ttl_seconds: float = 60,
+            max_retries: int = 10,
+            retry_seconds: float = 0.5
+    ):
+        """
+        Constructor for RollingWindowReport
+
+        :param s3_bucket: connection to the S3 bucket storing the state
+        :param state_key: key of the state object
+        :param key: key prefix of the written reports
+        :param windows: lengths of the windows in trading days
+        :param col_isin: column of the ISINs in the daily aggregates
+        :param col_date: column of the dates in the daily aggregates
+        :param col_closing_price: column of the closing prices in the daily aggregates
+        :param lease_ttl_seconds: expiry of the lease writing the state
+        :param max_retries: number of attempts to acquire the lease
+        :param retry_seconds: time to wait between two attempts
+        """
+        self._logger = logging.getLogger(__name__)
+        self.s3_bucket = s3_bucket
+        self.state_key = state_key
+        self.key = key
+        self.windows = sorted(windows)
+        self.col_isin = col_isin
+        self.col_date = col_date
+        self.col_closing_price = col_closing_price
+        self.lock_key = f'{os.path.splitext(state_key)[0]}.lock'
+        self.lease_ttl_seconds = lease_ttl_seconds
+        self.max_retries = max_retries
+        self.retry_seconds = retry_seconds
+        self.capacity = self.windows[-1]
+        self._etag: Optional[str] = None
+        self._isins = np.array([], dtype=str)
+        self._closes = np.zeros((0, self.capacity))
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._last_dates = np.array([], dtype='datetime64[D]')
+        self._loaded = False
+        # Closing prices pushed since the state was saved, pushed again by commit into a concurrently replaced state
+        self._pushed = pd.DataFrame(columns=[col_isin, col_date, col_closing_price])
+
+    def __repr__(self):
+        return f"RollingWindowReport(state_key='{self.state_key}', windows={self.windows}, isins={len(self._isins)})"
+
+    def load(self):
+        """
+        Read the state from the bucket. Without a state object, the buffers are empty. The closing prices pushed
+        before are dropped.
+
+        :raises
+        WrongRollingStateException, if the buffers of the state are shorter than the longest window
+        """
+        self._etag = self.s3_bucket.get_etag(self.state_key)
+        self._loaded = True
+        self.capacity = self.windows[-1]
+        self._isins = np.array([], dtype=str)
+        self._closes = np.zeros((0, self.capacity))
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._last_dates = np.array([], dtype='datetime64[D]')
+        self._pushed = self._pushed.iloc[:0]
+        if self._etag is None:
+            return
+        with np.load(BytesIO(self.s3_bucket.read_object(self.state_key, cached=True)), allow_pickle=False) as state:
+            closes = state['closes']
+            if closes.shape[1] < self.capacity:
+                raise WrongRollingStateException(
+                    f'The state {self.state_key} holds {closes.shape[1]} closing prices per ISIN, '
+                    f'the window of {self.capacity} days needs a new state'
+                )
+            # A longer buffer is kept, the longest window uses only a part of it
+            self.capacity = closes.shape[1]
+            self._isins = state['isins']
+            self._closes = closes
+            self._counts = state['counts']
+            self._last_dates = state['last_dates']
+
+    def save(self) -> bool:
+        """
+        Write the state to the bucket under the lease, if it has not been replaced since it was read.
+
+        :return: True if the state is written, False if it was replaced concurrently or the lease is held by another
+            run for all the attempts
+        """
+        lease = S3Lease(self.s3_bucket, self.lock_key, ttl_seconds=self.lease_ttl_seconds)
+        for _ in range(self.max_retries):
+            if lease.acquire():
+                break
+            time.sleep(self.retry_seconds)
+        else:
+            self._logger.warning(f'The lease {self.lock_key} could not be acquired, the state is not written.')
+            return False
+        try:
+            # Under the lease no other run can replace the state between the check and the write
+            if self.s3_bucket.get_etag(self.state_key) != self._etag:
+                self._logger.warning(f'The state {self.state_key} was replaced by another run, it is not written.')
+                return False
+            body = BytesIO()
+            np.savez_compressed(
+                body, isins=self._isins, closes=self._closes, counts=self._counts, last_dates=self._last_dates
+            )
+            self._etag = self.s3_bucket.write_object(self.state_key, body.getvalue())
+        finally:
+            lease.release()
+        self._pushed = self._pushed.iloc[:0]
+        self._logger.info(f'The state {self.state_key} of {len(self._isins)} ISINs is written.')
+        return True
+
+    def commit(self, df: pd.DataFrame, max_attempts: int = 3) -> pd.DataFrame:
+        """
+        Write the state like `save`. If the state was replaced by another run (or the lease was held), the state is
+        read again, the closing prices pushed since the last save are pushed into it once more and it is written again.
+
+        :param df: pandas DataFrame returned by the updates since the state was read or saved
+        :param max_attempts: maximal number of attempts to write the state
+        :returns:
+            df: the given df if the state is written at the first attempt, otherwise the windows recomputed on the
+                state of the other run
+
+        :raises
+        RollingStateConflictException, if the state is not written in `max_attempts` attempts, or if the other run
+            pushed the same or newer dates of some ISINs, so their closing prices cannot be pushed in the order of the
+            dates anymore
+        """
+        for _ in range(max_attempts):
+            if self.save():
+                return df
+            pushed = self._pushed
+            self.load()
+            df = self.update(pushed)
+            if len(df) < len(pushed):
+                raise RollingStateConflictException(
+                    f'{len(pushed) - len(df)} closing prices cannot be pushed into the state {self.state_key}, '
+                    f'another run has pushed the same or newer dates of their ISINs'
+                )
+        raise RollingStateConflictException(f'The state {self.state_key} is not written in {max_attempts} attempts')
+
+    def _positions(self, isins: np.ndarray) -> np.ndarray:
+        """
+        Return the positions of ISINs in the state, ISINs missing in the state are added with empty buffers.
+        """
+        positions = pd.Index(self._isins).get_indexer(isins)
+        new = np.unique(isins[positions < 0])
+        if len(new):
+            self._isins = np.concatenate([self._isins, new])
+            self._closes = np.vstack([self._closes, np.full((len(new), self.capacity), np.nan)])
+            self._counts = np.concatenate([self._counts, np.zeros(len(new), dtype=np.int64)])
+            self._last_dates = np.concatenate([
+                self._last_dates, np.full(len(new), np.datetime64('NaT'), dtype='datetime64[D]')
+            ])
+            positions = pd.Index(self._isins).get_indexer(isins)
+        return positions
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Push the closing prices of new dates into the buffers and compute the windows of these dates.
+
+        :param df: pandas DataFrame with the daily aggregates (one row per ISIN and date), see
+            `XetraETL.transform_report1`
+        :returns:
+            df: pandas DataFrame with the ISIN, the date, the closing price and per window the moving average
+                (`ma_<N>`) and the rolling standard deviation (`std_<N>`), rounded to 2 decimals
+        """
+        if not self._loaded:
+            self.load()
+        columns = [self.col_isin, self.col_date, self.col_closing_price] + [
+            f'{stat}_{window}' for window in self.windows for stat in ('ma', 'std')
+        ]
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+
+        dates = df[self.col_date].to_numpy(dtype='datetime64[D]')
+        isins = df[self.col_isin].to_numpy().astype(str)
+        closes = df[self.col_closing_price].to_numpy(dtype=np.float64)
+        positions = self._positions(isins)
+        results = []
+        for date in np.unique(dates):
+            rows = np.flatnonzero(dates == date)
+            # Dates already pushed (e.g. a re-run) are skipped, NaT of a new ISIN compares as False
+            skipped = self._last_dates[positions[rows]] >= date
+            if skipped.any():
+                self._logger.warning(f'{skipped.sum()} closing prices of {date} are already in the rolling windows.')
+            rows = rows[~skipped]
+            if not len(rows):
+                continue
+            pos = positions[rows]
+            self._pushed = pd.concat([
+                self._pushed,
+                pd.DataFrame({
+                    self.col_isin: isins[rows],
+                    self.col_date: np.datetime_as_string(dates[rows], unit='D'),
+                    self.col_closing_price: closes[rows]
+                })
+            ], ignore_index=True)
+            self._closes[pos, self._counts[pos] % self.capacity] = closes[rows]
+            self._counts[pos] += 1
+            self._last_dates[pos] = date
+
+            result = {
+                self.col_isin: isins[rows],
+                self.col_date: np.datetime_as_string(dates[rows], unit='D'),
+                self.col_closing_price: closes[rows]
+            }
+            # The last closing prices of every ISIN, the newest first
+            lags = (self._counts[pos, None] - 1 - np.arange(self.capacity)) % self.capacity
+            values = self._closes[pos[:, None], lags]
+            for window in self.windows:
+                full = self._counts[pos] >= window
+                result[f'ma_{window}'] = np.where(full, values[:, :window].mean(axis=1), np.nan)
+                result[f'std_{window}'] = np.where(
+                    full, values[:, :window].std(axis=1, ddof=1) if window > 1 else np.nan, np.nan
+                )
+            results.append(pd.DataFrame(result))
+        if not results:
+            return pd.DataFrame(columns=columns)
+        return (
+            pd.concat(results, ignore_index=True)
+            .sort_values(by=[self.col_isin, self.col_date])
+            .round(decimals=2)
+            .reset_index(drop=True)
+        )
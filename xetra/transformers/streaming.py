@@ -0,0 +1,289 @@
+"""
+Continuous micro-batch processing of the Xetra source files as they land.
+"""
+
+from datetime import datetime
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+import uuid
+
+from botocore.exceptions import ClientError
+import pandas as pd
+
+from xetra.common.constants import MetaProcessFormat, S3FileTypes
+from xetra.common.meta_process import MetaProcess
+from xetra.common.s3 import S3BucketConnector, S3ObjectInfo
+from xetra.common.trading_calendar import TradingCalendar
+from xetra.transformers.config import XetraSourceConfig, XetraStreamConfig, XetraTargetConfig
+from xetra.transformers.ohlcv import FIRST_TIME_COL, LAST_TIME_COL, aggregate_ohlcv, combine_ohlcv
+
+
+class XetraStreamingETL:
+    """
+    Polls the source prefix of the current trading day for new objects and folds them into a running per-ISIN
+    open/high/low/close/volume state. An up-to-date intraday report is flushed periodically, and when the day is over
+    the final daily report is written and the date is recorded in the meta files, exactly as by the batch job.
+
+    The state (the date, the folded objects, the running aggregates and the previous closing prices) is snapshotted in
+    the target bucket after every change, so a restarted process continues where the previous one stopped. Every
+    snapshot writes the aggregates under a new key first and then state.json naming that key, so state.json is the
+    commit point and a crash in between leaves the previous snapshot consistent.
+    """
+
+    _prev_closing = 'prev_closing'
+
+    def __init__(
+            self,
+            s3_bucket_src: S3BucketConnector,
+            s3_bucket_trg: S3BucketConnector,
+            meta_key: str,
+            src_args: XetraSourceConfig,
+            trg_args: XetraTargetConfig,
+            stream_args: XetraStreamConfig = XetraStreamConfig(),
+            calendar: TradingCalendar = None
+    ):
+        """
+        Constructor for XetraStreamingETL
+
+        :param s3_bucket_src: connection to a source S3 bucket
+        :param s3_bucket_trg: connection to a target S3 bucket
+        :param meta_key: key of the meta file, the finished dates are recorded in it
+        :param src_args: NamedTuple class with source configuration data
+        :param trg_args: NamedTuple class with target configuration data
+        :param stream_args: NamedTuple class with streaming configuration data
+        :param calendar: trading calendar, by default every calendar day is a trading day
+        """
+        self._logger = logging.getLogger(__name__)
+        self.s3_bucket_src = s3_bucket_src
+        self.s3_bucket_trg = s3_bucket_trg
+        self.meta_key = meta_key
+        self.src_args = src_args
+        self.trg_args = trg_args
+        self.stream_args = stream_args
+        self.calendar = calendar if calendar is not None else TradingCalendar.every_day()
+        self.state_key = f'{stream_args.state_prefix}state.json'
+        self.aggregates_prefix = f'{stream_args.state_prefix}aggregates/'
+
+        # Running state of the current date
+        self.date: Optional[str] = None
+        self.objects: Dict[str, S3ObjectInfo] = {}
+        self.aggregates = self._empty_aggregates()
+        # Closing price of every ISIN on its last traded date before the current date
+        self.prev_closing = pd.Series(dtype='float64', name=self._prev_closing)
+        # Key of the aggregates named by the last snapshot
+        self._aggregates_key: Optional[str] = None
+        self._last_flush = 0.0
+        self._dirty = False
+
+    def _empty_aggregates(self) -> pd.DataFrame:
+        return pd.DataFrame(columns=[
+            self.src_args.col_isin, FIRST_TIME_COL, self.trg_args.col_opening_price, LAST_TIME_COL,
+            self.trg_args.col_closing_price, self.trg_args.col_min_price, self.trg_args.col_max_price,
+            self.trg_args.col_daily_traded_volume
+        ])
+
+    def _today(self) -> str:
+        return datetime.today().strftime(MetaProcessFormat.META_DATE_FORMAT.value)
+
+    def start(self, today: str = None):
+        """
+        Restore the state from its snapshot, or start a new state with the current (or next) trading day. A new state
+        takes the previous closing prices from the source data of the previous trading day.
+
+        :param today: current date, by default the system date
+        """
+        if self.load_state():
+            self._logger.info(f'Streaming state of {self.date} with {len(self.objects)} objects is restored.')
+            return
+        today = today or self._today()
+        self.date = str(today if self.calendar.is_trading_day(today) else self.calendar.next_trading_day(today))
+        prev_date = str(self.calendar.previous_trading_day(self.date))
+        df_prev = self._read_objects(self.s3_bucket_src.list_objects_in_prefix(prefix=prev_date))
+        if not df_prev.empty:
+            df_prev = aggregate_ohlcv(
+                df_prev[df_prev[self.src_args.col_date] == prev_date], [self.src_args.col_isin], self.src_args,
+                self.trg_args
+            )
+            self.prev_closing = df_prev.set_index(self.src_args.col_isin)[self.trg_args.col_closing_price].rename(
+                self._prev_closing
+            )
+        self._logger.info(f'Streaming has started with {self.date}.')
+
+    def _read_objects(self, objects: List[S3ObjectInfo]) -> pd.DataFrame:
+        if not objects:
+            return pd.DataFrame()
+        return pd.concat([self.s3_bucket_src.read_csv_to_df(obj.key) for obj in objects], ignore_index=True)
+
+    def fold(self, df: pd.DataFrame):
+        """
+        Fold a micro-batch of source data into the running state. Rows of other dates than the current one are ignored.
+
+        :param df: pandas DataFrame with source data
+        """
+        df = df[df[self.src_args.col_date] == self.date]
+        if df.empty:
+            return
+        df_batch = aggregate_ohlcv(df, [self.src_args.col_isin], self.src_args, self.trg_args)
+        if self.aggregates.empty:
+            self.aggregates = df_batch
+        else:
+            self.aggregates = combine_ohlcv(
+                pd.concat([self.aggregates, df_batch], ignore_index=True), [self.src_args.col_isin], self.trg_args
+            )
+        self._dirty = True
+
+    def poll(self) -> int:
+        """
+        List the source prefix of the current date and fold the objects which are new or changed since the last poll.
+
+        :return: number of folded objects
+        """
+        objects = [
+            obj for obj in self.s3_bucket_src.list_objects_in_prefix(prefix=self.date)
+            if obj.key not in self.objects or self.objects[obj.key].etag != obj.etag
+        ]
+        if not objects:
+            return 0
+        if any(obj.key in self.objects for obj in objects):
+            # A changed object cannot be subtracted from the running state, so the whole date is folded again
+            self._logger.info(f'Source objects of {self.date} have changed. The date is folded again.')
+            self.aggregates = self._empty_aggregates()
+            objects = self.s3_bucket_src.list_objects_in_prefix(prefix=self.date)
+            self.objects = {}
+        self.fold(self._read_objects(objects))
+        self.objects.update({obj.key: obj for obj in objects})
+        self._dirty = True
+        self._logger.info(f'Folded {len(objects)} new source objects of {self.date}.')
+        return len(objects)
+
+    def report(self) -> pd.DataFrame:
+        """
+        Build report 1 of the current date from the running state.
+
+        :returns:
+            df: pandas DataFrame in the format of report 1
+        """
+        df = self.aggregates.drop(columns=[FIRST_TIME_COL, LAST_TIME_COL])
+        df.insert(1, self.src_args.col_date, self.date)
+        prev_closing = df[self.src_args.col_isin].map(self.prev_closing)
+        df[self.trg_args.col_change] = (df[self.trg_args.col_closing_price] - prev_closing) / prev_closing * 100
+        return df.sort_values(by=self.src_args.col_isin).reset_index(drop=True).round(decimals=2)
+
+    def flush_intraday(self):
+        """
+        Write the intraday report of the current date. Every flush overwrites the report of the date.
+        """
+        key = f'{self.stream_args.intraday_key}{self.date}.{self.trg_args.format}'
+        self.s3_bucket_trg.write_df_to_s3(df=self.report(), key=key, file_format=self.trg_args.format)
+        self._last_flush = time.time()
+        self._logger.info(f'Intraday report of {self.date} is written.')
+
+    def finalize_day(self):
+        """
+        Write the final report of the current date, record the date in the meta files and move the state to the next
+        trading day. The date is appended to the report key, as several dates can be finished at once after a restart.
+        """
+        if not self.aggregates.empty:
+            key = (
+                f'{self.trg_args.key}'
+                f'{datetime.today().strftime(self.trg_args.key_date_format)}_{self.date}.'
+                f'{self.trg_args.format}'
+            )
+            self.s3_bucket_trg.write_df_to_s3(df=self.report(), key=key, file_format=self.trg_args.format)
+            self.prev_closing = self.aggregates.set_index(self.src_args.col_isin)[
+                self.trg_args.col_closing_price
+            ].rename(self._prev_closing).combine_first(self.prev_closing)
+        MetaProcess.update_meta_file(self.s3_bucket_trg, self.meta_key, [self.date])
+        if self.objects:
+            MetaProcess.update_object_meta_file(
+                self.s3_bucket_trg, self.meta_key, {self.date: list(self.objects.values())}
+            )
+        self._logger.info(f'Final report of {self.date} is written.')
+
+        self.date = str(self.calendar.next_trading_day(self.date))
+        self.objects = {}
+        self.aggregates = self._empty_aggregates()
+        self._dirty = True
+
+    def step(self, today: str = None):
+        """
+        Do a single iteration: finish the dates which are over, fold the new objects of the current date, flush the
+        intraday report if it is due and snapshot the state if it has changed.
+
+        :param today: current date, by default the system date
+        """
+        today = today or self._today()
+        while self.date < today:
+            self.poll()
+            self.finalize_day()
+        if self.date == today:
+            folded = self.poll()
+            if folded and time.time() - self._last_flush >= self.stream_args.flush_seconds:
+                self.flush_intraday()
+        if self._dirty:
+            self.save_state()
+
+    def run(self, iterations: int = None):
+        """
+        Run the micro-batch loop.
+
+        :param iterations: number of iterations, by default the loop runs until the process is stopped
+        """
+        self.start()
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            self.step()
+            iteration += 1
+            if iterations is None or iteration < iterations:
+                time.sleep(self.stream_args.poll_seconds)
+
+    def save_state(self):
+        """
+        Snapshot the running state in the target bucket. The aggregates are written under a new key before state.json
+        names it, and the aggregates of the previous snapshot are deleted afterwards.
+        """
+        aggregates_key = None
+        if not self.aggregates.empty:
+            aggregates_key = (
+                f'{self.aggregates_prefix}{datetime.now().strftime("%Y%m%d%H%M%S%f")}_{uuid.uuid4().hex[:8]}.'
+                f'{S3FileTypes.PARQUET.value}'
+            )
+            self.s3_bucket_trg.write_df_to_s3(self.aggregates, aggregates_key, S3FileTypes.PARQUET.value)
+        state = {
+            'date': self.date,
+            'objects': [[obj.key, obj.etag, str(obj.last_modified), obj.size] for obj in self.objects.values()],
+            'prev_closing': self.prev_closing.to_dict(),
+            'aggregates_key': aggregates_key
+        }
+        self.s3_bucket_trg.write_object(self.state_key, json.dumps(state).encode('utf-8'))
+        if self._aggregates_key is not None:
+            self.s3_bucket_trg.delete_files([self._aggregates_key])
+        self._aggregates_key = aggregates_key
+        self._dirty = False
+
+    def load_state(self) -> bool:
+        """
+        Restore the running state from its snapshot.
+
+        :return: True if the snapshot exists, False otherwise
+        """
+        try:
+            state = json.loads(self.s3_bucket_trg.read_object(self.state_key))
+        except ClientError as error:
+            if error.response['ResponseMetadata']['HTTPStatusCode'] == 404:
+                return False
+            raise
+        self.date = state['date']
+        self.objects = {
+            key: S3ObjectInfo(key=key, etag=etag, last_modified=datetime.fromisoformat(last_modified), size=size)
+            for key, etag, last_modified, size in state['objects']
+        }
+        self.prev_closing = pd.Series(state['prev_closing'], dtype='float64', name=self._prev_closing)
+        self._aggregates_key = state['aggregates_key']
+        self.aggregates = (
+            self.s3_bucket_trg.read_parquet_to_df(self._aggregates_key) if self._aggregates_key is not None
+            else self._empty_aggregates()
+        )
+        return True
@@ -2,70 +2,26 @@
 Xetra ETL Component.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
-from typing import NamedTuple
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
-from xetra.common.s3 import S3BucketConnector
+from xetra.common.checkpoint import CheckpointStore
+from xetra.common.constants import CheckpointKinds, ExecutionModes
+from xetra.common.isin_dictionary import IsinDictionary
+from xetra.common.metrics import MetricsRegistry
+from xetra.common.profiling import MemoryProfiler
+from xetra.common.s3 import S3BucketConnector, S3ObjectInfo
 from xetra.common.meta_process import MetaProcess
-
-
-class XetraSourceConfig(NamedTuple):
-    """
-    Class for source configuration data.
-
-    src_first_extract_date: determines the date for extracting the source
-    src_columns: source column names
-    src_col_date: column name for date in source
-    src_col_isin: column name for ISIN in source
-    src_col_time: column name for time in source
-    src_col_start_price: column name for starting price in source
-    src_col_end_price: column name for ending price in source
-    src_col_min_price: column name for minimum price in source
-    src_col_max_price: column name for maximum price in source
-    src_col_traded_vol: column name for traded volume in source
-    """
-    first_extract_date: str
-    columns: list
-    col_date: str
-    col_isin: str
-    col_time: str
-    col_start_price: str
-    col_end_price: str
-    col_min_price: str
-    col_max_price: str
-    col_traded_vol: str
-
-
-class XetraTargetConfig(NamedTuple):
-    """
-    Class for target configuration data.
-
-    col_isin: column name for ISIN in target
-    col_date:  column name for ISIN in target
-    col_opening_price:  column name for opening price in target
-    col_closing_price:  column name for closing price in target
-    col_min_price:  column name for minimum price in target
-    col_max_price:  column name for maximum price in target
-    col_daily_traded_volume:  column name for daily traded volume in target
-    col_change:  column name for change to previous day's closing price in target
-    key: basic key of target file
-    key_date_format: date format of target file key
-    format: file format of the target file
-    """
-    col_isin: str
-    col_date: str
-    col_opening_price: str
-    col_closing_price: str
-    col_min_price: str
-    col_max_price: str
-    col_daily_traded_volume: str
-    col_change: str
-    key: str
-    key_date_format: str
-    format: str
+from xetra.common.trading_calendar import TradingCalendar
+from xetra.transformers.config import IntradayConfig, PipelineConfig, XetraSourceConfig, XetraTargetConfig
+from xetra.transformers.ohlcv import FIRST_TIME_COL, LAST_TIME_COL, aggregate_intraday, aggregate_ohlcv, combine_ohlcv
+from xetra.transformers.pipeline import ReportPipeline, StageStats
+from xetra.transformers.rolling import RollingWindowReport
 
 
 class XetraETL:
@@ -79,7 +35,21 @@ class XetraETL:
             s3_bucket_trg: S3BucketConnector,
             meta_key: str,
             src_args: XetraSourceConfig,
-            trg_args: XetraTargetConfig
+            trg_args: XetraTargetConfig,
+            checkpoint: CheckpointStore = None,
+            calendar: TradingCalendar = None,
+            late_lookback_days: int = 0,
+            date_range: Tuple[str, str] = None,
+            update_meta: bool = True,
+            report_key_suffix: str = '',
+            fetch_workers: int = 1,
+            pipeline_config: PipelineConfig = PipelineConfig(),
+            metrics: MetricsRegistry = None,
+            memory_profiler: MemoryProfiler = None,
+            isin_dictionary: IsinDictionary = None,
+            encode_output: bool = False,
+            rolling_report: RollingWindowReport = None,
+            intraday_config: IntradayConfig = IntradayConfig()
     ):
         """
         Constructor for XetraTransformer.
@@ -89,6 +59,34 @@ class XetraETL:
         :param meta_key: used as self.meta_key -> key of the meta file
         :param src_args: NamedTuple class with source configuration data
         :param trg_args: NamedTuple class with target configuration data
+        :param checkpoint: staging area for per-date shards. If given, parsed and aggregated data of every date is
+            checkpointed, so a retried run processes only the dates which are missing.
+        :param calendar: trading calendar. If given, only trading days are extracted and the change is computed to the
+            previous trading day. By default, every calendar day is extracted.
+        :param late_lookback_days: number of days back, in which already processed dates are checked for late or
+            corrected source objects. The affected (ISIN, date) aggregates are recomputed and written as a correction
+            report. 0 turns the check off.
+        :param date_range: first and last date (both inclusive) to be processed, regardless of the meta file. By
+            default, the dates which are not in the meta file are processed.
+        :param update_meta: whether load records the processed dates and objects in the meta files. A backfill
+            coordinator turns it off for its workers and records the dates of all the workers at once.
+        :param report_key_suffix: suffix appended to the key of the written report, e.g. to distinguish reports written
+            at the same time by several workers
+        :param fetch_workers: number of source objects fetched concurrently. The connection pool of the source
+            connector (`max_pool_connections`) should be at least as large.
+        :param pipeline_config: NamedTuple class with the configuration of the pipelined execution mode
+        :param metrics: registry of the metrics of the aggregate and transform stages. By default, the registry of the
+            source connector, which holds the metrics of the S3 stages.
+        :param memory_profiler: profiler recording the memory at the stage boundaries of `etl_report1`, to be started
+            before it runs. By default, the memory is not profiled.
+        :param isin_dictionary: dictionary of the ISIN codes. If given, the ISINs are replaced by int32 codes right
+            after reading, so the data is grouped, sorted and joined on the codes, and decoded before writing.
+        :param encode_output: whether the reports are written with the codes, together with the dictionary as a side
+            file. It needs `isin_dictionary`.
+        :param rolling_report: report of the moving averages and rolling standard deviations of the closing prices,
+            updated from the daily aggregates of every run. By default, it is not written.
+        :param intraday_config: NamedTuple class with the configuration of the intraday report, which is computed from
+            the same extracted source data as report 1. By default, it is not written.
         """
         self._logger = logging.getLogger(__name__)
         self.s3_bucket_src = s3_bucket_src
@@ -96,16 +94,70 @@ class XetraETL:
         self.meta_key = meta_key
         self.src_args = src_args
         self.trg_args = trg_args
-        self.extract_date, self.extract_date_list = MetaProcess.return_date_list(
-            s3_bucket_meta=self.s3_bucket_trg,
-            first_date=self.src_args.first_extract_date,
-            meta_key=self.meta_key
-        )
+        self.checkpoint = checkpoint
+        self.calendar = calendar if calendar is not None else TradingCalendar.every_day()
+        self.late_lookback_days = late_lookback_days
+        # Fingerprints of the source objects of every extracted date, used as the checkpoint keys
+        self._fingerprints = {}
+        # Checkpointed aggregates of the extracted dates whose source data is not loaded, see _extract_date
+        self._aggregated: Dict[str, pd.DataFrame] = {}
+        # Source objects of every extracted date, recorded in the object meta file by load
+        self._objects: Dict[str, List[S3ObjectInfo]] = {}
+        # Source objects of the dates listed in advance, see use_listing
+        self._listing: Dict[str, List[S3ObjectInfo]] = {}
+        self.update_meta = update_meta
+        self.report_key_suffix = report_key_suffix
+        self.fetch_workers = fetch_workers
+        self.pipeline_config = pipeline_config
+        self.metrics = metrics if metrics is not None else s3_bucket_src.metrics
+        self.memory_profiler = memory_profiler
+        self.isin_dictionary = isin_dictionary
+        self.encode_output = encode_output and isin_dictionary is not None
+        self.rolling_report = rolling_report
+        self.intraday_config = intraday_config
+        # Intraday reports of the dates extracted by extract_aggregated
+        self._intraday: List[pd.DataFrame] = []
+        # Statistics of the stages of the last pipelined extraction
+        self.pipeline_stats: List[StageStats] = []
+        if date_range is None:
+            self.extract_date, self.extract_date_list = MetaProcess.return_date_list(
+                s3_bucket_meta=self.s3_bucket_trg,
+                first_date=self.src_args.first_extract_date,
+                meta_key=self.meta_key,
+                calendar=self.calendar
+            )
+        else:
+            # The previous trading day of the range is extracted as well, for the change of the first date
+            start, end = date_range
+            self.extract_date = start
+            self.extract_date_list = np.datetime_as_string(
+                self.calendar.trading_days(self.calendar.previous_trading_day(start), end), unit='D'
+            ).tolist()
         self.meta_update_list = [
             date for date in self.extract_date_list
             if date >= self.extract_date
         ]
 
+    @property
+    def processed_objects(self) -> Dict[str, List[S3ObjectInfo]]:
+        """
+        Source objects read by this instance, per source date.
+        """
+        return self._objects
+
+    def use_listing(self, listing: Dict[str, List[S3ObjectInfo]]):
+        """
+        Reuse the source objects listed in advance, e.g. by the execution planner, so the next extraction does not list
+        the dates again. Every listed date is used once, a later extraction lists it again.
+
+        :param listing: source objects per source date
+        """
+        self._listing.update(listing)
+
+    def _list_date(self, date: str) -> List[S3ObjectInfo]:
+        objects = self._listing.pop(date, None)
+        return objects if objects is not None else self.s3_bucket_src.list_objects_in_prefix(prefix=date)
+
     def extract(self):
         """
         Read the source data and concatenate it to pandas DataFrame.
@@ -114,79 +166,312 @@ class XetraETL:
             df: pandas DataFrame with extracted data.
         """
         self._logger.info('Extracting Xetra source files has started...')
-        files = [
-            key
-            for date in self.extract_date_list
-            for key in self.s3_bucket_src.list_files_in_prefix(prefix=date)
-        ]
-        if not files:
+        dfs = []
+        for date in self.extract_date_list:
+            objects = self._list_date(date)
+            if objects:
+                df_date = self._extract_date(date, objects)
+                if df_date is not None:
+                    dfs.append(df_date)
+                self._objects[date] = objects
+        if not dfs:
             df = pd.DataFrame()
         else:
-            df = pd.concat([self.s3_bucket_src.read_csv_to_df(file_) for file_ in files], ignore_index=True)
+            df = pd.concat(dfs, ignore_index=True)
         self._logger.info('Extracting Xetra source files has finished.')
         return df
 
-    def transform_report1(self, df: pd.DataFrame):
+    def extract_aggregated(self, per_object: bool = False) -> pd.DataFrame:
+        """
+        Read the source data date by date and aggregate every date right away, so the source data of only a single
+        date is held in memory at a time.
+
+        :param per_object: aggregate every source object separately and combine the partial aggregates of the date,
+            so only a single source object is held in memory at a time. Checkpoints are not used, and the intraday
+            report is not computed.
+        :returns:
+            df: pandas DataFrame with the daily aggregates, to be transformed with `transform_report1(df, True)`
+        """
+        self._logger.info('Extracting and aggregating Xetra source files date by date has started...')
+        keys = [self.src_args.col_isin, self.src_args.col_date]
+        dfs = []
+        # Only the intraday reports of this extraction are kept
+        self._intraday = []
+        for date in self.extract_date_list:
+            objects = self._list_date(date)
+            if not objects:
+                continue
+            if per_object:
+                df_partial = pd.concat(
+                    [self._aggregate_object(self._read_object(obj.key), keys) for obj in objects],
+                    ignore_index=True
+                )
+                df_date = combine_ohlcv(df_partial, keys, self.trg_args)
+                dfs.append(df_date.drop(columns=[FIRST_TIME_COL, LAST_TIME_COL]))
+            else:
+                df_date = self._extract_date(date, objects)
+                if df_date is None:
+                    dfs.append(self._aggregated.pop(date))
+                else:
+                    if self.intraday_config.key is not None:
+                        self._intraday.append(self.transform_intraday(df_date))
+                    dfs.append(self._aggregate_report1_daily(df_date))
+            self._objects[date] = objects
+        self._logger.info('Extracting and aggregating Xetra source files has finished.')
+        if not dfs:
+            return pd.DataFrame()
+        return (
+            pd.concat(dfs, ignore_index=True)
+            .sort_values(by=keys)
+            .reset_index(drop=True)
+        )
+
+    def extract_pipelined(self) -> pd.DataFrame:
+        """
+        Extract and aggregate the source data with a pipeline, which lists, downloads, parses and aggregates the
+        source objects concurrently. Checkpoints are not used.
+
+        :returns:
+            df: pandas DataFrame with the daily aggregates, to be transformed with `transform_report1(df, True)`
+        """
+        self._logger.info('Pipelined extraction of Xetra source files has started...')
+        pipeline = ReportPipeline(
+            self.s3_bucket_src, self.src_args, self.trg_args, self.pipeline_config, metrics=self.metrics,
+            isin_dictionary=self.isin_dictionary, listing=self._listing
+        )
+        self._listing = {}
+        df = pipeline.run(self.extract_date_list)
+        self._objects.update(pipeline.objects)
+        self.pipeline_stats = pipeline.stats
+        self._logger.info('Pipelined extraction of Xetra source files has finished.')
+        return df
+
+    def extract_late(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Find already processed dates of the last `late_lookback_days` days, whose source objects were added or changed
+        after processing, and read the data needed to recompute them.
+
+        For every such date the data of the date itself, of the previous trading day (for the change of the date) and
+        of the next trading day (whose change depends on the closing price of the date) is read.
+
+        :returns:
+            df: pandas DataFrame with the source data of the late dates and their neighbouring trading days
+            df_affected: pandas DataFrame with (ISIN, date) pairs whose aggregates are affected by the late objects
+        """
+        columns_affected = [self.src_args.col_isin, self.src_args.col_date]
+        if self.late_lookback_days <= 0:
+            return pd.DataFrame(), pd.DataFrame(columns=columns_affected)
+
+        self._logger.info('Checking processed dates for late source files has started...')
+        today = np.datetime64(datetime.today().date(), 'D')
+        window = [
+            date for date in
+            np.datetime_as_string(self.calendar.trading_days(today - self.late_lookback_days, today), unit='D')
+            if date not in self.meta_update_list
+        ]
+        listed = {date: self.s3_bucket_src.list_objects_in_prefix(prefix=date) for date in window}
+        changed = MetaProcess.return_changed_objects(self.s3_bucket_trg, self.meta_key, listed)
+        if not changed:
+            self._logger.info('No late source files found.')
+            return pd.DataFrame(), pd.DataFrame(columns=columns_affected)
+
+        late_dates = np.array(sorted(changed), dtype='datetime64[D]')
+        neighbours = np.concatenate([
+            self.calendar.previous_trading_day(late_dates),
+            self.calendar.next_trading_day(late_dates)
+        ])
+        read_dates = sorted(
+            set(changed) | {date for date in np.datetime_as_string(neighbours, unit='D') if date <= str(today)}
+        )
+
+        dfs, affected = [], []
+        for date in read_dates:
+            objects = listed.get(date) or self.s3_bucket_src.list_objects_in_prefix(prefix=date)
+            if not objects:
+                continue
+            changed_keys = {obj.key for obj in changed.get(date, [])}
+            for obj, df_obj in zip(objects, self._read_objects(objects)):
+                dfs.append(df_obj)
+                if obj.key in changed_keys:
+                    affected.append(df_obj[columns_affected])
+            self._objects[date] = objects
+        df = pd.concat(dfs, ignore_index=True)
+
+        # The ISINs of the late objects are affected on the late date, and on the next trading day through the change
+        df_affected = pd.concat(affected, ignore_index=True).drop_duplicates()
+        df_next = df_affected.copy()
+        df_next[self.src_args.col_date] = np.datetime_as_string(
+            self.calendar.next_trading_day(df_next[self.src_args.col_date].to_numpy(dtype='datetime64[D]')), unit='D'
+        )
+        df_affected = pd.concat([df_affected, df_next], ignore_index=True).drop_duplicates().reset_index(drop=True)
+        self._logger.info(f'Found late source files for the dates {sorted(changed)}.')
+        return df, df_affected
+
+    def _read_objects(self, objects: List[S3ObjectInfo]) -> List[pd.DataFrame]:
+        """
+        Read source objects, `fetch_workers` of them concurrently.
+
+        :param objects: list of the source objects
+        :returns:
+            dfs: list of pandas DataFrames in the order of the objects
+        """
+        if self.fetch_workers <= 1 or len(objects) <= 1:
+            return [self._read_object(obj.key) for obj in objects]
+        with ThreadPoolExecutor(max_workers=min(self.fetch_workers, len(objects))) as executor:
+            return list(executor.map(lambda obj: self._read_object(obj.key), objects))
+
+    def _read_object(self, key: str) -> pd.DataFrame:
+        """
+        Read a single source object, with the ISINs encoded if the ISIN dictionary is used.
+        """
+        return self._encode_isins(self.s3_bucket_src.read_csv_to_df(key))
+
+    def _encode_isins(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Replace the ISINs by their codes, if the ISIN dictionary is used. Already encoded data is kept.
+        """
+        if self.isin_dictionary is None:
+            return df
+        return self.isin_dictionary.encode_column(df, self.src_args.col_isin)
+
+    def _decode_isins(self, df: pd.DataFrame, by: List[str] = None) -> pd.DataFrame:
+        """
+        Replace the codes by their ISINs, if the ISIN dictionary is used, and restore the order by ISIN and date (or by
+        the columns `by`).
+        """
+        if self.isin_dictionary is None or df.empty:
+            return df
+        return (
+            self.isin_dictionary.decode_column(df, self.src_args.col_isin)
+            .sort_values(by=by or [self.src_args.col_isin, self.src_args.col_date])
+            .reset_index(drop=True)
+        )
+
+    def _extract_date(self, date: str, objects: List[S3ObjectInfo]) -> Optional[pd.DataFrame]:
+        """
+        Read the source objects of a single date, or take them from the checkpoint if it is available.
+
+        If the aggregates of the date are checkpointed and the source data is not needed for the intraday report, the
+        aggregates are kept for _aggregate_report1_daily and the source data is not loaded at all.
+
+        :param date: the source date
+        :param objects: list of the source objects of the date
+        :returns:
+            df: pandas DataFrame with the data of the date, None if the checkpointed aggregates are used instead
+        """
+        if self.checkpoint is None:
+            return pd.concat(self._read_objects(objects), ignore_index=True)
+
+        fingerprint = self.checkpoint.fingerprint(objects)
+        self._fingerprints[date] = fingerprint
+        if self.intraday_config.key is None:
+            df_aggregated = self.checkpoint.load(CheckpointKinds.AGGREGATED.value, date, fingerprint)
+            if df_aggregated is not None:
+                self._aggregated[date] = self._encode_isins(df_aggregated)
+                return None
+        df = self.checkpoint.load(CheckpointKinds.PARSED.value, date, fingerprint)
+        if df is None:
+            df = pd.concat(self._read_objects(objects), ignore_index=True)
+            self.checkpoint.save(CheckpointKinds.PARSED.value, date, fingerprint, df)
+        # Checkpoints written without the ISIN dictionary hold the ISINs
+        return self._encode_isins(df)
+
+    def transform_report1(self, df: pd.DataFrame, aggregated: bool = False):
         """
         Apply the necessary transformations to create report 1.
         :param df: pandas DataFrame with soure data
+        :param aggregated: whether df holds the daily aggregates already, see `extract_aggregated`
 
         :returns:
             df: a transformed pandas DataFrame
         """
-        if df.empty:
+        if df.empty and not self._aggregated:
             self._logger.info('The dataframe is empty. No transformations will be applied.')
             return df
 
         self._logger.info('Applying transformations to Xetra source data for report 1 started...')
 
-        # Filter only the necessary columns
-        df = df.loc[:, self.src_args.columns]
-        df.dropna(inplace=True)
+        if not aggregated:
+            df = self._aggregate_report1_daily(df)
+        with self.metrics.stage('transform') as observation:
+            observation.add(rows_in=len(df))
+            df = self._add_change(df)
 
-        # Calculate opening price per ISIN and day
+            # Remove the day before extract date
+            df = df[df.Date >= self.extract_date].reset_index(drop=True)
+            observation.add(rows_out=len(df))
 
-        df[self.trg_args.col_opening_price] = (
-            df
-            .sort_values(by=self.src_args.col_time)
-            .groupby([self.src_args.col_isin, self.src_args.col_date])[self.src_args.col_start_price]
-            .transform('first')
-        )
+        self._logger.info('Finished transformations of Xetra source data.')
 
-        # Calculate closing price per ISIN and day
+        return df
 
-        df[self.trg_args.col_closing_price] = (
-            df
-            .sort_values(by=self.src_args.col_time)
-            .groupby([self.src_args.col_isin, self.src_args.col_date])[self.src_args.col_end_price]
-            .transform('last')
-        )
+    def transform_late(self, df: pd.DataFrame, df_affected: pd.DataFrame):
+        """
+        Recompute the report 1 rows affected by late source objects.
 
-        # Rename columns
+        :param df: pandas DataFrame with source data returned by extract_late
+        :param df_affected: pandas DataFrame with the affected (ISIN, date) pairs returned by extract_late
 
-        df.rename(
-            columns={
-                self.src_args.col_min_price: self.trg_args.col_min_price,
-                self.src_args.col_max_price: self.trg_args.col_max_price,
-                self.src_args.col_traded_vol: self.trg_args.col_daily_traded_volume
-            },
-            inplace=True
-        )
+        :returns:
+            df: a transformed pandas DataFrame with the corrected rows
+        """
+        if df.empty:
+            return df
 
-        # Aggregate relevant columns
+        self._logger.info('Recomputing report 1 rows affected by late source files...')
+        df = self._aggregate_report1_daily(df)
+        df = self._add_change(df)
+        df = df.merge(df_affected, on=[self.src_args.col_isin, self.src_args.col_date]).reset_index(drop=True)
+        self._logger.info(f'Recomputed {len(df)} report 1 rows.')
+        return df
 
-        df = (
-            df
-            .groupby([self.src_args.col_isin, self.src_args.col_date], as_index=False)
-            .agg({
-                self.trg_args.col_opening_price: 'min',
-                self.trg_args.col_closing_price: 'min',
-                self.trg_args.col_min_price: 'min',
-                self.trg_args.col_max_price: 'max',
-                self.trg_args.col_daily_traded_volume: 'sum'
-            }
-            )
-        )
+    def transform_intraday(self, df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """
+        Aggregate the extracted source data into OHLCV bars per ISIN, date and time bucket with the intraday and the
+        daily VWAP, see xetra.transformers.ohlcv.aggregate_intraday. It works on the same DataFrame as report 1, so the
+        source data is downloaded and parsed only once.
+
+        :param df: pandas DataFrame with source data returned by extract
+        :returns:
+            df: pandas DataFrame with the intraday report, None without the `intraday_config.key`
+        """
+        if self.intraday_config.key is None:
+            return None
+        if df.empty:
+            return pd.DataFrame()
+        with self.metrics.stage('aggregate_intraday') as observation:
+            observation.add(rows_in=len(df))
+            df = aggregate_intraday(df, self.src_args, self.trg_args, self.intraday_config.bucket_minutes)
+            # Remove the day before extract date
+            df = df[df[self.src_args.col_date] >= self.extract_date].reset_index(drop=True)
+            observation.add(rows_out=len(df))
+        return df
+
+    def transform_rolling(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Update the rolling windows with the closing prices of the report 1 rows, see
+        xetra.transformers.rolling.RollingWindowReport.
+
+        :param df: pandas DataFrame returned by transform_report1
+        :returns:
+            df: pandas DataFrame with the rolling-window report of the dates of df, None without the rolling report
+        """
+        if self.rolling_report is None:
+            return None
+        with self.metrics.stage('transform_rolling') as observation:
+            observation.add(rows_in=len(df))
+            df = self.rolling_report.update(self._decode_isins(df))
+            observation.add(rows_out=len(df))
+        return df
+
+    def _add_change(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add the change of the closing price to the previous trading day (in %) to the daily aggregates.
+
+        :param df: pandas DataFrame with daily aggregates
+        :returns:
+            df: pandas DataFrame with the change column, rounded to 2 decimals
+        """
 
         # Change between current day's closing price to the previous trading day in %
 
@@ -200,44 +485,252 @@ class XetraETL:
 
         # Round the change to 2 decimals
         df = df.round(decimals=2)
+        return df
 
-        # Remove the day before extract date
-        df = df[df.Date >= self.extract_date].reset_index(drop=True)
+    def _aggregate_object(self, df: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+        """
+        Aggregate a single source object into partial aggregates, see xetra.transformers.ohlcv.aggregate_ohlcv.
+        """
+        with self.metrics.stage('aggregate') as observation:
+            df_partial = aggregate_ohlcv(df, keys, self.src_args, self.trg_args)
+            observation.add(objects=1, rows_in=len(df), rows_out=len(df_partial))
+        return df_partial
 
-        self._logger.info('Finished transformations of Xetra source data.')
+    def _aggregate_report1_daily(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Aggregate the source data per ISIN and day. Aggregates of the dates which are checkpointed are taken from the
+        checkpoint (or from the aggregates kept by _extract_date), the rest is computed and checkpointed.
+
+        :param df: pandas DataFrame with source data
+        :returns:
+            df: pandas DataFrame with daily aggregates
+        """
+        with self.metrics.stage('aggregate') as observation:
+            observation.add(rows_in=len(df))
+            # The aggregates kept by _extract_date belong to the dates whose source data was not loaded
+            cached = list(self._aggregated.values())
+            self._aggregated = {}
+            if df.empty and cached:
+                df = (
+                    pd.concat(cached)
+                    .sort_values(by=[self.src_args.col_isin, self.src_args.col_date])
+                    .reset_index(drop=True)
+                )
+                observation.add(rows_out=len(df))
+                return df
+            df = self._encode_isins(df)
+            if self.checkpoint is not None:
+                dates_in_df = set(df[self.src_args.col_date].unique())
+                for date, fingerprint in self._fingerprints.items():
+                    if date not in dates_in_df:
+                        continue
+                    df_date = self.checkpoint.load(CheckpointKinds.AGGREGATED.value, date, fingerprint)
+                    if df_date is not None:
+                        cached.append(self._encode_isins(df_date))
+                if cached:
+                    cached_dates = pd.concat(cached)[self.src_args.col_date].unique()
+                    df = df[~df[self.src_args.col_date].isin(cached_dates)]
+
+            # Filter only the necessary columns
+            df = df.loc[:, self.src_args.columns]
+            df.dropna(inplace=True)
+
+            # Calculate opening price per ISIN and day
+
+            df[self.trg_args.col_opening_price] = (
+                df
+                .sort_values(by=self.src_args.col_time)
+                .groupby([self.src_args.col_isin, self.src_args.col_date])[self.src_args.col_start_price]
+                .transform('first')
+            )
+
+            # Calculate closing price per ISIN and day
+
+            df[self.trg_args.col_closing_price] = (
+                df
+                .sort_values(by=self.src_args.col_time)
+                .groupby([self.src_args.col_isin, self.src_args.col_date])[self.src_args.col_end_price]
+                .transform('last')
+            )
+
+            # Rename columns
 
+            df.rename(
+                columns={
+                    self.src_args.col_min_price: self.trg_args.col_min_price,
+                    self.src_args.col_max_price: self.trg_args.col_max_price,
+                    self.src_args.col_traded_vol: self.trg_args.col_daily_traded_volume
+                },
+                inplace=True
+            )
+
+            # Aggregate relevant columns
+
+            df = (
+                df
+                .groupby([self.src_args.col_isin, self.src_args.col_date], as_index=False)
+                .agg({
+                    self.trg_args.col_opening_price: 'min',
+                    self.trg_args.col_closing_price: 'min',
+                    self.trg_args.col_min_price: 'min',
+                    self.trg_args.col_max_price: 'max',
+                    self.trg_args.col_daily_traded_volume: 'sum'
+                }
+                )
+            )
+
+            if self.checkpoint is not None:
+                for date, df_date in df.groupby(self.src_args.col_date):
+                    if date in self._fingerprints:
+                        self.checkpoint.save(
+                            CheckpointKinds.AGGREGATED.value, date, self._fingerprints[date], df_date
+                        )
+                if cached:
+                    df = (
+                        pd.concat(cached + [df])
+                        .sort_values(by=[self.src_args.col_isin, self.src_args.col_date])
+                        .reset_index(drop=True)
+                    )
+            observation.add(rows_out=len(df))
         return df
 
-    def load(self, df: pd.DataFrame):
+    def load(
+            self,
+            df: pd.DataFrame,
+            df_corrections: pd.DataFrame = None,
+            df_rolling: pd.DataFrame = None,
+            df_intraday: pd.DataFrame = None
+    ):
         """
         Save a DataFrame to the target.
 
         :param df: a pandas DataFrame.
+        :param df_corrections: a pandas DataFrame with rows recomputed because of late source objects. It is written
+            under the report key with the `corrections_` prefix.
+        :param df_rolling: a pandas DataFrame returned by transform_rolling. The state of the rolling windows is saved
+            first, see RollingWindowReport.commit, and the windows of the saved state are written under the key of the
+            rolling report.
+        :param df_intraday: a pandas DataFrame returned by transform_intraday. It is written under the key of the
+            intraday report.
+
+        If the ISIN dictionary is used, the codes are decoded, or with `encode_output` the dictionary is written under
+        the report key with the `isin_dictionary_` prefix.
         """
-
+        timestamp = datetime.today().strftime(self.trg_args.key_date_format)
         key = (
             f'{self.trg_args.key}'
-            f'{datetime.today().strftime(self.trg_args.key_date_format)}.'
+            f'{timestamp}{self.report_key_suffix}.'
             f'{self.trg_args.format}'
         )
 
         # Write to target
 
+        if self.encode_output:
+            # Grouping on several keys widens the codes to int64 with pandas < 2
+            df, df_corrections, df_intraday = (
+                df_out.astype({self.src_args.col_isin: np.int32}) if df_out is not None and not df_out.empty else df_out
+                for df_out in (df, df_corrections, df_intraday)
+            )
+            key_dictionary = (
+                f'{self.trg_args.key}isin_dictionary_'
+                f'{timestamp}{self.report_key_suffix}.'
+                f'{self.trg_args.format}'
+            )
+            self.s3_bucket_trg.write_df_to_s3(
+                df=self.isin_dictionary.to_frame(), key=key_dictionary, file_format=self.trg_args.format
+            )
+        else:
+            df = self._decode_isins(df)
+            if df_corrections is not None:
+                df_corrections = self._decode_isins(df_corrections)
+            if df_intraday is not None:
+                df_intraday = self._decode_isins(
+                    df_intraday, by=[self.src_args.col_isin, self.src_args.col_date, self.src_args.col_time]
+                )
         self.s3_bucket_trg.write_df_to_s3(df=df, key=key, file_format=self.trg_args.format)
         self._logger.info('Xetra target data is successfully written.')
 
+        if df_corrections is not None and not df_corrections.empty:
+            key_corrections = (
+                f'{self.trg_args.key}corrections_'
+                f'{timestamp}{self.report_key_suffix}.'
+                f'{self.trg_args.format}'
+            )
+            self.s3_bucket_trg.write_df_to_s3(df=df_corrections, key=key_corrections, file_format=self.trg_args.format)
+            self._logger.info('Xetra corrections are successfully written.')
+
+        if df_intraday is not None:
+            key_intraday = f'{self.intraday_config.key}{timestamp}{self.report_key_suffix}.{self.trg_args.format}'
+            self.s3_bucket_trg.write_df_to_s3(df=df_intraday, key=key_intraday, file_format=self.trg_args.format)
+            self._logger.info('Xetra intraday report is successfully written.')
+
+        if df_rolling is not None:
+            # A state replaced by a concurrent run is merged, the windows are then recomputed on the merged state
+            df_rolling = self.rolling_report.commit(df_rolling)
+            key_rolling = f'{self.rolling_report.key}{timestamp}{self.report_key_suffix}.{self.trg_args.format}'
+            self.s3_bucket_trg.write_df_to_s3(df=df_rolling, key=key_rolling, file_format=self.trg_args.format)
+            self._logger.info('Xetra rolling-window report is successfully written.')
+
         # Upload the meta file
 
-        MetaProcess.update_meta_file(self.s3_bucket_trg, self.meta_key, self.meta_update_list)
-        self._logger.info('Xetra meta file is successfully updated')
+        if self.update_meta:
+            MetaProcess.update_meta_file(self.s3_bucket_trg, self.meta_key, self.meta_update_list)
+            if self._objects:
+                MetaProcess.update_object_meta_file(self.s3_bucket_trg, self.meta_key, self._objects)
+            self._logger.info('Xetra meta file is successfully updated')
+
+        # The processed dates are recorded in the meta file, so their checkpoints are not needed anymore
+
+        if self.update_meta and self.checkpoint is not None:
+            self.checkpoint.clear(self.extract_date_list)
         return True
 
-    def etl_report1(self):
+    def _profile_memory(self, stage: str, **dataframes: pd.DataFrame):
+        """
+        Record the memory at the end of a stage, if the memory is profiled.
+        """
+        if self.memory_profiler is not None:
+            self.memory_profiler.checkpoint(stage, **dataframes)
+
+    def etl_report1(self, mode: str = ExecutionModes.IN_MEMORY.value):
+        """
+        Run the report 1 job.
+
+        :param mode: one of xetra.common.constants.ExecutionModes values. 'in_memory' extracts all the dates before
+            transforming them, 'streaming' aggregates every date right after it is extracted, and 'out_of_core'
+            aggregates every source object right after it is read. 'pipelined' lists, downloads, parses and
+            aggregates the source objects concurrently in a pipeline. The intraday report is computed only in the
+            'in_memory' and 'streaming' modes, from the source data extracted for report 1.
+        """
         # Extract
-        df = self.extract()
+        df_intraday = None
+        if mode == ExecutionModes.IN_MEMORY.value:
+            df = self.extract()
+            df_intraday = self.transform_intraday(df)
+        elif mode == ExecutionModes.PIPELINED.value:
+            df = self.extract_pipelined()
+        else:
+            per_object = mode == ExecutionModes.OUT_OF_CORE.value
+            df = self.extract_aggregated(per_object=per_object)
+            if not per_object:
+                # The intraday reports are computed date by date during the extraction
+                df_intraday = (
+                    pd.concat(self._intraday, ignore_index=True) if self._intraday
+                    else self.transform_intraday(pd.DataFrame())
+                )
+        if self.intraday_config.key is not None and df_intraday is None:
+            self._logger.warning(f'The intraday report is not computed in the {mode} mode.')
+        self._profile_memory('extract', df=df)
+        df_late, df_affected = self.extract_late()
+        self._profile_memory('extract_late', df_late=df_late, df_affected=df_affected)
 
         # Transform
-        df = self.transform_report1(df)
+        df = self.transform_report1(df, aggregated=mode != ExecutionModes.IN_MEMORY.value)
+        self._profile_memory('transform_report1', df=df)
+        df_corrections = self.transform_late(df_late, df_affected)
+        self._profile_memory('transform_late', df_corrections=df_corrections)
+        df_rolling = self.transform_rolling(df)
 
         # Load
-        self.load(df)
+        self.load(df, df_corrections, df_rolling, df_intraday)
+        self._profile_memory('load')